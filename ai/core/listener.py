@@ -1,10 +1,9 @@
 import asyncio
-import base64
 import json
 import logging
 import os
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import webrtcvad
@@ -15,6 +14,7 @@ from av.audio.resampler import AudioResampler
 from pydub import AudioSegment
 
 from core.signaling_client import SignalingClient
+from signaling.mux_client import MuxClient
 from core.rtc_peer import RTCPeerManager
 from personas.scrum_persona import ScrumPersona
 from project_manager.ado import ADOProjectManager
@@ -24,6 +24,10 @@ from modules.speech_to_text import SpeechToTextConverter
 
 logger = logging.getLogger(__name__)
 
+# What _on_signaling_message acts on (roster and end_call always arrive); the
+# hub skips audio, content and status updates for us instead of us parsing them
+SUBSCRIBED_TYPES = ("signal", "chat_message", "content_ack")
+
 
 class SilentAudioTrack(MediaStreamTrack):
     kind = "audio"
@@ -37,6 +41,11 @@ class SilentAudioTrack(MediaStreamTrack):
         return frame
 
 
+def _to_field(recipients: List[str]):
+    """`to` for the hub: one id, or a list so the hub fans a single upload out."""
+    return recipients[0] if len(recipients) == 1 else list(recipients)
+
+
 async def _consume_audio_vad(listener: "VirtualListener", track: MediaStreamTrack, remote_id: str):
     vad = webrtcvad.Vad(1)
     rate = 16000
@@ -114,13 +123,17 @@ async def _consume_audio_vad(listener: "VirtualListener", track: MediaStreamTrac
 
 
 class VirtualListener:
-    def __init__(self, room: str, name: str, server: str, db_session=None):
+    def __init__(self, room: str, name: str, server: str, db_session=None, mux: MuxClient = None):
         self.room = room
         self.name = name
         self.server = server
         self.db_session = db_session
 
-        self.signaling = SignalingClient(server, room, name, self._on_signaling_message)
+        # A host running bots in many rooms passes one shared MuxClient
+        if mux is not None:
+            self.signaling = mux.channel(room, name, self._on_signaling_message, SUBSCRIBED_TYPES)
+        else:
+            self.signaling = SignalingClient(server, room, name, self._on_signaling_message, SUBSCRIBED_TYPES)
         self.peer_manager = RTCPeerManager(self, on_track=self._on_new_track)
 
         self.tts = TextToSpeechConverter()
@@ -130,17 +143,26 @@ class VirtualListener:
 
         self.connected: bool = False
         self._persona_started: bool = False
+        self._persona_pending: bool = False
         self._is_speaking: bool = False
         self._listening_paused: bool = False
 
         self.users: List[str] = []
+        self._roster_version: int = 0
         self.data_channels: Dict[str, any] = {}
-        self.pending_content: Dict[str, List[str]] = {}
+        # Newest content_update each member has not acked yet, as (seq, text);
+        # a newer update replaces it, so there is never more than one per member
+        self.pending_content: Dict[str, Tuple[int, str]] = {}
+        # Sequence of our content updates: members drop anything not newer than
+        # what they have and ack cumulatively. Starts from the clock so a
+        # restarted bot is not mistaken for a stale one
+        self._content_seq: int = int(time.time() * 1000)
         self.audio_consumer_tasks: Dict[str, asyncio.Task] = {}
         self.state_lock = asyncio.Lock()
 
         # serialize TTS to avoid overlap
         self._speech_lock = asyncio.Lock()
+        self._audio_seq: int = 0
 
     async def connect(self):
         print(f"[bot:{self.name}] 🚀 Starting bot for room '{self.room}' using server '{self.server}'")
@@ -176,6 +198,10 @@ class VirtualListener:
         t = data.get("type")
         if t == "user_list":
             await self._handle_user_list(data)
+        elif t == "user_joined":
+            await self._handle_user_joined(data)
+        elif t == "user_left":
+            await self._handle_user_left(data)
         elif t == "signal":
             await self._handle_signal(data)
         elif t == "chat_message":
@@ -184,6 +210,8 @@ class VirtualListener:
             sender = payload.get("from") or data.get("from") or "unknown"
             if text:
                 await self._handle_chat_message(text, sender)
+        elif t == "content_ack":
+            self._on_content_ack(data.get("from"), data.get("seq"))
         elif t in ("status_update", "speaking_update", "content_update", "progress_update"):
             pass
         elif t == "end_call":
@@ -191,6 +219,13 @@ class VirtualListener:
             await self.disconnect()
 
     async def _handle_user_list(self, data: dict):
+        """Full roster snapshot (sent on connect or after we asked for one)."""
+        version = data.get("version")
+        if version is not None:
+            if version < self._roster_version:
+                return
+            self._roster_version = version
+
         async with self.state_lock:
             new_users = data.get("users", [])
             departed = set(self.users) - set(new_users)
@@ -204,8 +239,42 @@ class VirtualListener:
             asyncio.create_task(self._send_welcome_when_ready(uid))
 
         self.users = [u for u in new_users if u != self.name]
+        self._maybe_start_persona()
+
+    def _accept_roster_delta(self, data: dict) -> bool:
+        """Apply deltas in version order; on a gap, ask the hub for a fresh snapshot."""
+        version = data.get("version")
+        if version is None:
+            return True
+        if version <= self._roster_version:
+            return False
+        if version != self._roster_version + 1:
+            asyncio.create_task(self.signaling.send({"type": "get_user_list"}))
+            return False
+        self._roster_version = version
+        return True
+
+    async def _handle_user_joined(self, data: dict):
+        uid = data.get("user_id")
+        if not uid or not self._accept_roster_delta(data) or uid == self.name:
+            return
+        if uid not in self.users:
+            self.users.append(uid)
+            print(f"[bot:{self.name}] 👋 User joined: {uid}")
+            asyncio.create_task(self._send_welcome_when_ready(uid))
+        self._maybe_start_persona()
+
+    async def _handle_user_left(self, data: dict):
+        uid = data.get("user_id")
+        if not uid or not self._accept_roster_delta(data):
+            return
+        if uid in self.users:
+            self.users.remove(uid)
+            await self._cleanup_departed_user(uid)
 
-        if not self._persona_started and self.users:
+    def _maybe_start_persona(self):
+        if not self._persona_started and self.users and not self._persona_pending:
+            self._persona_pending = True
             async def _wait_and_start():
                 timeout = 20
                 start = time.time()
@@ -258,6 +327,8 @@ class VirtualListener:
                                 sender = m.get("from") or from_id
                                 if text:
                                     asyncio.create_task(self._handle_chat_message(text, sender))
+                            elif t == "content_ack":
+                                self._on_content_ack(from_id, payload.get("seq"))
                         except Exception as e:
                             print(f"[bot:{self.name}] ⚠️ DC message error: {e}")
                 pc._bot_dc_bound = True
@@ -278,7 +349,7 @@ class VirtualListener:
                 })
             elif action == "answer":
                 await pc.setRemoteDescription(RTCSessionDescription(**payload))
-            elif action == "ice":
+            elif action in ("ice", "ice_batch"):
                 await self.peer_manager.add_ice_candidate(pc, payload)
         except Exception as e:
             print(f"[bot:{self.name}] ⚠️ Signal handling failed for {from_id}: {e}")
@@ -379,13 +450,20 @@ class VirtualListener:
         await self.persona.say(f"Welcome {user_id}! Glad you could join.")
 
     async def _flush_pending(self, to_user: str, channel):
-        pending = self.pending_content.pop(to_user, [])
-        for msg in pending:
+        """Channel (re)opened: resend the newest update the member has not acked."""
+        pending = self.pending_content.get(to_user)
+        if pending:
             try:
-                channel.send(msg)
+                channel.send(pending[1])
             except Exception:
                 pass
 
+    def _on_content_ack(self, user_id: Optional[str], seq):
+        """Cumulative ack: the member has everything up to `seq`."""
+        pending = self.pending_content.get(user_id)
+        if pending and isinstance(seq, int) and seq >= pending[0]:
+            del self.pending_content[user_id]
+
     def pause_listening(self):
         self._listening_paused = True
 
@@ -406,19 +484,20 @@ class VirtualListener:
                     _, ext = os.path.splitext(tts_path.lower())
                     fmt = "mp3" if ext == ".mp3" else "wav"
                     with open(tts_path, "rb") as f:
-                        b64_audio = base64.b64encode(f.read()).decode("ascii")
+                        audio_bytes = f.read()
 
-                    recipients = self.users if to_user == "all" else [to_user]
-                    await asyncio.gather(*[
-                        self.signaling.send({
+                    # Raw bytes in a binary frame, uploaded once: the hub fans it out to the `to` list
+                    self._audio_seq += 1
+                    recipients = list(self.users) if to_user == "all" else [to_user]
+                    if recipients:
+                        await self.signaling.send({
                             "type": "bot_audio",
                             "from": self.name,
-                            "to": uid,
+                            "to": _to_field(recipients),
                             "format": fmt,
-                            "data": b64_audio,
+                            "seq": self._audio_seq,
                             "speaker": self.name
-                        }) for uid in recipients
-                    ])
+                        }, data=audio_bytes)
 
                     try:
                         audio = AudioSegment.from_file(tts_path)
@@ -438,30 +517,47 @@ class VirtualListener:
 
     async def _broadcast_content(self, content, to_user: str = "all"):
         recipients = self.users if to_user == "all" else [to_user]
-        tasks = []
-        text = json.dumps({"type": "content_update", "payload": content})
+        via_signaling, via_channel = [], []
+        self._content_seq += 1
+        seq = self._content_seq
+        text = json.dumps({"type": "content_update", "from": self.name, "seq": seq, "payload": content})
         for uid in recipients:
+            # Each member gets it once, by one path; it stays pending (replacing
+            # any older update) until acked, and is resent if the channel reopens
+            self.pending_content[uid] = (seq, text)
             dc = self.data_channels.get(uid)
             if dc and getattr(dc, "readyState", "") == "open":
                 try:
                     dc.send(text)
+                    via_channel.append(uid)
                     continue
                 except Exception:
                     pass
-            self.pending_content.setdefault(uid, []).append(text)
-            tasks.append(self.signaling.send({
-                "type": "content_update", "from": self.name, "to": uid, "payload": content
-            }))
-        if tasks:
-            await asyncio.gather(*tasks)
+            via_signaling.append(uid)
+        if to_user == "all":
+            # Room-wide content always goes through the hub, which keeps it for
+            # late joiners; members already served over a data channel are skipped
+            await self.signaling.send({
+                "type": "content_update", "from": self.name, "to_except": via_channel, "seq": seq, "payload": content
+            })
+        elif via_signaling:
+            await self.signaling.send({
+                "type": "content_update", "from": self.name, "to": _to_field(via_signaling), "seq": seq,
+                "payload": content
+            })
+
+    async def on_progress_update(self, progress_payload, to_user: str = "all"):
+        """Persona hook for meeting progress."""
+        await self._broadcast_progress(progress_payload, to_user)
 
     async def _broadcast_progress(self, progress_payload, to_user: str = "all"):
-        recipients = self.users if to_user == "all" else [to_user]
-        await asyncio.gather(*[
-            self.signaling.send({
-                "type": "progress_update", "from": self.name, "to": uid, "payload": progress_payload
-            }) for uid in recipients
-        ])
+        if to_user == "all":
+            # Plain broadcast: the hub also keeps it as the room's current progress
+            await self.signaling.send({"type": "progress_update", "from": self.name, "payload": progress_payload})
+            return
+        await self.signaling.send({
+            "type": "progress_update", "from": self.name, "to": to_user, "payload": progress_payload
+        })
 
 
 __all__ = ["VirtualListener"]
@@ -36,6 +36,13 @@ class RTCPeerManager:
         return pc
 
     async def add_ice_candidate(self, pc: RTCPeerConnection, payload: dict):
+        """Adds one ICE candidate, or every candidate of an ice_batch ({"candidates": [...]})."""
+        if not payload:
+            return
+        for candidate in payload.get("candidates") or (payload,):
+            await self._add_one_candidate(pc, candidate)
+
+    async def _add_one_candidate(self, pc: RTCPeerConnection, payload: dict):
         """Correctly parses and adds an ICE candidate received from the client."""
         if not payload or not payload.get("candidate"):
             return
@@ -55,4 +62,4 @@ class RTCPeerManager:
             )
             await pc.addIceCandidate(ice)
         except Exception as e:
-            print(f"Error adding ICE candidate for peer: {e}")
\ No newline at end of file
+            print(f"Error adding ICE candidate for peer: {e}")
@@ -1,44 +1,89 @@
-import json
 import websockets
 from websockets.exceptions import ConnectionClosed
 import asyncio
+from urllib.parse import urlencode
+from signaling import codec
+from signaling.auth import connect_kwargs
+from signaling.frames import decode_frame, encode_message, pack_binary
+from signaling.sequence import RoomSeq
+
+# Close code of a hub that is being replaced: reconnect with the resume token
+RESTART_CLOSE_CODE = 1012
+# Closes a reconnect cannot fix: normal closure, room full (server/limits.py)
+FINAL_CLOSE_CODES = frozenset((1000, 4003))
+RECONNECT_ATTEMPTS = 8
 
 
 class SignalingClient:
-    def __init__(self, server_url: str, room: str, name: str, on_message_callback):
+    def __init__(self, server_url: str, room: str, name: str, on_message_callback, subscribe=None,
+                 wire_codec: str = None):
         self.server_url = server_url
         self.room = room
         self.name = name
         self.ws = None
         self.on_message_callback = on_message_callback
+        # Message types the hub should send us (None = all); hub control messages always arrive
+        self.subscribe = list(subscribe) if subscribe else None
+        # room_seq tracking; the highest seen is sent as resume_from when reconnecting
+        self.seq = RoomSeq()
+        # Given by the hub on join; lets us re-attach silently after a hub restart
+        self.resume_token = None
+        # Codec to ask for, and the one in use (JSON until the hub's session message confirms otherwise)
+        self.wire_codec = wire_codec or codec.preferred()
+        self.codec = codec.JSON
 
     async def connect(self):
         url = f"{self.server_url.rstrip('/')}/{self.room}/{self.name}"
+        query = {
+            "resume_from": self.seq.last or None,
+            "resume_token": self.resume_token,
+            "subscribe": ",".join(self.subscribe) if self.subscribe else None,
+            "codec": self.wire_codec if self.wire_codec != codec.JSON else None,
+        }
+        query = {k: v for k, v in query.items() if v is not None}
+        if query:
+            url += "?" + urlencode(query)
         print(f"[Signaling] Connecting to {url}")
+        self.codec = codec.JSON
         try:
             # --- DEFINITIVE FIX: Add the required Origin header ---
             # This is the only change needed. It uses 'additional_headers', which is
             # correct for your modern websockets library.
             headers = {"Origin": "http://localhost"}
-            self.ws = await websockets.connect(url, additional_headers=headers)
+            # connect_kwargs adds the hub bot token (HUB_BOT_TOKEN), if configured
+            self.ws = await websockets.connect(url, **connect_kwargs(headers))
             print(f"[Signaling] ✅ Connection successful.")
             return self.ws
         except Exception as e:
             print(f"[Signaling] ❌ Connection failed: {e}")
             raise
 
-    async def send(self, payload: dict):
+    async def send(self, payload: dict, data: bytes = None):
+        """Send a JSON message, or a binary frame when raw `data` is attached (payload becomes its header)."""
         if not self.ws: return
         try:
-            await self.ws.send(json.dumps(payload))
+            if data is not None:
+                await self.ws.send(pack_binary(payload, data))
+            else:
+                await self.ws.send(encode_message(payload, self.codec))
         except ConnectionClosed:
             print("[Signaling] Connection closed while sending message")
 
+    async def _reconnect(self) -> bool:
+        """Reconnect with resume_from and our token: re-attach after a restart, or rejoin and catch up."""
+        for attempt in range(RECONNECT_ATTEMPTS):
+            await asyncio.sleep(min(0.5 * 2 ** attempt, 5.0))
+            try:
+                await self.connect()
+                return True
+            except Exception:
+                continue
+        return False
+
     async def listen(self):
         if not self.ws: return
         try:
-            async for msg in self.ws:
-                await self.on_message_callback(json.loads(msg))
+            await self._listen()
         except asyncio.CancelledError:
             pass  # task cancelled, normal shutdown
         except ConnectionResetError:
@@ -46,4 +91,45 @@ class SignalingClient:
         except websockets.ConnectionClosed:
             print(f"[SignalingClient:{self.name}] 🔌 WebSocket closed normally.")
         except Exception as e:
-            print(f"[SignalingClient:{self.name}] ❌ Unexpected error in listen loop: {e}")
\ No newline at end of file
+            print(f"[SignalingClient:{self.name}] ❌ Unexpected error in listen loop: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                await self._receive_loop()
+                return
+            except ConnectionClosed as e:
+                # Restart or dropped connection: come back with resume_from (and our
+                # token), so the hub replays what we missed
+                code = e.rcvd.code if e.rcvd else None
+                if code in FINAL_CLOSE_CODES:
+                    raise
+                if code == RESTART_CLOSE_CODE:
+                    print(f"[SignalingClient:{self.name}] 🔁 Hub restarting, reconnecting...")
+                else:
+                    print(f"[SignalingClient:{self.name}] 🔁 Connection lost ({code}), reconnecting...")
+                if not await self._reconnect():
+                    raise
+
+    async def _receive_loop(self):
+        async for msg in self.ws:
+            try:
+                data = decode_frame(msg)
+            except ValueError as e:
+                print(f"[SignalingClient:{self.name}] ⚠️ Bad frame: {e}")
+                continue
+            if isinstance(data.get("data"), bytes):
+                # Raw binary payload (bot audio): not part of the room sequence
+                await self.on_message_callback(data)
+                continue
+            if data.get("type") == "ping":
+                # Hub heartbeat: answer so we are not evicted as a dead socket
+                await self.send({"type": "pong", "ts": data.get("ts")})
+                continue
+            if data.get("type") == "session":
+                self.resume_token = data.get("resume_token")
+                self.codec = data.get("codec") or codec.JSON
+                continue
+            if not self.seq.accept(data):
+                continue
+            await self.on_message_callback(data)
\ No newline at end of file
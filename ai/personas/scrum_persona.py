@@ -63,14 +63,10 @@ class ScrumPersona(BasePersona):
         await self.say("When you are ready, please say 'start' to begin.")
 
     async def on_user_join(self, user_id, all_users):
+        # The hub hands late joiners the current content and progress itself,
+        # so there is nothing to re-render or re-send here
         print(f"[{self.name}] on_user_join: {user_id} - participants now: {all_users}")
         self.context["participants"] = all_users
-        await self.say(f"Hello {user_id}, welcome to the meeting!", to_user=user_id)
-        current_html = await self._render_current_ui_html()
-        if current_html:
-            await self.show(current_html, to_user=user_id)
-        # Send the current progress to the joining user
-        await self._broadcast_progress(to_user=user_id)
 
     async def on_message(self, text, speaker):
         # The lock is removed, simplifying this method.
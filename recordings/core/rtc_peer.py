@@ -1,13 +1,21 @@
 # core/rtc_peer.py
 import asyncio
+import os
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer, RTCIceCandidate
 from aiortc.sdp import candidate_from_sdp
 
+# Seconds local ICE candidates are gathered before going out as one ice_batch signal
+ICE_BATCH_WINDOW = float(os.getenv("ICE_BATCH_WINDOW", "0.05"))
+
 class RTCPeerManager:
     def __init__(self, bot, on_track_callback):
         self.bot = bot
         self.on_track_callback = on_track_callback
         self.peers: dict[str, RTCPeerConnection] = {}
+        # peer_id -> local candidates waiting for the batch window to close
+        self._ice_out: dict[str, list] = {}
+        # Scheduled flushes, held until done so they are not garbage-collected
+        self._ice_flushes: set[asyncio.Task] = set()
         self.ice_config = RTCConfiguration(
             iceServers=[RTCIceServer(urls="stun:stun.l.google.com:19302")],
             bundlePolicy='max-compat'
@@ -39,7 +47,8 @@ class RTCPeerManager:
         if initiator:
             @pc.on("icecandidate")
             async def on_icecandidate(candidate):
-                if candidate: await self.bot.signaling.send({"type": "signal", "action": "ice", "from": self.bot.bot_id, "to": peer_id, "payload": candidate.to_dict()})
+                if candidate: self._queue_ice(peer_id, candidate.to_dict())
+                else: await self._flush_ice(peer_id)  # gathering complete
             
             offer = await pc.createOffer()
             await pc.setLocalDescription(offer)
@@ -57,17 +66,54 @@ class RTCPeerManager:
             self.bot.log(f"Received answer from '{peer_id}'")
             await pc.setRemoteDescription(RTCSessionDescription(**payload))
         
-        elif action == "ice":
-            if payload and payload.get("candidate"):
-                try:
-                    # This correct parsing logic is preserved
-                    parsed_candidate = candidate_from_sdp(payload["candidate"])
-                    ice_candidate = RTCIceCandidate(
-                        component=parsed_candidate.component, foundation=parsed_candidate.foundation,
-                        ip=parsed_candidate.ip, port=parsed_candidate.port, priority=parsed_candidate.priority,
-                        protocol=parsed_candidate.protocol, type=parsed_candidate.type,
-                        sdpMid=payload.get("sdpMid"), sdpMLineIndex=payload.get("sdpMLineIndex"),
-                    )
-                    await pc.addIceCandidate(ice_candidate)
-                except Exception as e:
-                    self.bot.log(f"⚠️ Error adding ICE candidate for {peer_id}: {e}")
\ No newline at end of file
+        elif action in ("ice", "ice_batch"):
+            await self.add_ice_candidate(pc, payload, peer_id)
+
+    async def add_ice_candidate(self, pc: RTCPeerConnection, payload: dict, peer_id: str = None):
+        """Add one candidate ({"candidate", "sdpMid", "sdpMLineIndex"}) or an ice_batch ({"candidates": [...]})."""
+        if not payload:
+            return
+        for candidate in payload.get("candidates") or (payload,):
+            if not candidate or not candidate.get("candidate"):
+                continue
+            try:
+                # This correct parsing logic is preserved
+                parsed_candidate = candidate_from_sdp(candidate["candidate"])
+                ice_candidate = RTCIceCandidate(
+                    component=parsed_candidate.component, foundation=parsed_candidate.foundation,
+                    ip=parsed_candidate.ip, port=parsed_candidate.port, priority=parsed_candidate.priority,
+                    protocol=parsed_candidate.protocol, type=parsed_candidate.type,
+                    sdpMid=candidate.get("sdpMid"), sdpMLineIndex=candidate.get("sdpMLineIndex"),
+                )
+                await pc.addIceCandidate(ice_candidate)
+            except Exception as e:
+                self.bot.log(f"⚠️ Error adding ICE candidate for {peer_id}: {e}")
+
+    def _queue_ice(self, peer_id: str, candidate: dict):
+        """Hold a local candidate; the first one opens a short window for the rest to join it."""
+        pending = self._ice_out.setdefault(peer_id, [])
+        pending.append(candidate)
+        if len(pending) == 1:
+            asyncio.get_running_loop().call_later(ICE_BATCH_WINDOW, self._start_flush, peer_id)
+
+    def _start_flush(self, peer_id: str):
+        task = asyncio.ensure_future(self._flush_ice(peer_id))
+        self._ice_flushes.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task):
+        self._ice_flushes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.bot.log(f"⚠️ Error sending ICE candidates: {task.exception()}")
+
+    async def _flush_ice(self, peer_id: str):
+        candidates = self._ice_out.pop(peer_id, None)
+        if not candidates:
+            return
+        # A lone candidate stays a plain "ice" signal, which every client understands
+        if len(candidates) == 1:
+            msg = {"type": "signal", "action": "ice", "from": self.bot.bot_id, "to": peer_id, "payload": candidates[0]}
+        else:
+            msg = {"type": "signal", "action": "ice_batch", "from": self.bot.bot_id, "to": peer_id,
+                   "payload": {"candidates": candidates}}
+        await self.bot.signaling.send(msg)
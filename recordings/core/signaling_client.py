@@ -1,16 +1,36 @@
 # core/signaling_client.py
 import asyncio
-import json
 import websockets
+from urllib.parse import urlencode
 from websockets.exceptions import ConnectionClosed, InvalidStatus
+from signaling import codec
+from signaling.auth import connect_kwargs
+from signaling.frames import decode_frame, encode_message, pack_binary
+from signaling.sequence import RoomSeq
+
+# Close code of a hub that is being replaced: reconnect with the resume token
+RESTART_CLOSE_CODE = 1012
+# Closes a reconnect cannot fix: normal closure, room full (server/limits.py)
+FINAL_CLOSE_CODES = frozenset((1000, 4003))
+RECONNECT_ATTEMPTS = 8
 
 class SignalingClient:
     """Manages the WebSocket connection and message handling for signaling."""
 
-    def __init__(self, server_url: str, room: str, name: str, on_message_callback):
+    def __init__(self, server_url: str, room: str, name: str, on_message_callback, subscribe=None,
+                 wire_codec: str = None):
         self.url = f"{server_url.rstrip('/')}/{room}/{name}"
         self.ws = None
         self.on_message_callback = on_message_callback
+        # Message types the hub should send us (None = all); hub control messages always arrive
+        self.subscribe = list(subscribe) if subscribe else None
+        # room_seq tracking; the highest seen is sent as resume_from when reconnecting
+        self.seq = RoomSeq()
+        # Given by the hub on join; lets us re-attach silently after a hub restart
+        self.resume_token = None
+        # Codec to ask for, and the one in use (JSON until the hub's session message confirms otherwise)
+        self.wire_codec = wire_codec or codec.preferred()
+        self.codec = codec.JSON
         self._is_connected = False
         self.name = name
 
@@ -22,10 +42,19 @@ class SignalingClient:
     async def connect(self):
         """Establishes the WebSocket connection with the required Origin header."""
         try:
-            print(f"[Signaling] Connecting to {self.url}")
+            query = {
+                "resume_from": self.seq.last or None,
+                "resume_token": self.resume_token,
+                "subscribe": ",".join(self.subscribe) if self.subscribe else None,
+                "codec": self.wire_codec if self.wire_codec != codec.JSON else None,
+            }
+            query = {k: v for k, v in query.items() if v is not None}
+            url = f"{self.url}?{urlencode(query)}" if query else self.url
+            print(f"[Signaling] Connecting to {url}")
+            self.codec = codec.JSON
             # The Origin header is crucial for bypassing CORS on the server
             headers = {"Origin": "http://localhost"}
-            self.ws = await websockets.connect(self.url)
+            self.ws = await websockets.connect(url, **connect_kwargs())
             self._is_connected = True
             print(f"[Signaling] ✅ Connection successful.")
         except (ConnectionRefusedError, InvalidStatus, OSError) as e:
@@ -38,12 +67,23 @@ class SignalingClient:
         if not self.ws:
             return
         try:
-            async for message in self.ws:
+            while True:
                 try:
-                    data = json.loads(message)
-                    await self.on_message_callback(data)
-                except json.JSONDecodeError:
-                    print(f"[Signaling] ⚠️ Received non-JSON message.")
+                    await self._receive_loop()
+                    break
+                except ConnectionClosed as e:
+                    # Restart or dropped connection: come back with resume_from (and our
+                    # token), so the hub replays what we missed
+                    code = e.rcvd.code if e.rcvd else None
+                    if code in FINAL_CLOSE_CODES:
+                        raise
+                    self._is_connected = False
+                    if code == RESTART_CLOSE_CODE:
+                        print("[Signaling] 🔁 Hub restarting, reconnecting...")
+                    else:
+                        print(f"[Signaling] 🔁 Connection lost ({code}), reconnecting...")
+                    if not await self._reconnect():
+                        raise
         except ConnectionClosed:
             print("[Signaling] 🔌 Connection closed.")
         except Exception as e:
@@ -51,11 +91,44 @@ class SignalingClient:
         finally:
             self._is_connected = False
 
-    async def send(self, data: dict):
-        """Sends a JSON message over the WebSocket."""
+    async def _receive_loop(self):
+        async for message in self.ws:
+            try:
+                data = decode_frame(message)
+            except ValueError:
+                print(f"[Signaling] ⚠️ Received malformed message.")
+                continue
+            if data.get("type") == "ping":
+                # Hub heartbeat: answer so we are not evicted as a dead socket
+                await self.send({"type": "pong", "ts": data.get("ts")})
+                continue
+            if data.get("type") == "session":
+                self.resume_token = data.get("resume_token")
+                self.codec = data.get("codec") or codec.JSON
+                continue
+            if not self.seq.accept(data):
+                continue
+            await self.on_message_callback(data)
+
+    async def _reconnect(self) -> bool:
+        """Reconnect with resume_from and our token: re-attach after a restart, or rejoin and catch up."""
+        for attempt in range(RECONNECT_ATTEMPTS):
+            await asyncio.sleep(min(0.5 * 2 ** attempt, 5.0))
+            try:
+                await self.connect()
+                return True
+            except Exception:
+                continue
+        return False
+
+    async def send(self, data: dict, payload: bytes = None):
+        """Sends a JSON message, or a binary frame with `data` as its header when raw `payload` is given."""
         if self.ws and self.is_connected:
             try:
-                await self.ws.send(json.dumps(data))
+                if payload is not None:
+                    await self.ws.send(pack_binary(data, payload))
+                else:
+                    await self.ws.send(encode_message(data, self.codec))
             except ConnectionClosed:
                 self._is_connected = False
                 print("[Signaling] ⚠️ Attempted to send on a closed connection.")
@@ -6,9 +6,12 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import os
 from recording_bot import RecordingBot
+from signaling.mux_client import MuxClient
 
 # --- Configuration ---
 WEBSOCKET_URL = os.getenv("WEBSOCKET_URL", "ws://127.0.0.1:8000/ws")
+# One multiplexed hub connection for every recording (0 = a socket per room)
+SIGNALING_MUX = os.getenv("SIGNALING_MUX", "1") == "1"
 
 # --- DEFINITIVE FIX for FileNotFoundError: Locate ffmpeg.exe ---
 # Get the directory of the current script
@@ -26,6 +29,7 @@ if not os.path.exists(FFMPEG_PATH):
 app = FastAPI(title="Meeting Recording Service")
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
 active_bots: dict[str, RecordingBot] = {}
+mux = MuxClient(WEBSOCKET_URL, os.getenv("RECORDER_CLIENT_ID", "recorder")) if SIGNALING_MUX else None
 
 class RecordingRequest(BaseModel):
     room_id: str
@@ -38,7 +42,7 @@ async def start_recording(request: RecordingRequest):
     try:
         bot_id = f"RecorderBot-{room_id[:8]}"
         # Pass the absolute path to the bot
-        bot = RecordingBot(room_id, bot_id, WEBSOCKET_URL, ffmpeg_path=FFMPEG_PATH)
+        bot = RecordingBot(room_id, bot_id, WEBSOCKET_URL, ffmpeg_path=FFMPEG_PATH, mux=mux)
         active_bots[room_id] = bot
         asyncio.create_task(bot.connect_and_record())
         await asyncio.sleep(2)
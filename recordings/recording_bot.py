@@ -1,13 +1,22 @@
 import asyncio
 from aiortc import MediaStreamTrack
 from core.signaling_client import SignalingClient
+from signaling.mux_client import MuxClient
 from core.rtc_peer import RTCPeerManager
 from recording_manager import RecordingManager
 
+# All the recorder acts on; the hub skips chat, content and status for us
+SUBSCRIBED_TYPES = ("signal", "user_list")
+
 class RecordingBot:
-    def __init__(self, room_id: str, bot_id: str, server_url: str, ffmpeg_path: str = "ffmpeg"):
+    def __init__(self, room_id: str, bot_id: str, server_url: str, ffmpeg_path: str = "ffmpeg", mux: MuxClient = None):
         self.room_id = room_id; self.bot_id = bot_id; self.state_lock = asyncio.Lock()
-        self.signaling = SignalingClient(server_url, room_id, bot_id, self._on_signaling_message)
+        self.roster_version = 0
+        # With a shared MuxClient every room rides on one hub connection
+        if mux is not None:
+            self.signaling = mux.channel(room_id, bot_id, self._on_signaling_message, SUBSCRIBED_TYPES)
+        else:
+            self.signaling = SignalingClient(server_url, room_id, bot_id, self._on_signaling_message, SUBSCRIBED_TYPES)
         self.peer_manager = RTCPeerManager(self, on_track_callback=self._on_new_track)
         self.recorder = RecordingManager(output_dir="recordings", ffmpeg_path=ffmpeg_path)
 
@@ -96,10 +105,35 @@ class RecordingBot:
         if msg_type != "speaker_update":
             self.log(f"Received WS message: {msg_type}")
         if msg_type == "user_list":
+            self.roster_version = max(self.roster_version, data.get("version") or 0)
             async with self.state_lock:
                 for user_id in [u for u in data.get("users", []) if u != self.bot_id]:
                     if user_id not in self.peer_manager.peers:
                         self.log(f"User '{user_id}' found. Initiating connection...")
                         await self.peer_manager.create_peer(user_id, initiator=True)
+        elif msg_type in ("user_joined", "user_left"):
+            await self._on_presence_delta(msg_type, data)
         elif msg_type == "signal" and data.get("from") != self.bot_id:
-            await self.peer_manager.handle_signal(data)
\ No newline at end of file
+            await self.peer_manager.handle_signal(data)
+
+    async def _on_presence_delta(self, msg_type: str, data: dict):
+        version, user_id = data.get("version"), data.get("user_id")
+        if version is not None:
+            if version <= self.roster_version:
+                return
+            if version != self.roster_version + 1:
+                # Missed a delta: resync from a full snapshot
+                await self.signaling.send({"type": "get_user_list"})
+                return
+            self.roster_version = version
+        if not user_id or user_id == self.bot_id:
+            return
+        async with self.state_lock:
+            if msg_type == "user_joined":
+                if user_id not in self.peer_manager.peers:
+                    self.log(f"User '{user_id}' joined. Initiating connection...")
+                    await self.peer_manager.create_peer(user_id, initiator=True)
+            else:
+                pc = self.peer_manager.peers.pop(user_id, None)
+                if pc and pc.connectionState != "closed":
+                    await pc.close()
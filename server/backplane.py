@@ -0,0 +1,428 @@
+# backplane.py
+"""
+Cross-worker room backplane.
+
+Each hub worker keeps the sockets of its own members; the backplane shares
+room membership and host election between workers and relays frames to the
+workers that hold the other members of a room.
+
+BACKPLANE_URL selects the backend:
+  - unset / "memory://"      -> LocalBackplane (single process, used in tests)
+  - "redis://" / "rediss://" -> RedisBackplane (any Redis-compatible server)
+"""
+import asyncio
+import json
+import os
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from frames import Frame
+
+BACKPLANE_URL = os.getenv("BACKPLANE_URL", "memory://")
+BACKPLANE_PREFIX = os.getenv("BACKPLANE_PREFIX", "hub")
+# How long a worker stays "alive" in Redis without refreshing its heartbeat key
+NODE_TTL_SECONDS = int(os.getenv("BACKPLANE_NODE_TTL", "30"))
+
+# deliver(room_id, frame, sender_id, target) -> fan-out to local members only;
+# target is None (whole room), one user id or a list of user ids
+Target = Union[None, str, List[str]]
+DeliverCallback = Callable[[str, Frame, Optional[str], Target], Awaitable[None]]
+
+
+class Backplane:
+    """Interface shared by all backplane backends."""
+
+    def __init__(self):
+        self.node_id = uuid.uuid4().hex[:12]
+        self._deliver: Optional[DeliverCallback] = None
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+
+    async def stop(self):
+        pass
+
+    async def join(self, room_id: str, user_id: str):
+        raise NotImplementedError
+
+    async def leave(self, room_id: str, user_id: str) -> bool:
+        """Remove a member. False if it was not a member here (gone, or re-joined elsewhere)."""
+        raise NotImplementedError
+
+    async def members(self, room_id: str) -> List[str]:
+        raise NotImplementedError
+
+    async def claim_host(self, room_id: str, user_id: str) -> Optional[str]:
+        """Make user_id the host unless the room already has one. Returns the host."""
+        raise NotImplementedError
+
+    async def get_host(self, room_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def bump_roster_version(self, room_id: str) -> int:
+        """Advance and return the room's roster version (monotonic while the room exists)."""
+        raise NotImplementedError
+
+    async def roster_version(self, room_id: str) -> int:
+        raise NotImplementedError
+
+    async def next_seq(self, room_id: str) -> int:
+        """Allocate the next room sequence number for a replayable broadcast."""
+        raise NotImplementedError
+
+    async def current_seq(self, room_id: str) -> int:
+        raise NotImplementedError
+
+    async def save_state(self, room_id: str, frame: Frame, sender_id: str = None):
+        """Keep `frame` as the room's latest state of its type from `sender_id`."""
+        raise NotImplementedError
+
+    async def room_state(self, room_id: str) -> List[Frame]:
+        """Latest state frames of a room, oldest first."""
+        raise NotImplementedError
+
+    async def forget_sender(self, room_id: str, sender_id: str):
+        """Drop the state frames `sender_id` left behind (it is gone for good)."""
+        raise NotImplementedError
+
+    async def clear_room(self, room_id: str):
+        raise NotImplementedError
+
+    async def restore_room(self, room_id: str, members: List[str], host_id: Optional[str],
+                           version: int, seq: int, state: List[Frame]):
+        """Bring back a room saved by a previous process; its members now live on this worker."""
+        raise NotImplementedError
+
+    async def subscribe(self, room_id: str):
+        """Start receiving frames for a room that now has local members."""
+        pass
+
+    async def unsubscribe(self, room_id: str):
+        pass
+
+    async def publish(self, room_id: str, frame: Frame, sender_id: str = None, target: Target = None):
+        """Relay a frame to the other workers (local delivery is the caller's job)."""
+        pass
+
+
+class LocalBackplane(Backplane):
+    """In-process backend: one worker, nothing to relay."""
+
+    def __init__(self):
+        super().__init__()
+        self._members: Dict[str, Dict[str, None]] = {}
+        self._hosts: Dict[str, str] = {}
+        self._versions: Dict[str, int] = {}
+        self._seqs: Dict[str, int] = {}
+        self._states: Dict[str, Dict[tuple, Frame]] = {}
+
+    async def join(self, room_id: str, user_id: str):
+        self._members.setdefault(room_id, {})[user_id] = None
+
+    async def leave(self, room_id: str, user_id: str) -> bool:
+        members = self._members.get(room_id)
+        if members is None or user_id not in members:
+            return False
+        del members[user_id]
+        if not members:
+            self._members.pop(room_id, None)
+        return True
+
+    async def members(self, room_id: str) -> List[str]:
+        return list(self._members.get(room_id, ()))
+
+    async def claim_host(self, room_id: str, user_id: str) -> Optional[str]:
+        return self._hosts.setdefault(room_id, user_id)
+
+    async def get_host(self, room_id: str) -> Optional[str]:
+        return self._hosts.get(room_id)
+
+    async def bump_roster_version(self, room_id: str) -> int:
+        version = self._versions.get(room_id, 0) + 1
+        self._versions[room_id] = version
+        return version
+
+    async def roster_version(self, room_id: str) -> int:
+        return self._versions.get(room_id, 0)
+
+    async def next_seq(self, room_id: str) -> int:
+        seq = self._seqs.get(room_id, 0) + 1
+        self._seqs[room_id] = seq
+        return seq
+
+    async def current_seq(self, room_id: str) -> int:
+        return self._seqs.get(room_id, 0)
+
+    async def save_state(self, room_id: str, frame: Frame, sender_id: str = None):
+        states = self._states.setdefault(room_id, {})
+        key = (frame.type, sender_id)
+        # Re-insert so the dict stays in update order
+        states.pop(key, None)
+        states[key] = Frame(frame.type, frame.data, sender_id, frame.seq, frame.excluded)
+
+    async def room_state(self, room_id: str) -> List[Frame]:
+        return list(self._states.get(room_id, {}).values())
+
+    async def forget_sender(self, room_id: str, sender_id: str):
+        states = self._states.get(room_id, {})
+        for key in [k for k in states if k[1] == sender_id]:
+            del states[key]
+
+    async def clear_room(self, room_id: str):
+        self._members.pop(room_id, None)
+        self._hosts.pop(room_id, None)
+        self._versions.pop(room_id, None)
+        self._seqs.pop(room_id, None)
+        self._states.pop(room_id, None)
+
+    async def restore_room(self, room_id, members, host_id, version, seq, state):
+        for user_id in members:
+            await self.join(room_id, user_id)
+        if host_id:
+            self._hosts.setdefault(room_id, host_id)
+        self._versions[room_id] = max(self._versions.get(room_id, 0), version)
+        self._seqs[room_id] = max(self._seqs.get(room_id, 0), seq)
+        for frame in state:
+            await self.save_state(room_id, frame, frame.sender)
+
+
+class RedisBackplane(Backplane):
+    """
+    Redis pub/sub backend.
+
+    Works with any server speaking the Redis protocol (Redis, Valkey, KeyDB)
+    or with an in-memory stand-in passed as `client` (e.g. fakeredis).
+    """
+
+    def __init__(self, url: str = None, client=None, prefix: str = BACKPLANE_PREFIX):
+        super().__init__()
+        if client is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError as e:
+                raise RuntimeError("BACKPLANE_URL points at Redis but the 'redis' package is not installed") from e
+            client = aioredis.from_url(url)
+        self.redis = client
+        self.prefix = prefix
+        self._pubsub = None
+        self._reader: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    # ---------- keys ----------
+
+    def _members_key(self, room_id: str) -> str:
+        return f"{self.prefix}:room:{room_id}:members"
+
+    def _host_key(self, room_id: str) -> str:
+        return f"{self.prefix}:room:{room_id}:host"
+
+    def _version_key(self, room_id: str) -> str:
+        return f"{self.prefix}:room:{room_id}:version"
+
+    def _seq_key(self, room_id: str) -> str:
+        return f"{self.prefix}:room:{room_id}:seq"
+
+    def _state_key(self, room_id: str) -> str:
+        return f"{self.prefix}:room:{room_id}:state"
+
+    def _room_channel(self, room_id: str) -> str:
+        return f"{self.prefix}:room:{room_id}"
+
+    def _node_channel(self, node_id: str) -> str:
+        return f"{self.prefix}:node:{node_id}"
+
+    def _node_key(self, node_id: str) -> str:
+        return f"{self.prefix}:alive:{node_id}"
+
+    # ---------- lifecycle ----------
+
+    async def start(self, deliver: DeliverCallback):
+        await super().start(deliver)
+        await self.redis.set(self._node_key(self.node_id), 1, ex=NODE_TTL_SECONDS)
+        self._pubsub = self.redis.pubsub()
+        # The node channel keeps the subscription alive and carries direct messages
+        await self._pubsub.subscribe(self._node_channel(self.node_id))
+        self._reader = asyncio.create_task(self._read_loop())
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        for task in (self._reader, self._heartbeat):
+            if task and not task.done():
+                task.cancel()
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.close()
+            except Exception:
+                pass
+        try:
+            await self.redis.delete(self._node_key(self.node_id))
+        except Exception:
+            pass
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(NODE_TTL_SECONDS / 3)
+            try:
+                await self.redis.set(self._node_key(self.node_id), 1, ex=NODE_TTL_SECONDS)
+            except Exception as e:
+                print(f"[backplane] ⚠️ heartbeat failed: {e}")
+
+    # ---------- membership ----------
+
+    async def join(self, room_id: str, user_id: str):
+        await self.redis.hset(self._members_key(room_id), user_id, self.node_id)
+
+    async def leave(self, room_id: str, user_id: str) -> bool:
+        # Only remove the entry if it still belongs to this worker
+        key = self._members_key(room_id)
+        owner = await self.redis.hget(key, user_id)
+        if owner is None or _text(owner) != self.node_id:
+            return False
+        await self.redis.hdel(key, user_id)
+        return True
+
+    async def _member_nodes(self, room_id: str) -> Dict[str, str]:
+        """Members mapped to their worker, with members of dead workers pruned."""
+        raw = await self.redis.hgetall(self._members_key(room_id))
+        entries = {_text(uid): _text(node) for uid, node in raw.items()}
+        nodes = sorted(set(entries.values()))
+        if not nodes:
+            return {}
+        alive = await self.redis.mget([self._node_key(n) for n in nodes])
+        dead = {n for n, flag in zip(nodes, alive) if flag is None}
+        if dead:
+            stale = [uid for uid, node in entries.items() if node in dead]
+            await self.redis.hdel(self._members_key(room_id), *stale)
+            entries = {uid: node for uid, node in entries.items() if node not in dead}
+        return entries
+
+    async def members(self, room_id: str) -> List[str]:
+        return list(await self._member_nodes(room_id))
+
+    async def claim_host(self, room_id: str, user_id: str) -> Optional[str]:
+        await self.redis.set(self._host_key(room_id), user_id, nx=True)
+        return await self.get_host(room_id)
+
+    async def get_host(self, room_id: str) -> Optional[str]:
+        host = await self.redis.get(self._host_key(room_id))
+        return _text(host) if host is not None else None
+
+    async def bump_roster_version(self, room_id: str) -> int:
+        return int(await self.redis.incr(self._version_key(room_id)))
+
+    async def roster_version(self, room_id: str) -> int:
+        return int(await self.redis.get(self._version_key(room_id)) or 0)
+
+    async def next_seq(self, room_id: str) -> int:
+        return int(await self.redis.incr(self._seq_key(room_id)))
+
+    async def current_seq(self, room_id: str) -> int:
+        return int(await self.redis.get(self._seq_key(room_id)) or 0)
+
+    async def save_state(self, room_id: str, frame: Frame, sender_id: str = None):
+        field = f"{frame.type}|{sender_id or ''}"
+        await self.redis.hset(self._state_key(room_id), field, _pack(self.node_id, room_id, frame, sender_id, None))
+
+    async def room_state(self, room_id: str) -> List[Frame]:
+        raw = await self.redis.hvals(self._state_key(room_id))
+        frames = [_unpack(blob)[2] for blob in raw]
+        # Hash order is arbitrary; sequenced frames go out in room order
+        frames.sort(key=lambda f: f.seq or 0)
+        return frames
+
+    async def forget_sender(self, room_id: str, sender_id: str):
+        key = self._state_key(room_id)
+        fields = [f for f in await self.redis.hkeys(key) if _text(f).split("|", 1)[1] == sender_id]
+        if fields:
+            await self.redis.hdel(key, *fields)
+
+    async def clear_room(self, room_id: str):
+        await self.redis.delete(
+            self._members_key(room_id), self._host_key(room_id),
+            self._version_key(room_id), self._seq_key(room_id),
+            self._state_key(room_id),
+        )
+
+    async def restore_room(self, room_id, members, host_id, version, seq, state):
+        # Version, sequence and state normally survive in Redis; only the
+        # membership must move off the old (now dead) worker
+        for user_id in members:
+            await self.join(room_id, user_id)
+        if host_id:
+            await self.redis.set(self._host_key(room_id), host_id, nx=True)
+        await self.redis.set(self._version_key(room_id), version, nx=True)
+        await self.redis.set(self._seq_key(room_id), seq, nx=True)
+        if not await self.redis.exists(self._state_key(room_id)):
+            for frame in state:
+                await self.save_state(room_id, frame, frame.sender)
+
+    # ---------- relay ----------
+
+    async def subscribe(self, room_id: str):
+        await self._pubsub.subscribe(self._room_channel(room_id))
+
+    async def unsubscribe(self, room_id: str):
+        await self._pubsub.unsubscribe(self._room_channel(room_id))
+
+    async def publish(self, room_id: str, frame: Frame, sender_id: str = None, target: Target = None):
+        if target is None:
+            await self.redis.publish(self._room_channel(room_id), _pack(self.node_id, room_id, frame, sender_id, None))
+            return
+        # Directed: one message per worker holding any of the targets
+        nodes = await self._member_nodes(room_id)
+        by_node: Dict[str, List[str]] = {}
+        for uid in ([target] if isinstance(target, str) else target):
+            node = nodes.get(uid)
+            if node and node != self.node_id:
+                by_node.setdefault(node, []).append(uid)
+        for node, uids in by_node.items():
+            routed = uids[0] if len(uids) == 1 else uids
+            await self.redis.publish(self._node_channel(node), _pack(self.node_id, room_id, frame, sender_id, routed))
+
+    async def _read_loop(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    origin, room_id, frame, sender_id, target = _unpack(message["data"])
+                    if origin == self.node_id or not self._deliver:
+                        continue
+                    await self._deliver(room_id, frame, sender_id, target)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[backplane] ⚠️ read loop error: {e}")
+                await asyncio.sleep(1)
+
+
+# ---------- Wire format between workers ----------
+# <json header>\n<frame data>
+
+def _pack(origin: str, room_id: str, frame: Frame, sender_id: str, target: Target) -> bytes:
+    header = {"o": origin, "r": room_id, "k": frame.type, "s": sender_id, "t": target,
+              "b": frame.is_binary, "q": frame.seq}
+    if frame.excluded:
+        header["x"] = sorted(frame.excluded)
+    data = frame.data if frame.is_binary else frame.data.encode("utf-8")
+    return json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n" + bytes(data)
+
+
+def _unpack(blob: bytes):
+    head, _, data = blob.partition(b"\n")
+    header = json.loads(head)
+    body = data if header.get("b") else data.decode("utf-8")
+    sender_id = header.get("s")
+    excluded = frozenset(header["x"]) if header.get("x") else None
+    frame = Frame(header.get("k"), body, sender_id, header.get("q"), excluded)
+    return header["o"], header["r"], frame, sender_id, header.get("t")
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def create_backplane(url: str = BACKPLANE_URL) -> Backplane:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackplane(url)
+    return LocalBackplane()
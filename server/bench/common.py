@@ -0,0 +1,95 @@
+# bench/common.py
+"""Shared helpers for the signaling hub benchmarks (run from the server/ directory)."""
+import asyncio
+import os
+import socket
+import sys
+import time
+from urllib.parse import urlparse
+
+# Make the server modules importable when running `python bench/<script>.py`
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+def use_bench_database(path: str = "bench.db"):
+    """Point the app at a throwaway SQLite file unless DATABASE_URL is already set."""
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(SERVER_DIR, path)}")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def start_server(port: int = None, per_message_deflate: bool = True):
+    """Run main:app in this process. Returns (server, serve_task, base_url)."""
+    import uvicorn
+    from main import app
+
+    port = port or free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws="websockets",
+                            ws_per_message_deflate=per_message_deflate)
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.05)
+    return server, task, f"http://127.0.0.1:{port}"
+
+
+async def stop_server(server, task):
+    server.should_exit = True
+    await task
+
+
+def ws_url(base_url: str) -> str:
+    """http(s)://host -> ws(s)://host/ws"""
+    parsed = urlparse(base_url)
+    scheme = "wss" if parsed.scheme in ("https", "wss") else "ws"
+    return f"{scheme}://{parsed.netloc}/ws"
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def raise_fd_limit(wanted: int):
+    """Many sockets in one process need more descriptors than the usual default of 1024."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        if soft < target:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+
+
+def rss_kb(pid=None) -> int:
+    """Resident memory of a process in KiB (Linux /proc; falls back to peak RSS of this process)."""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def cpu_seconds(pid=None) -> float:
+    """User + system CPU time consumed by a process so far."""
+    if pid is None:
+        return time.process_time()
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
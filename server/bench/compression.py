@@ -0,0 +1,183 @@
+# bench/compression.py
+"""
+CPU/bandwidth trade-off of compressing large signaling payloads.
+
+Runs offline on synthetic but typical frames: rendered Scrum task lists,
+task details and meeting summaries (as content_update), and a chat message
+with an image dataUrl attachment. Each is compared three ways for a room of
+--recipients members:
+
+  plain        no compression: full size on every socket, no CPU
+  per-socket   permessage-deflate: the hub deflates the frame once per
+               recipient (with context takeover, so a socket's window helps
+               repeated HTML)
+  once         sender-compressed frame (frames.compress_message): deflated
+               once by the sender, relayed as-is, inflated by each receiver
+
+Reported per frame type: bytes on the wire per recipient, hub CPU per
+broadcast and receiver CPU per frame.
+
+    cd server
+    python bench/compression.py
+    python bench/compression.py --recipients 50 --tasks 40 --level 1 --json out.json
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import time
+import zlib
+
+# Server modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from frames import compress_message, unpack_binary, decompress_message
+
+STATUSES = ("To Do", "In Progress", "Done", "Stuck")
+OWNERS = ("Asha Rao", "Ben Ortiz", "Chen Wei", "Dana Kim", "Eli Novak", "Farah Aziz")
+
+
+def make_tasks(count: int, rng: random.Random):
+    return [{
+        "title": f"{rng.choice(('Fix', 'Add', 'Refactor', 'Review'))} "
+                 f"{rng.choice(('login flow', 'billing page', 'room roster', 'TTS cache', 'export job'))} #{i}",
+        "status": rng.choice(STATUSES),
+        "owner": (owner := rng.choice(OWNERS)),
+        "owner_initials": "".join(p[0] for p in owner.split()),
+        "due_date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "comments": [f"{owner.split()[0]}: update {n} on progress" for n in range(rng.randint(0, 3))],
+    } for i in range(count)]
+
+
+def task_list_html(tasks) -> str:
+    """Same markup as ai/templates/task_list_template.html."""
+    items = "".join(f"""
+        <div class="bot-task-item {'stuck' if t['status'] == 'Stuck' else ''}">
+            <div class="bot-task-row">
+                <div class="bot-task-title">{t['title']}</div>
+                <div class="bot-task-status {t['status'].lower()}">{t['status']}</div>
+            </div>
+            <div class="bot-task-row">
+                <div class="bot-task-owner">
+                    <div class="bot-task-avatar">{t['owner_initials']}</div>
+                    <div class="bot-task-owner-name">{t['owner']}</div>
+                </div>
+                <div class="bot-task-date">{t['due_date']}</div>
+            </div>
+        </div>""" for t in tasks)
+    return f"""<div class="bot-task-container">
+    <div class="bot-task-header"><h2>Today's Tasks</h2></div>
+    <div class="bot-task-list">{items}
+    </div>
+</div>"""
+
+
+def task_details_html(task) -> str:
+    comments = "".join(f'<li class="bot-comment">{c}</li>' for c in task["comments"]) or "<li>No updates</li>"
+    return f"""<div class="bot-task-details">
+    <div class="bot-task-header"><h2>{task['title']}</h2>
+        <span class="bot-task-status {task['status'].lower()}">{task['status']}</span></div>
+    <div class="bot-task-meta">
+        <div class="bot-task-owner"><div class="bot-task-avatar">{task['owner_initials']}</div>
+            <div class="bot-task-owner-name">{task['owner']}</div></div>
+        <div class="bot-task-date">Due {task['due_date']}</div>
+    </div>
+    <ul class="bot-task-comments">{comments}</ul>
+</div>"""
+
+
+def summary_html(tasks) -> str:
+    rows = "".join(f"<li>{t['title']} ({t['status']}) — {'<br/>'.join(t['comments']) or 'No updates'}</li>"
+                   for t in tasks)
+    return f"<div><h3>Meeting Summary</h3><ul>{rows}</ul></div>"
+
+
+def sample_frames(tasks: int, attachment_kb: int):
+    rng = random.Random(7)
+    task_list = make_tasks(tasks, rng)
+    content = lambda html: {"type": "content_update", "from": "Bot", "to_except": [], "payload": html}
+    # Screenshots are already compressed images: base64 of random bytes is the honest stand-in
+    image = base64.b64encode(rng.randbytes(attachment_kb * 1024)).decode()
+    chat = {"type": "chat_message", "payload": {
+        "id": "u1-1", "from": "u1", "text": "here is the screenshot", "ts": 1700000000000,
+        "attachments": [{"name": "screen.png", "dataUrl": f"data:image/png;base64,{image}"}],
+    }}
+    return {
+        "task_list": [content(task_list_html(task_list))],
+        "task_details": [content(task_details_html(t)) for t in task_list],
+        "meeting_summary": [content(summary_html(task_list))],
+        "chat_attachment": [chat],
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    """Seconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def measure(messages, recipients: int, level: int, repeat: int) -> dict:
+    texts = [json.dumps(m, separators=(",", ":")).encode() for m in messages]
+    plain = sum(map(len, texts)) / len(texts)
+
+    # permessage-deflate: one compressor per socket, window kept across frames
+    def per_socket():
+        sizes = []
+        for _ in range(recipients):
+            z = zlib.compressobj(level, zlib.DEFLATED, -15)
+            sizes.extend(len(z.compress(t) + z.flush(zlib.Z_SYNC_FLUSH)) - 4 for t in texts)
+        return sizes
+
+    socket_sizes = per_socket()
+    socket_cpu = timed(per_socket, max(1, repeat // recipients)) / len(texts)
+
+    frames = [compress_message(m, t.decode(), level) for m, t in zip(messages, texts)]
+    once = sum(map(len, frames)) / len(frames)
+    once_cpu = timed(lambda: [compress_message(m, t.decode(), level) for m, t in zip(messages, texts)],
+                     repeat) / len(texts)
+    inflate_cpu = timed(lambda: [decompress_message(*unpack_binary(f)) for f in frames], repeat) / len(frames)
+
+    return {
+        "frames": len(texts),
+        "bytes_per_recipient": {
+            "plain": round(plain),
+            "per_socket": round(sum(socket_sizes) / len(socket_sizes)),
+            "once": round(once),
+        },
+        "hub_cpu_us_per_broadcast": {"plain": 0.0, "per_socket": round(socket_cpu * 1e6, 1), "once": 0.0},
+        "sender_cpu_us": round(once_cpu * 1e6, 1),
+        "receiver_cpu_us": round(inflate_cpu * 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=20, help="Members receiving each broadcast")
+    parser.add_argument("--tasks", type=int, default=15, help="Tasks on the rendered board")
+    parser.add_argument("--attachment-kb", type=int, default=200, help="Size of the chat image before base64")
+    parser.add_argument("--level", type=int, default=6, help="zlib level (1 = fastest, 9 = smallest)")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{args.recipients} recipients, zlib level {args.level}\n")
+    print(f"{'frame':<16}{'plain B':>10}{'per-socket B':>14}{'once B':>10}"
+          f"{'hub us/bcast':>14}{'sender us':>11}{'recv us':>9}")
+    for name, messages in sample_frames(args.tasks, args.attachment_kb).items():
+        r = results[name] = measure(messages, args.recipients, args.level, args.repeat)
+        size, hub = r["bytes_per_recipient"], r["hub_cpu_us_per_broadcast"]
+        print(f"{name:<16}{size['plain']:>10}{size['per_socket']:>14}{size['once']:>10}"
+              f"{hub['per_socket']:>14}{r['sender_cpu_us']:>11}{r['receiver_cpu_us']:>9}")
+    print("\nhub us/bcast is the per-socket deflate cost; plain and sender-compressed frames cost the hub nothing.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"recipients": args.recipients, "level": args.level, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
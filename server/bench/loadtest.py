@@ -0,0 +1,264 @@
+# bench/loadtest.py
+"""
+Load test for the signaling hub: many rooms full of synthetic clients
+replaying a realistic traffic mix, with relay latency percentiles.
+
+Every room has one bot (sending bot_audio as binary frames plus status
+updates) and human clients that send SDP offers (answered by the peer),
+trickle-ICE bursts, chat and speaking_update bursts. Each message carries
+the sender's send time, so the receiving client (same process, same clock)
+records the relay latency.
+
+Reported: p50/p99/max relay latency, delivered messages per second per
+CPU-second, and memory per connection. With the in-process server, CPU and
+memory cover clients and server together, so treat them as upper bounds;
+pass --server-pid with --url to measure a separately running server alone.
+
+    cd server
+    python bench/loadtest.py --rooms 100 --users 20 --duration 30
+    python bench/loadtest.py --url http://127.0.0.1:8000 --server-pid 12345
+    python bench/loadtest.py --max-p99-ms 50 --min-rate-per-core 20000   # regression gate
+    python bench/loadtest.py --ice-batch   # ICE bursts as one ice_batch signal each
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import (
+    use_bench_database, start_server, stop_server, ws_url, percentile,
+    raise_fd_limit, rss_kb, cpu_seconds,
+)
+
+import websockets
+
+SDP_SIZE = 1800
+AUDIO_SIZE = 24 * 1024
+
+# Relative weights of what a human client sends each tick
+HUMAN_MIX = {"offer": 1, "ice": 3, "chat": 1, "speaking": 4}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.sent = 0
+        self.delivered = 0
+        self.errors = 0
+        self.recording = False
+
+    def received(self, sent_at):
+        self.delivered += 1
+        if self.recording and sent_at is not None:
+            self.latencies.append((time.perf_counter() - sent_at) * 1000)
+
+
+class Client:
+    def __init__(self, base: str, room: str, user: str, peers, stats: Stats, is_bot: bool,
+                 ice_batch: bool = False):
+        self.url = f"{base}/{room}/{user}"
+        self.user = user
+        self.peers = peers
+        self.stats = stats
+        self.is_bot = is_bot
+        self.ice_batch = ice_batch
+        self.ws = None
+        self._seq = 0
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, max_size=None, ping_interval=None)
+
+    async def send(self, msg: dict):
+        msg["lt"] = time.perf_counter()
+        self.stats.sent += 1
+        await self.ws.send(json.dumps(msg))
+
+    async def read_loop(self):
+        try:
+            async for raw in self.ws:
+                if isinstance(raw, bytes):
+                    head_len = int.from_bytes(raw[1:3], "big")
+                    header = json.loads(raw[3:3 + head_len])
+                    self.stats.received(header.get("lt"))
+                    continue
+                msg = json.loads(raw)
+                mtype = msg.get("type")
+                if mtype == "ping":
+                    await self.ws.send(json.dumps({"type": "pong", "ts": msg.get("ts")}))
+                    continue
+                if mtype == "error":
+                    self.stats.errors += 1
+                    continue
+                if mtype == "chat_message":
+                    self.stats.received(msg.get("payload", {}).get("lt"))
+                    continue
+                if "lt" in msg:
+                    self.stats.received(msg["lt"])
+                    if mtype == "signal" and msg.get("action") == "offer":
+                        await self.send({"type": "signal", "action": "answer", "from": self.user,
+                                         "to": msg.get("from"), "payload": {"sdp": "a" * SDP_SIZE}})
+        except Exception:
+            pass
+
+    async def traffic_loop(self, rate: float, stop_at: float):
+        kinds, weights = list(HUMAN_MIX), list(HUMAN_MIX.values())
+        while time.perf_counter() < stop_at:
+            await asyncio.sleep(random.expovariate(rate))
+            try:
+                if self.is_bot:
+                    await self.send_bot_tick()
+                else:
+                    await self.send_human_tick(random.choices(kinds, weights)[0])
+            except Exception:
+                return
+
+    async def send_human_tick(self, kind: str):
+        peer = random.choice([p for p in self.peers if p != self.user])
+        if kind == "offer":
+            await self.send({"type": "signal", "action": "offer", "from": self.user, "to": peer,
+                             "payload": {"sdp": "o" * SDP_SIZE}})
+        elif kind == "ice":
+            candidates = [{"candidate": f"candidate:{i} 1 udp 2122260223 10.0.0.{i} 5{i}000 typ host",
+                           "sdpMid": "0", "sdpMLineIndex": 0} for i in range(4)]
+            if self.ice_batch:
+                await self.send({"type": "signal", "action": "ice_batch", "from": self.user, "to": peer,
+                                 "payload": {"candidates": candidates}})
+                return
+            for candidate in candidates:
+                await self.send({"type": "signal", "action": "ice", "from": self.user, "to": peer,
+                                 "payload": candidate})
+        elif kind == "chat":
+            self._seq += 1
+            await self.ws.send(json.dumps({"type": "chat_message_to_server", "payload": {
+                "id": f"{self.user}-{self._seq}", "text": "hello", "ts": int(time.time() * 1000),
+                "lt": time.perf_counter()}}))
+            self.stats.sent += 1
+        else:
+            for speaking in (True, False, True, False, True):
+                await self.send({"type": "speaking_update", "payload": {"user": self.user, "speaking": speaking}})
+
+    async def send_bot_tick(self):
+        for status in ("thinking", "speaking"):
+            await self.send({"type": "status_update", "payload": {"user": self.user, "status": status}})
+        header = json.dumps({"type": "bot_audio", "from": self.user, "format": "mp3", "lt": time.perf_counter()},
+                            separators=(",", ":")).encode()
+        frame = bytes([1]) + len(header).to_bytes(2, "big") + header + os.urandom(AUDIO_SIZE)
+        self.stats.sent += 1
+        await self.ws.send(frame)
+
+    async def close(self):
+        if self.ws:
+            await self.ws.close()
+
+
+async def run(args) -> int:
+    raise_fd_limit(args.rooms * args.users * 3 + 256)
+    server = task = None
+    base_url, pid = args.url, args.server_pid
+    if not base_url:
+        use_bench_database("bench_load.db")
+        server, task, base_url = await start_server()
+    base = ws_url(base_url)
+
+    stats = Stats()
+    clients = []
+    for r in range(args.rooms):
+        users = [f"Bot{r}"] + [f"user{r}-{u}" for u in range(1, args.users)]
+        for i, user in enumerate(users):
+            clients.append(Client(base, f"load-room-{r}", user, users, stats, is_bot=i == 0,
+                                  ice_batch=args.ice_batch))
+
+    try:
+        mem_before = rss_kb(pid)
+        sem = asyncio.Semaphore(args.connect_concurrency)
+
+        async def connect(c):
+            async with sem:
+                await c.connect()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(connect(c) for c in clients))
+        print(f"Connected {len(clients)} clients in {time.perf_counter() - t0:.1f}s")
+        readers = [asyncio.create_task(c.read_loop()) for c in clients]
+        await asyncio.sleep(1.0)
+        mem_per_conn = (rss_kb(pid) - mem_before) / len(clients)
+
+        stop_at = time.perf_counter() + args.warmup + args.duration
+        senders = [asyncio.create_task(c.traffic_loop(args.rate, stop_at)) for c in clients]
+        await asyncio.sleep(args.warmup)
+        stats.recording = True
+        delivered0, cpu0, t1 = stats.delivered, cpu_seconds(pid), time.perf_counter()
+        await asyncio.gather(*senders)
+        await asyncio.sleep(args.drain)
+        elapsed = time.perf_counter() - t1
+        delivered, cpu = stats.delivered - delivered0, cpu_seconds(pid) - cpu0
+        stats.recording = False
+
+        await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+        for t in readers:
+            t.cancel()
+    finally:
+        if server:
+            await stop_server(server, task)
+
+    p50, p99 = percentile(stats.latencies, 50), percentile(stats.latencies, 99)
+    rate_per_core = delivered / cpu if cpu else 0.0
+    result = {
+        "clients": len(clients),
+        "delivered": delivered,
+        "delivered_per_sec": round(delivered / elapsed, 1),
+        "delivered_per_cpu_sec": round(rate_per_core, 1),
+        "latency_ms": {"p50": round(p50, 2), "p99": round(p99, 2), "max": round(max(stats.latencies, default=0), 2)},
+        "memory_kb_per_connection": round(mem_per_conn, 1),
+        "error_frames": stats.errors,
+    }
+    print(f"Delivered {delivered} messages in {elapsed:.1f}s ({result['delivered_per_sec']}/s)")
+    print(f"Relay latency p50/p99/max: {p50:.2f} / {p99:.2f} / {result['latency_ms']['max']} ms")
+    print(f"Throughput per core: {rate_per_core:.0f} msgs/CPU-second"
+          f"{'' if pid else ' (clients + server)'}")
+    print(f"Memory per connection: {mem_per_conn:.1f} KiB{'' if pid else ' (clients + server)'}")
+    if stats.errors:
+        print(f"Error frames from the hub: {stats.errors}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    failures = []
+    if args.max_p99_ms and p99 > args.max_p99_ms:
+        failures.append(f"p99 {p99:.2f} ms > {args.max_p99_ms} ms")
+    if args.min_rate_per_core and rate_per_core < args.min_rate_per_core:
+        failures.append(f"{rate_per_core:.0f} msgs/CPU-second < {args.min_rate_per_core}")
+    if args.max_mem_kb and mem_per_conn > args.max_mem_kb:
+        failures.append(f"{mem_per_conn:.1f} KiB per connection > {args.max_mem_kb}")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        return 1
+    print("OK")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default: start one in-process)")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, for its CPU and memory")
+    parser.add_argument("--rooms", type=int, default=100)
+    parser.add_argument("--users", type=int, default=20, help="Clients per room, including its bot")
+    parser.add_argument("--rate", type=float, default=1.0, help="Traffic ticks per second per client")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for in-flight messages")
+    parser.add_argument("--connect-concurrency", type=int, default=200)
+    parser.add_argument("--ice-batch", action="store_true", help="Send each ICE burst as one ice_batch signal")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if p99 relay latency exceeds this")
+    parser.add_argument("--min-rate-per-core", type=float, help="Fail below this many msgs/CPU-second")
+    parser.add_argument("--max-mem-kb", type=float, help="Fail above this many KiB per connection")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# bench/roster.py
+"""
+Room bookkeeping at --connections concurrent members: memory per room and
+the cost of sending everyone the roster.
+
+Runs offline against the hub's own code (socket_main with the in-process
+backplane); nothing listens on a port and the sockets are stand-ins. Members
+are split into rooms of --room-size and two layouts are compared:
+
+  dicts     the previous member table, {user_id: {"ws", "conn", "token"}},
+            with the user_list rebuilt and serialized for every recipient
+  slotted   room_actor.Member per member plus the room's cached Roster, so
+            one user_list frame per roster version is shared by everyone
+
+Reported: member-table bytes per room (tracemalloc), and the time for a
+roster broadcast, every member of every room receiving a user_list (what a
+reconnect wave or a burst of get_user_list requests costs the hub).
+
+    cd server
+    python bench/roster.py
+    python bench/roster.py --connections 10000 --room-size 200 --json out.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import use_bench_database
+
+use_bench_database("bench_roster.db")
+import socket_main  # noqa: E402
+from frames import Frame  # noqa: E402
+from room_actor import Member, RoomActor  # noqa: E402
+from snapshot import new_token  # noqa: E402
+
+
+class StubConn:
+    """Counts what would be queued; the real Connection is the same in both layouts."""
+
+    __slots__ = ("user_id", "frames", "bytes")
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.frames = 0
+        self.bytes = 0
+
+    def send(self, frame: Frame) -> bool:
+        self.frames += 1
+        self.bytes += len(frame)
+        return True
+
+
+def layout(connections: int, room_size: int):
+    """{room_id: [(user_id, conn, token)]}, built before anything is measured."""
+    rooms = {}
+    for i in range(connections):
+        room_id = f"room-{i // room_size:05d}"
+        user_id = f"user-{i:06d}-{room_id[-5:]}"
+        rooms.setdefault(room_id, []).append((user_id, StubConn(user_id), new_token()))
+    return rooms
+
+
+def traced(build) -> tuple:
+    """Run build() and return (result, bytes it left allocated)."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    grown = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return result, grown
+
+
+async def roster_broadcast_dicts(tables: dict) -> float:
+    """Previous path: every recipient gets a freshly listed and serialized roster."""
+    backplane = socket_main.backplane
+    start = time.perf_counter()
+    for room_id, users in tables.items():
+        version = await backplane.roster_version(room_id)
+        for info in users.values():
+            info["conn"].send(Frame.from_message({
+                "type": "user_list",
+                "users": await backplane.members(room_id),
+                "version": version,
+            }))
+    return time.perf_counter() - start
+
+
+async def roster_broadcast_slotted(rooms: dict) -> float:
+    """Current path: socket_main.send_user_list with the per-room Roster cache."""
+    start = time.perf_counter()
+    for room_id, room in rooms.items():
+        for member in room.users.values():
+            await socket_main.send_user_list(room_id, member.conn)
+    return time.perf_counter() - start
+
+
+async def run(connections: int, room_size: int, repeat: int) -> dict:
+    members = layout(connections, room_size)
+    for room_id, entries in members.items():
+        for user_id, _, _ in entries:
+            await socket_main.backplane.join(room_id, user_id)
+        await socket_main.backplane.bump_roster_version(room_id)
+
+    tables, dict_bytes = traced(lambda: {
+        room_id: {uid: {"ws": None, "conn": conn, "token": token} for uid, conn, token in entries}
+        for room_id, entries in members.items()
+    })
+
+    # Actors are created outside the trace: only the member tables are compared
+    for room_id in members:
+        socket_main.rooms[room_id] = RoomActor(room_id, on_idle=lambda room: None)
+
+    def fill():
+        for room_id, entries in members.items():
+            socket_main.rooms[room_id].users.update((uid, Member(conn, token)) for uid, conn, token in entries)
+    _, slotted_bytes = traced(fill)
+
+    dict_time = min([await roster_broadcast_dicts(tables) for _ in range(repeat)])
+    # The first broadcast builds each room's frame; later ones only reuse it
+    cold_time = await roster_broadcast_slotted(socket_main.rooms)
+    warm_time = min([await roster_broadcast_slotted(socket_main.rooms) for _ in range(repeat)])
+
+    for room in list(socket_main.rooms.values()):
+        await room.stop()
+    socket_main.rooms.clear()
+
+    room_count = len(members)
+    return {
+        "connections": connections,
+        "rooms": room_count,
+        "room_size": room_size,
+        "member_table_bytes_per_room": {
+            "dicts": round(dict_bytes / room_count),
+            "slotted": round(slotted_bytes / room_count),
+        },
+        "roster_broadcast_ms": {
+            "dicts": round(dict_time * 1000, 2),
+            "slotted_first": round(cold_time * 1000, 2),
+            "slotted": round(warm_time * 1000, 2),
+        },
+        "roster_frames_serialized": {"dicts": connections, "slotted": room_count},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=10000, help="Members across all rooms")
+    parser.add_argument("--room-size", type=int, default=50, help="Members per room")
+    parser.add_argument("--repeat", type=int, default=3, help="Broadcasts timed per layout (best is kept)")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    r = asyncio.run(run(args.connections, args.room_size, args.repeat))
+    size, cost = r["member_table_bytes_per_room"], r["roster_broadcast_ms"]
+    print(f"{r['connections']} connections in {r['rooms']} rooms of {r['room_size']}\n")
+    print(f"{'layout':<10}{'bytes/room':>12}{'roster bcast ms':>18}{'frames built':>14}")
+    print(f"{'dicts':<10}{size['dicts']:>12}{cost['dicts']:>18}{r['roster_frames_serialized']['dicts']:>14}")
+    print(f"{'slotted':<10}{size['slotted']:>12}{cost['slotted']:>18}{r['roster_frames_serialized']['slotted']:>14}")
+    print(f"\nslotted, first broadcast after a membership change: {cost['slotted_first']} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(r, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
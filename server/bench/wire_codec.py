@@ -0,0 +1,147 @@
+# bench/wire_codec.py
+"""
+JSON vs MessagePack for typical signaling messages: size on the wire and
+parse cost.
+
+Runs offline on synthetic but typical messages:
+
+  signal_offer      an SDP offer (audio + video, the size browsers produce)
+  signal_ice_batch  one trickle burst sent as ice_batch
+  progress_update   the Scrum persona's meeting progress (tasks, index, state)
+  content_update    the rendered task board (same HTML as bench/compression.py)
+
+Reported per message: bytes in each codec, sender encode and receiver decode
+time, and what MessagePack costs the hub, which routes in JSON: converting an
+inbound MessagePack message to JSON text (codec.to_json), and packing a JSON
+frame for MessagePack recipients (codec.packed; once per frame, not per
+recipient). Without the optional msgpack package only the JSON column is
+measured.
+
+    cd server
+    python bench/wire_codec.py
+    python bench/wire_codec.py --tasks 40 --repeat 2000 --json out.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+# Sibling benchmarks, then the server modules
+sys.path[:0] = [BENCH_DIR, os.path.dirname(BENCH_DIR)]
+import codec  # noqa: E402
+from compression import make_tasks, task_list_html  # noqa: E402
+from frames import Frame  # noqa: E402
+
+
+def sdp_offer(rng: random.Random) -> str:
+    """An audio + video offer with the usual codec and extension lines."""
+    ufrag, pwd = rng.randbytes(4).hex(), rng.randbytes(12).hex()
+    fingerprint = ":".join(f"{b:02X}" for b in rng.randbytes(32))
+    lines = ["v=0", f"o=- {rng.getrandbits(62)} 2 IN IP4 127.0.0.1", "s=-", "t=0 0",
+             "a=group:BUNDLE 0 1", "a=extmap-allow-mixed", "a=msid-semantic: WMS stream"]
+    media = (("audio", "111 63 9 0 8 13 110 126", ("opus/48000/2", "red/48000/2", "G722/8000", "PCMU/8000",
+                                                   "PCMA/8000", "CN/8000", "telephone-event/48000",
+                                                   "telephone-event/8000")),
+             ("video", "96 97 102 103 104 105 106 107", ("VP8/90000", "rtx/90000", "H264/90000", "rtx/90000",
+                                                         "H264/90000", "rtx/90000", "VP9/90000", "rtx/90000")))
+    for mid, (kind, pts, names) in enumerate(media):
+        lines += [f"m={kind} 9 UDP/TLS/RTP/SAVPF {pts}", "c=IN IP4 0.0.0.0", "a=rtcp:9 IN IP4 0.0.0.0",
+                  f"a=ice-ufrag:{ufrag}", f"a=ice-pwd:{pwd}", "a=ice-options:trickle",
+                  f"a=fingerprint:sha-256 {fingerprint}", "a=setup:actpass", f"a=mid:{mid}",
+                  "a=extmap:1 urn:ietf:params:rtp-hdrext:ssrc-audio-level",
+                  "a=extmap:2 http://www.webrtc.org/experiments/rtp-hdrext/abs-send-time",
+                  "a=extmap:3 http://www.ietf.org/id/draft-holmer-rmcat-transport-wide-cc-extensions-01",
+                  "a=sendrecv", f"a=msid:stream {kind}-track", "a=rtcp-mux", "a=rtcp-rsize"]
+        for pt, name in zip(pts.split(), names):
+            lines += [f"a=rtpmap:{pt} {name}", f"a=rtcp-fb:{pt} transport-cc", f"a=rtcp-fb:{pt} nack"]
+        lines.append(f"a=ssrc:{rng.getrandbits(31)} cname:{rng.randbytes(8).hex()}")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def sample_messages(tasks: int) -> dict:
+    rng = random.Random(7)
+    task_list = make_tasks(tasks, rng)
+    candidates = [{"candidate": f"candidate:{rng.getrandbits(32)} 1 udp {2122260223 - i} 192.168.1.{i + 10} "
+                                f"{rng.randint(40000, 65000)} typ host generation 0 ufrag abcd network-id 1",
+                   "sdpMid": "0", "sdpMLineIndex": 0} for i in range(6)]
+    return {
+        "signal_offer": {"type": "signal", "to": "u2", "action": "offer", "from": "u1",
+                         "payload": {"type": "offer", "sdp": sdp_offer(rng)}},
+        "signal_ice_batch": {"type": "signal", "to": "u2", "action": "ice_batch", "from": "u1",
+                             "payload": {"candidates": candidates}},
+        "progress_update": {"type": "progress_update", "from": "Bot", "payload": {
+            "tasks": task_list, "current_task_index": 3, "state": "discussing_task",
+            "start_time": "2025-06-02T09:30:00", "end_time": None,
+        }},
+        "content_update": {"type": "content_update", "from": "Bot", "to_except": [],
+                           "payload": task_list_html(task_list)},
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    """Microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def measure(msg: dict, repeat: int) -> dict:
+    text = codec.encode(msg, codec.JSON)
+    r = {
+        "bytes": {codec.JSON: len(text.encode("utf-8"))},
+        "encode_us": {codec.JSON: round(timed(lambda: codec.encode(msg, codec.JSON), repeat), 2)},
+        "decode_us": {codec.JSON: round(timed(lambda: json.loads(text), repeat), 2)},
+    }
+    if codec.MSGPACK not in codec.AVAILABLE:
+        return r
+    packed = codec.encode(msg, codec.MSGPACK)
+    r["bytes"][codec.MSGPACK] = len(packed)
+    r["encode_us"][codec.MSGPACK] = round(timed(lambda: codec.encode(msg, codec.MSGPACK), repeat), 2)
+    r["decode_us"][codec.MSGPACK] = round(timed(lambda: codec.decode(packed), repeat), 2)
+
+    def pack_for_recipients():
+        codec.packed(Frame(msg.get("type"), text))
+
+    r["hub_us"] = {
+        "to_json": round(timed(lambda: codec.to_json(packed), repeat), 2),
+        "packed": round(timed(pack_for_recipients, repeat), 2),
+    }
+    return r
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=15, help="Tasks in the progress and on the board")
+    parser.add_argument("--repeat", type=int, default=1000, help="Timed calls per measurement")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    has_msgpack = codec.MSGPACK in codec.AVAILABLE
+    if not has_msgpack:
+        print("msgpack is not installed: measuring JSON only (pip install msgpack)\n")
+    results = {}
+    print(f"{'message':<18}{'json B':>9}{'msgpack B':>11}{'enc us json/mp':>17}{'dec us json/mp':>17}"
+          f"{'hub in/out us':>16}")
+    for name, msg in sample_messages(args.tasks).items():
+        r = results[name] = measure(msg, args.repeat)
+        size, enc, dec = r["bytes"], r["encode_us"], r["decode_us"]
+        hub = r.get("hub_us", {})
+        print(f"{name:<18}{size[codec.JSON]:>9}{size.get(codec.MSGPACK, '-'):>11}"
+              f"{enc[codec.JSON]:>9}/{enc.get(codec.MSGPACK, '-'):<7}"
+              f"{dec[codec.JSON]:>9}/{dec.get(codec.MSGPACK, '-'):<7}"
+              f"{hub.get('to_json', '-'):>9}/{hub.get('packed', '-'):<6}")
+    if has_msgpack:
+        print("\nhub in: MessagePack from a client converted to JSON text; "
+              "hub out: a JSON frame packed once for every MessagePack recipient.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"tasks": args.tasks, "codecs": list(codec.AVAILABLE), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
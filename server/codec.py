@@ -0,0 +1,103 @@
+# codec.py
+"""
+Wire codec for signaling messages, negotiated per connection.
+
+JSON text is the default and what the hub works in internally: frames are
+routed on a peek at their JSON envelope and relayed as-is. A client that
+connects with `?codec=msgpack` is sent MessagePack instead (binary WebSocket
+frames), and the `session` message tells it which codec it got. Clients may
+send either: text is JSON, a binary message is MessagePack if it starts with
+a map marker and otherwise a binary frame (frames.pack_binary: bot audio,
+compressed JSON), which starts with its version byte.
+
+Inbound MessagePack is converted to JSON text once, on arrival, and the
+sender's bytes are kept on the frame: MessagePack members are sent those
+as-is. Otherwise a frame is packed the first time a MessagePack member needs
+it and the bytes are kept on the frame for every other such member (and on
+the room-tagged copy all multiplexed members of a room share), so fan-out
+encodes once per codec, not once per recipient. Adding "room_seq" to a frame
+that has its MessagePack form splices the key in rather than re-packing.
+
+MessagePack needs the optional `msgpack` package; without it every
+connection negotiates JSON.
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+AVAILABLE = (JSON, MSGPACK) if msgpack is not None else (JSON,)
+
+
+def negotiate(requested) -> str:
+    """The codec for a connection that asked for `requested`: JSON unless we can honour it."""
+    return requested if requested in AVAILABLE else JSON
+
+
+def is_packed(data: bytes) -> bool:
+    """True if binary data is a MessagePack map rather than a binary frame (version byte 0x01)."""
+    return len(data) > 0 and (0x80 <= data[0] <= 0x8F or data[0] in (0xDE, 0xDF))
+
+
+def encode(msg: dict, codec: str = JSON):
+    """One message as JSON text or MessagePack bytes."""
+    if codec == MSGPACK:
+        return msgpack.packb(msg, use_bin_type=True)
+    return json.dumps(msg, separators=(",", ":"))
+
+
+def decode(data) -> dict:
+    """Text is JSON, bytes are MessagePack. Raises ValueError if malformed."""
+    if isinstance(data, str):
+        msg = json.loads(data)
+    elif msgpack is None:
+        raise ValueError("MessagePack is not available on this hub")
+    else:
+        try:
+            msg = msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            raise ValueError(f"bad MessagePack message: {e}") from e
+    if not isinstance(msg, dict):
+        raise ValueError("message must be an object")
+    return msg
+
+
+def to_json(data: bytes) -> str:
+    """An inbound MessagePack message as the JSON text the hub routes and relays."""
+    msg = decode(data)
+    try:
+        return json.dumps(msg, separators=(",", ":"))
+    except TypeError as e:
+        raise ValueError(f"message does not map to JSON: {e}") from e
+
+
+def prepend(packed_map: bytes, key: str, value) -> bytes:
+    """A packed map with one entry added in front; the existing entries are not re-encoded."""
+    head = packed_map[0]
+    if 0x80 <= head <= 0x8F:
+        count, body = head & 0x0F, packed_map[1:]
+    elif head == 0xDE:
+        count, body = int.from_bytes(packed_map[1:3], "big"), packed_map[3:]
+    elif head == 0xDF:
+        count, body = int.from_bytes(packed_map[1:5], "big"), packed_map[5:]
+    else:
+        raise ValueError("not a MessagePack map")
+    count += 1
+    if count <= 0x0F:
+        header = bytes((0x80 | count,))
+    elif count <= 0xFFFF:
+        header = b"\xde" + count.to_bytes(2, "big")
+    else:
+        header = b"\xdf" + count.to_bytes(4, "big")
+    return header + msgpack.packb(key) + msgpack.packb(value, use_bin_type=True) + body
+
+
+def packed(frame) -> bytes:
+    """A JSON text frame as MessagePack, converted once and cached on the frame."""
+    if frame.packed is None:
+        frame.packed = msgpack.packb(json.loads(frame.data), use_bin_type=True)
+    return frame.packed
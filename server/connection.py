@@ -0,0 +1,344 @@
+# connection.py
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Optional
+from fastapi import WebSocket
+import codec
+import metrics
+from frames import Frame, tag_room
+from limits import RateLimiter
+
+# Outbound queue settings (per connected member)
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+# drop_oldest | drop_type | disconnect
+OVERFLOW_POLICY = os.getenv("WS_OVERFLOW_POLICY", "drop_oldest")
+# Message types that may be shed first under the "drop_type" policy
+DROPPABLE_TYPES = frozenset(
+    t.strip()
+    for t in os.getenv(
+        "WS_DROPPABLE_TYPES",
+        "speaking_update,status_update,progress_update,recording_update,bot_message",
+    ).split(",")
+    if t.strip()
+)
+# Status types where only the newest pending value per (sender, type) matters
+COALESCE_TYPES = frozenset(
+    t.strip()
+    for t in os.getenv(
+        "WS_COALESCE_TYPES",
+        "speaking_update,status_update,progress_update,recording_update",
+    ).split(",")
+    if t.strip()
+)
+
+# Hub messages every member gets, whatever it subscribed to
+CONTROL_TYPES = frozenset((
+    "session", "user_list", "user_joined", "user_left", "replay_reset",
+    "end_call", "error", "ping", "pong",
+))
+
+# Outbound queue of a multiplexed bot socket, shared by all of its rooms
+MUX_SEND_QUEUE_SIZE = int(os.getenv("WS_MUX_SEND_QUEUE_SIZE", "4096"))
+
+# Close code sent to a member that cannot keep up with its queue
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class _Slot:
+    """A queue entry; coalescable frames are swapped in place while still pending."""
+
+    __slots__ = ("frame", "queued_at")
+
+    def __init__(self, frame: Frame):
+        self.frame = frame
+        self.queued_at = time.perf_counter()
+
+
+def subscription(types) -> Optional[frozenset]:
+    """
+    Parse a subscription: "a,b" (query string) or ["a", "b"] (message).
+    None or empty means every type; control types are always included.
+    """
+    if isinstance(types, str):
+        types = types.split(",")
+    if not isinstance(types, (list, tuple)):
+        return None
+    wanted = frozenset(t.strip() for t in types if isinstance(t, str) and t.strip())
+    return wanted | CONTROL_TYPES if wanted else None
+
+
+def _coalesce_key(frame: Frame):
+    # A sequenced frame (replay.stamp) must go out in seq order, so it is never swapped forward
+    if frame.sender and frame.type in COALESCE_TYPES and frame.seq is None:
+        return (frame.sender, frame.type)
+    return None
+
+
+class Connection:
+    """
+    One member's WebSocket with a bounded outbound queue and its own writer task.
+
+    Senders only enqueue, so a slow or half-dead browser only ever backs up
+    its own queue instead of stalling the rest of the room. Pending status
+    frames (COALESCE_TYPES) are collapsed per (sender, type), so a client that
+    falls behind gets the latest state rather than a backlog of stale ones.
+    Frames carrying a room seq are exempt: clients rely on their order.
+    """
+
+    def __init__(self, ws: WebSocket, user_id: str, room_id: str,
+                 maxsize: int = SEND_QUEUE_SIZE, policy: str = OVERFLOW_POLICY):
+        self.ws = ws
+        self.user_id = user_id
+        self.room_id = room_id
+        self.maxsize = maxsize
+        self.policy = policy
+        self.dropped = 0
+        self.coalesced = 0
+        # Inbound token buckets (checked by the receive loop)
+        self.limiter = RateLimiter()
+        # Presented HUB_BOT_TOKEN when connecting (limits.trusted_bot): exempt from the room cap
+        self.trusted = False
+        # Monotonic time of the last inbound frame (read by the heartbeat reaper)
+        self.last_seen = time.monotonic()
+        # Message types this member wants (None = all); others are never queued
+        self.subscription: Optional[frozenset] = None
+        # Wire codec negotiated at connect (codec.negotiate); the hub itself works in JSON
+        self.codec = codec.JSON
+        self._queue = deque()
+        # (sender, type) -> pending _Slot for coalescable frames
+        self._latest = {}
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._close_code = SLOW_CONSUMER_CLOSE_CODE
+        self._writer = None
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        """Start the writer task for this connection."""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, frame: Frame) -> bool:
+        """Queue an encoded frame for delivery. Returns False if it was not queued."""
+        if self._closed:
+            return False
+        if self.subscription is not None and frame.type not in self.subscription:
+            metrics.frames_unsubscribed.inc(metrics.type_label(frame.type))
+            return False
+        key = _coalesce_key(frame)
+        if key is not None:
+            pending = self._latest.get(key)
+            if pending is not None:
+                # Newer state replaces the stale one, keeping its place in line
+                pending.frame = frame
+                self.coalesced += 1
+                metrics.frames_coalesced.inc(frame.type)
+                return True
+        if len(self._queue) >= self.maxsize and not self._make_room(frame.type):
+            self._count_drop()
+            return False
+        metrics.messages_out.inc(metrics.type_label(frame.type))
+        slot = _Slot(frame)
+        self._queue.append(slot)
+        if key is not None:
+            self._latest[key] = slot
+        self._wakeup.set()
+        return True
+
+    def touch(self):
+        """Record inbound activity."""
+        self.last_seen = time.monotonic()
+
+    def send_ping(self) -> bool:
+        return self.send(Frame.from_message({"type": "ping", "ts": int(time.time() * 1000)}))
+
+    def _count_drop(self):
+        self.dropped += 1
+        metrics.frames_dropped.inc(self.policy)
+
+    def _forget(self, slot: _Slot):
+        key = _coalesce_key(slot.frame)
+        if key is not None and self._latest.get(key) is slot:
+            del self._latest[key]
+
+    def _make_room(self, mtype) -> bool:
+        """Apply the overflow policy. Returns True if there is now space for one more."""
+        if self.policy == "disconnect":
+            print(f"[socket] 🐢 {self.user_id} queue full in room {self.room_id} → disconnecting")
+            self.abort()
+            return False
+
+        if self.policy == "drop_type":
+            for i, queued in enumerate(self._queue):
+                if queued.frame.type in DROPPABLE_TYPES:
+                    del self._queue[i]
+                    self._forget(queued)
+                    self._count_drop()
+                    return True
+            if mtype in DROPPABLE_TYPES:
+                return False
+            # Nothing left to shed but signaling: the client is too far behind
+            print(f"[socket] 🐢 {self.user_id} backlog is all critical traffic → disconnecting")
+            self.abort()
+            return False
+
+        # drop_oldest
+        self._forget(self._queue.popleft())
+        self._count_drop()
+        return True
+
+    def abort(self, code: int = SLOW_CONSUMER_CLOSE_CODE):
+        """Stop delivering and close the socket from the writer task."""
+        self._close_code = code
+        self._closed = True
+        self._queue.clear()
+        self._latest.clear()
+        self._wakeup.set()
+
+    async def close(self):
+        """Stop the writer task and discard anything still queued."""
+        self._closed = True
+        self._queue.clear()
+        self._latest.clear()
+        if self._writer and not self._writer.done():
+            self._writer.cancel()
+            try:
+                await self._writer
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _write_loop(self):
+        try:
+            while True:
+                if not self._queue:
+                    if self._closed:
+                        break
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                slot = self._queue.popleft()
+                self._forget(slot)
+                frame = slot.frame
+                if self.ws.client_state.name != "CONNECTED":
+                    break
+                if frame.is_binary:
+                    data = frame.data
+                    await self.ws.send_bytes(data)
+                elif self.codec == codec.JSON:
+                    data = frame.data
+                    await self.ws.send_text(data)
+                else:
+                    try:
+                        data = codec.packed(frame)
+                    except ValueError:
+                        # A directed frame is relayed unparsed; one that was never valid JSON can't be packed
+                        continue
+                    await self.ws.send_bytes(data)
+                metrics.bytes_out.inc(amount=len(data))
+                metrics.send_latency.observe(time.perf_counter() - slot.queued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass
+        finally:
+            self._closed = True
+            self._queue.clear()
+            self._latest.clear()
+
+        # Reached only when aborted or the socket went away
+        try:
+            if self.ws.client_state.name == "CONNECTED":
+                await self.ws.close(code=self._close_code)
+        except Exception:
+            pass
+
+
+class MuxConnection(Connection):
+    """
+    A bot's multiplexed socket: one writer and one queue for every room it is
+    in. Each room sees the bot through its own MuxMember.
+    """
+
+    def __init__(self, ws: WebSocket, client_id: str, maxsize: int = MUX_SEND_QUEUE_SIZE,
+                 policy: str = OVERFLOW_POLICY):
+        super().__init__(ws, client_id, None, maxsize, policy)
+        self._pinged_at = 0.0
+
+    def send_ping(self) -> bool:
+        # Every room on the socket goes quiet at once; one ping answers for all of them
+        now = time.monotonic()
+        if now - self._pinged_at < 1.0:
+            return True
+        self._pinged_at = now
+        return super().send_ping()
+
+
+class MuxMember:
+    """
+    One room's view of a MuxConnection. Rooms, the reaper and the metrics use
+    it like a Connection; frames go out room-tagged on the shared socket.
+    """
+
+    def __init__(self, conn: MuxConnection, room_id: str, user_id: str, maxsize: int = SEND_QUEUE_SIZE):
+        self.conn = conn
+        self.ws = conn.ws
+        self.room_id = room_id
+        self.user_id = user_id
+        # Replay budget, as for a dedicated socket
+        self.maxsize = maxsize
+        # Limits apply per room, so a bot in many rooms is not throttled as one member
+        self.limiter = RateLimiter()
+        self.subscription: Optional[frozenset] = None
+        self._closed = False
+
+    @property
+    def codec(self) -> str:
+        return self.conn.codec
+
+    @property
+    def trusted(self) -> bool:
+        return self.conn.trusted
+
+    @property
+    def closed(self) -> bool:
+        return self._closed or self.conn.closed
+
+    @property
+    def queue_depth(self) -> int:
+        return self.conn.queue_depth
+
+    @property
+    def last_seen(self) -> float:
+        return self.conn.last_seen
+
+    def send(self, frame: Frame) -> bool:
+        if self._closed:
+            return False
+        if self.subscription is not None and frame.type not in self.subscription:
+            metrics.frames_unsubscribed.inc(metrics.type_label(frame.type))
+            return False
+        return self.conn.send(tag_room(frame, self.room_id))
+
+    def touch(self):
+        self.conn.touch()
+
+    def send_ping(self) -> bool:
+        return self.conn.send_ping()
+
+    def abort(self, code: int = SLOW_CONSUMER_CLOSE_CODE):
+        # Only reached when the whole socket is dead or hopelessly behind
+        self._closed = True
+        self.conn.abort(code)
+
+    async def close(self):
+        """Leave the room; the shared socket stays up."""
+        self._closed = True
@@ -0,0 +1,125 @@
+# db_writer.py
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import crud
+import metrics
+import schemas
+from database import SessionLocal
+
+# Pending chat messages allowed; past that new ones are relayed but not stored
+DB_WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE_SIZE", "1000"))
+# Max chat messages persisted per off-loop batch
+DB_WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "100"))
+
+
+class DBWriter:
+    """
+    Write-behind persistence for the signaling hub.
+
+    The WebSocket handlers only record what should be written; a background
+    task hands the work to a thread in batches so blocking SQLAlchemy calls
+    never run on the event loop. Meeting-state updates are coalesced per room
+    (only the latest state is written); chat messages are kept in order in a
+    bounded queue that producers never wait on.
+    """
+
+    def __init__(self, session_factory=SessionLocal,
+                 maxsize: int = DB_WRITE_QUEUE_SIZE, batch_size: int = DB_WRITE_BATCH_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self._states: Dict[str, schemas.MeetingStateUpdate] = {}
+        self._chats: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and flush whatever is still pending."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        while self._states or not self._chats.empty():
+            await self._flush_once()
+
+    # ---------- Producers (called from the event loop, never block on the DB) ----------
+
+    def update_meeting_state(self, room_id: str, state):
+        """Record the latest meeting state for a room; earlier pending states are replaced."""
+        self._states.pop(room_id, None)
+        self._states[room_id] = schemas.MeetingStateUpdate(
+            room_id=room_id,
+            state=state,
+            updated_at=datetime.now(timezone.utc),
+        )
+        self._wakeup.set()
+
+    def create_chat_message(self, room_id: str, payload: dict) -> bool:
+        """
+        Queue a chat message without waiting. If the queue is full (the DB is
+        down or far behind) the message is not stored and False is returned;
+        it is still relayed live, and the room is never held up by the DB.
+        """
+        try:
+            self._chats.put_nowait((room_id, payload))
+        except asyncio.QueueFull:
+            metrics.db_chats_dropped.inc()
+            print(f"[db_writer] write queue full, chat in {room_id} not persisted")
+            return False
+        self._wakeup.set()
+        return True
+
+    # ---------- Consumer ----------
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._states or not self._chats.empty():
+                await self._flush_once()
+
+    async def _flush_once(self):
+        states = list(self._states.values())
+        self._states = {}
+        chats: List[Tuple[str, dict]] = []
+        while len(chats) < self.batch_size and not self._chats.empty():
+            chats.append(self._chats.get_nowait())
+        if not (states or chats):
+            return
+        try:
+            await asyncio.to_thread(self._write_batch, states, chats)
+        except Exception as e:
+            # Lose the batch, not the writer: a dead task would leave the queue to fill up
+            print(f"[db_writer] ⚠️ batch failed, {len(states)} states and {len(chats)} chats not written: {e}")
+
+    def _write_batch(self, states, chats):
+        """Runs in a worker thread with its own short-lived session."""
+        db = self.session_factory()
+        try:
+            for state in states:
+                try:
+                    crud.update_meeting_state(db, state)
+                except Exception as e:
+                    db.rollback()
+                    print(f"[db_writer] DB update error for {state.room_id}: {e}")
+            for room_id, payload in chats:
+                try:
+                    crud.create_chat_message(
+                        db,
+                        room_id,
+                        schemas.ChatMessagePayload.model_validate(payload),
+                    )
+                except Exception as e:
+                    db.rollback()
+                    print(f"[db_writer] chat DB error in {room_id}: {e}")
+        finally:
+            db.close()
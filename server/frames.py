@@ -0,0 +1,256 @@
+# frames.py
+import json
+import os
+import re
+import struct
+import zlib
+from json.decoder import scanstring
+from typing import Optional
+
+# ---------- Binary frames ----------
+# Large media (bot TTS audio) travels as a binary WebSocket frame instead of
+# base64 inside JSON:
+#
+#   [1 byte version][2 bytes header length, big-endian][JSON header][raw payload]
+#
+# The header is small ({"type", "from", "to", "format", "seq", ...}) so the hub
+# can route on it without touching the payload.
+BINARY_FRAME_VERSION = 1
+_BINARY_PREFIX = struct.Struct("!BH")
+
+
+def pack_binary(header: dict, payload: bytes) -> bytes:
+    """Build a binary frame from a routing header and a raw payload."""
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return _BINARY_PREFIX.pack(BINARY_FRAME_VERSION, len(head)) + head + payload
+
+
+def read_binary_header(data: bytes) -> dict:
+    """Decode only the header of a binary frame. Raises ValueError if malformed."""
+    if len(data) < _BINARY_PREFIX.size:
+        raise ValueError("binary frame too short")
+    version, head_len = _BINARY_PREFIX.unpack_from(data)
+    if version != BINARY_FRAME_VERSION:
+        raise ValueError(f"unsupported binary frame version {version}")
+    end = _BINARY_PREFIX.size + head_len
+    if len(data) < end:
+        raise ValueError("truncated binary frame header")
+    header = json.loads(bytes(data[_BINARY_PREFIX.size:end]))
+    if not isinstance(header, dict):
+        raise ValueError("binary frame header must be an object")
+    return header
+
+
+def unpack_binary(data: bytes):
+    """Split a binary frame into (header, payload)."""
+    header = read_binary_header(data)
+    start = _BINARY_PREFIX.size + struct.unpack_from("!H", data, 1)[0]
+    return header, bytes(data[start:])
+
+
+# ---------- Compressed frames ----------
+# A large JSON message (rendered HTML, chat with a dataUrl attachment) may be
+# sent as a binary frame instead: the header carries the routing keys plus
+# "enc": "deflate", the payload is the whole message zlib-compressed. The hub
+# routes on the header and relays the compressed bytes to every recipient
+# as-is, so the payload is compressed once by its sender, not once per socket.
+ENC_DEFLATE = "deflate"
+# Encoded messages at least this long are worth compressing
+COMPRESS_THRESHOLD = int(os.getenv("WS_COMPRESS_THRESHOLD", "4096"))
+COMPRESS_LEVEL = int(os.getenv("WS_COMPRESS_LEVEL", "6"))
+HEADER_KEYS = ("room", "type", "from", "to", "to_except", "room_seq")
+
+
+def compress_message(msg: dict, text: str = None, level: int = COMPRESS_LEVEL) -> bytes:
+    """Pack a JSON message as a compressed binary frame."""
+    if text is None:
+        text = json.dumps(msg, separators=(",", ":"))
+    header = {k: msg[k] for k in HEADER_KEYS if k in msg}
+    header["enc"] = ENC_DEFLATE
+    return pack_binary(header, zlib.compress(text.encode("utf-8"), level))
+
+
+def decompress_message(header: dict, payload: bytes, limit: int = 0) -> dict:
+    """
+    Inflate a compressed frame back into its message. Raises ValueError if it is
+    malformed or would inflate past `limit` bytes (0 = no limit).
+    """
+    inflater = zlib.decompressobj()
+    try:
+        body = inflater.decompress(payload, limit)
+    except zlib.error as e:
+        raise ValueError(f"bad compressed frame: {e}") from e
+    if inflater.unconsumed_tail:
+        raise ValueError("compressed frame inflates past the size limit")
+    msg = json.loads(body)
+    if not isinstance(msg, dict):
+        raise ValueError("compressed frame must hold a JSON object")
+    # Header keys win: the hub may have stamped room_seq onto the header only
+    msg.update((k, header[k]) for k in HEADER_KEYS if k in header)
+    return msg
+
+
+# ---------- Routing envelope peek ----------
+# Directed text frames (SDP offers/answers, ICE) are routed on their first
+# keys only: the object is scanned from the start, the routing keys are
+# decoded, and scanning stops before any nested payload. Clients put "type"
+# and "to" ahead of "payload", so the SDP blob is never decoded on the hub.
+# On the multiplexed endpoint "room" comes first and is read the same way.
+ENVELOPE_KEYS = frozenset(("room", "type", "to", "to_except", "from"))
+# Stop looking for routing keys past this many characters
+PEEK_LIMIT = 512
+
+_scan = json.JSONDecoder().scan_once
+_WS = re.compile(r"[ \t\n\r]*")
+_WS_CHARS = " \t\n\r"
+
+
+def peek_envelope(raw: str) -> Optional[dict]:
+    """
+    Decode the routing keys at the start of a JSON object without touching
+    the rest. Returns the keys found (possibly none), or None if the text
+    does not look like a JSON object or a value runs past PEEK_LIMIT (the
+    caller then parses the whole thing). Cost does not grow with the payload.
+    """
+    ws = _WS.match
+    # Scanning a slice bounds every step, including long leading values:
+    # anything cut off at the edge fails to scan and gives up
+    raw = raw[:PEEK_LIMIT]
+    try:
+        idx = 0
+        if raw[0] != "{":
+            idx = ws(raw).end()
+            if raw[idx] != "{":
+                return None
+        found = {}
+        idx += 1
+        while idx < PEEK_LIMIT:
+            if raw[idx] in _WS_CHARS:
+                idx = ws(raw, idx).end()
+            if raw[idx] != '"':
+                break  # "}" of an empty object, or something we don't need to judge
+            key, idx = scanstring(raw, idx + 1)
+            if raw[idx] in _WS_CHARS:
+                idx = ws(raw, idx).end()
+            if raw[idx] != ":":
+                return None
+            idx += 1
+            if raw[idx] in _WS_CHARS:
+                idx = ws(raw, idx).end()
+            if key in ENVELOPE_KEYS:
+                found[key], idx = _scan(raw, idx)
+                if idx >= len(raw):
+                    return None  # possibly cut short (a number) at the edge
+                if "type" in found and "to" in found:
+                    break
+            elif raw[idx] in "{[":
+                break  # never walk into a nested payload
+            else:
+                _, idx = _scan(raw, idx)
+            if raw[idx] in _WS_CHARS:
+                idx = ws(raw, idx).end()
+            if raw[idx] != ",":
+                break
+            idx += 1
+        return found
+    except (ValueError, IndexError, StopIteration):
+        return None
+
+
+class Frame:
+    """
+    An outbound message that has already been encoded.
+
+    A frame is built once per message and the same text/bytes object is handed
+    to every recipient's queue, so fan-out never re-serializes the payload.
+    Treat frames as immutable once created.
+    """
+
+    __slots__ = ("type", "data", "sender", "seq", "excluded", "packed", "tagged")
+
+    def __init__(self, mtype: str, data, sender: str = None, seq: int = None, excluded: frozenset = None):
+        self.type = mtype
+        self.data = data
+        self.sender = sender
+        # Room sequence number for frames kept in the replay buffer
+        self.seq = seq
+        # Members a room-wide frame skips ("to_except"), live and on replay
+        self.excluded = excluded
+        # MessagePack encoding of a text frame: the sender's own bytes if it sent
+        # MessagePack, otherwise filled in by codec.packed on first use
+        self.packed = None
+        # room_id -> copy tagged for multiplexed sockets (tag_room), shared by their members
+        self.tagged = None
+
+    @property
+    def is_binary(self) -> bool:
+        return isinstance(self.data, (bytes, bytearray, memoryview))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @classmethod
+    def from_message(cls, msg: dict) -> "Frame":
+        """Serialize a message exactly once."""
+        return cls(msg.get("type"), json.dumps(msg, separators=(",", ":")))
+
+    @classmethod
+    def from_raw(cls, mtype: str, raw, sender: str = None, packed: bytes = None) -> "Frame":
+        """Wrap an inbound frame so it can be relayed without re-encoding (`packed`: as MessagePack)."""
+        frame = cls(mtype, raw, sender)
+        frame.packed = packed
+        return frame
+
+
+def as_frame(msg) -> Frame:
+    """Accept either a ready Frame or a plain message dict."""
+    return msg if isinstance(msg, Frame) else Frame.from_message(msg)
+
+
+def compact_frame(msg: dict) -> Frame:
+    """Like Frame.from_message, but compressed once if the message is large."""
+    text = json.dumps(msg, separators=(",", ":"))
+    if len(text) < COMPRESS_THRESHOLD:
+        return Frame(msg.get("type"), text)
+    return Frame(msg.get("type"), compress_message(msg, text))
+
+
+def tag_room(frame: Frame, room_id: str) -> Frame:
+    """
+    Copy of a frame carrying "room" for a multiplexed socket (spliced in, no
+    re-encode). The sender is scoped to the room so coalescing on a shared
+    queue never merges two rooms' status. The copy is made once per room and
+    kept on the frame, so every multiplexed member of the room shares it (and
+    its MessagePack encoding).
+    """
+    tagged = frame.tagged.get(room_id) if frame.tagged else None
+    if tagged is None:
+        tagged = _tag_room(frame, room_id)
+        if frame.tagged is None:
+            frame.tagged = {}
+        frame.tagged[room_id] = tagged
+    return tagged
+
+
+def _tag_room(frame: Frame, room_id: str) -> Frame:
+    sender = (room_id, frame.sender) if frame.sender else None
+    if frame.is_binary:
+        header, payload = unpack_binary(frame.data)
+        header["room"] = room_id
+        return Frame(frame.type, pack_binary(header, payload), sender, frame.seq)
+    tag = '{"room":%s' % json.dumps(room_id)
+    body = frame.data.lstrip()
+    if body.startswith(tag + ","):
+        # Relayed from a multiplexed sender in the same room: already tagged
+        tagged = Frame(frame.type, body, sender, frame.seq)
+        tagged.packed = frame.packed
+        return tagged
+    elif not body.startswith("{"):
+        msg = json.loads(body)
+        msg["room"] = room_id
+        text = json.dumps(msg, separators=(",", ":"))
+    elif body[1:].lstrip().startswith("}"):
+        text = tag + "}"
+    else:
+        text = tag + "," + body[1:]
+    return Frame(frame.type, text, sender, frame.seq)
@@ -0,0 +1,107 @@
+# heartbeat.py
+"""
+App-level heartbeat for hub connections.
+
+A half-open TCP connection never makes `receive()` raise, so members behind
+one would stay in the room forever. Every inbound frame refreshes the
+member's `last_seen`; a single reaper task keeps a heap of check deadlines,
+pings members that have gone quiet and evicts the ones that stay silent.
+
+Activity never touches the heap: when a deadline comes up the reaper looks
+at `last_seen` and simply reschedules the connection if it has been active.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from connection import Connection
+
+# Seconds of silence before the hub pings a member
+HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "15"))
+# Seconds of silence before a member is considered dead and evicted
+HEARTBEAT_TIMEOUT = float(os.getenv("WS_HEARTBEAT_TIMEOUT", "45"))
+
+# Close code sent to a member evicted for missing its heartbeats
+HEARTBEAT_CLOSE_CODE = 4008
+
+# evict(conn) -> remove the member from its room and announce it
+EvictCallback = Callable[["Connection"], Awaitable[None]]
+
+
+class Reaper:
+    def __init__(self, interval: float = HEARTBEAT_INTERVAL, timeout: float = HEARTBEAT_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.evicted = 0
+        self._heap: List[Tuple[float, int, object]] = []
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._evict: Optional[EvictCallback] = None
+        self._task = None
+
+    def start(self, evict: EvictCallback):
+        self._evict = evict
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._heap.clear()
+
+    def watch(self, conn):
+        """Start watching a freshly registered connection."""
+        self._schedule(conn, conn.last_seen + self.interval)
+
+    def _schedule(self, conn, deadline: float):
+        wake = not self._heap or deadline < self._heap[0][0]
+        heapq.heappush(self._heap, (deadline, next(self._order), conn))
+        if wake:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, _, conn = heapq.heappop(self._heap)
+            try:
+                await self._check(conn)
+            except Exception as e:
+                print(f"[socket] ⚠️ heartbeat check failed for {conn.user_id}: {e}")
+
+    async def _check(self, conn):
+        if conn.closed:
+            return  # gone already; drop it from the heap
+        now = time.monotonic()
+        idle = now - conn.last_seen
+        if idle >= self.timeout:
+            self.evicted += 1
+            print(f"[socket] 💀 {conn.user_id} silent for {idle:.0f}s in room {conn.room_id} → evicting")
+            conn.abort(HEARTBEAT_CLOSE_CODE)
+            if self._evict:
+                await self._evict(conn)
+            return
+        if idle >= self.interval:
+            conn.send_ping()
+            self._schedule(conn, min(now + self.interval, conn.last_seen + self.timeout))
+        else:
+            self._schedule(conn, conn.last_seen + self.interval)
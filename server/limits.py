@@ -0,0 +1,137 @@
+# limits.py
+"""
+Inbound limits for the signaling hub: per-connection token buckets by message
+category, a maximum frame size (larger for bot audio) and an optional per-room
+member cap.
+
+Signaling gets its own bucket so a client flooding chat or status updates
+uses up its own budget without delaying offers/answers/ICE. Its budget is per
+peer: a member joining a mesh negotiates with every other member at once, so
+the bucket grows with the room.
+"""
+import hmac
+import os
+import time
+from collections import Counter
+
+# Largest inbound frame accepted (text or binary), in bytes
+MAX_FRAME_BYTES = int(os.getenv("WS_MAX_FRAME_BYTES", str(2 * 1024 * 1024)))
+# Binary bot_audio frames may be larger: a long TTS reply is one wav
+MAX_AUDIO_FRAME_BYTES = int(os.getenv("WS_MAX_AUDIO_FRAME_BYTES", str(16 * 1024 * 1024)))
+# Members allowed per room across all workers; 0 (the default) = unlimited
+ROOM_MAX_MEMBERS = int(os.getenv("ROOM_MAX_MEMBERS", "0"))
+# Bearer token bots present to be exempt from the member cap; unset = no exemption
+HUB_BOT_TOKEN = os.getenv("HUB_BOT_TOKEN")
+# Minimum seconds between two error frames for the same category on one connection
+ERROR_NOTICE_INTERVAL = float(os.getenv("WS_LIMIT_NOTICE_INTERVAL", "1.0"))
+
+# Close code used when a room is full (application range 4000-4999)
+ROOM_FULL_CLOSE_CODE = 4003
+
+# Message type -> category; anything else is "default"
+CATEGORIES = {
+    "signal": "signal",
+    "get_user_list": "signal",
+    "recorder_state": "signal",
+    "end_call": "signal",
+    "ping": "signal",
+    "pong": "signal",
+    "resume": "signal",
+    "mux_join": "signal",
+    "mux_leave": "signal",
+    "subscribe": "signal",
+    "chat_message_to_server": "chat",
+    "speaking_update": "status",
+    "status_update": "status",
+    "progress_update": "status",
+    "recording_update": "status",
+    "bot_message": "status",
+    "content_ack": "status",
+    "bot_audio": "media",
+    "content_update": "media",
+    "meeting_summary": "media",
+}
+
+
+def _rate(name: str, default: str):
+    """Read "<messages per second>/<burst>" from WS_RATE_<NAME>."""
+    rate, _, burst = os.getenv(f"WS_RATE_{name.upper()}", default).partition("/")
+    return float(rate), float(burst or rate)
+
+
+RATES = {
+    # Per peer in the room (see RateLimiter.allow)
+    "signal": _rate("signal", "100/200"),
+    "chat": _rate("chat", "5/20"),
+    "status": _rate("status", "30/60"),
+    "media": _rate("media", "20/40"),
+    "default": _rate("default", "20/40"),
+}
+
+# Hub-wide rejection counters: (reason, category) -> count
+rejections = Counter()
+
+
+def category_of(mtype) -> str:
+    return CATEGORIES.get(mtype, "default")
+
+
+def trusted_bot(authorization) -> bool:
+    """Whether a connecting socket presented HUB_BOT_TOKEN (a user id proves nothing)."""
+    if not HUB_BOT_TOKEN:
+        return False
+    return hmac.compare_digest(authorization or "", f"Bearer {HUB_BOT_TOKEN}")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self, now: float = None, scale: int = 1) -> bool:
+        """Take a token; `scale` multiplies both the rate and the burst."""
+        if self.rate <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.burst * scale, self.tokens + (now - self.stamp) * self.rate * scale)
+        self.stamp = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class RateLimiter:
+    """Token buckets for one connection, created lazily per category."""
+
+    def __init__(self, rates: dict = None):
+        self.rates = RATES if rates is None else rates
+        self._buckets = {}
+        self._noticed = {}
+        self.rejected = Counter()
+
+    def allow(self, category: str, scale: int = 1) -> bool:
+        bucket = self._buckets.get(category)
+        if bucket is None:
+            bucket = self._buckets[category] = TokenBucket(*self.rates.get(category, self.rates["default"]))
+            bucket.tokens *= scale
+        return bucket.take(scale=scale)
+
+    def reject(self, reason: str, category: str) -> bool:
+        """Count a rejection. Returns True if the client should be told about it now."""
+        self.rejected[reason] += 1
+        rejections[(reason, category)] += 1
+        now = time.monotonic()
+        key = (reason, category)
+        if now - self._noticed.get(key, 0.0) < ERROR_NOTICE_INTERVAL:
+            return False
+        self._noticed[key] = now
+        return True
+
+
+def error_message(code: str, **extra) -> dict:
+    return {"type": "error", "code": code, **extra}
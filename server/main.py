@@ -1,6 +1,7 @@
 # main.py
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 import models
 from database import engine, get_db
 import auth 
@@ -9,7 +10,9 @@ import schemas
 
 # Import Routers from the split files
 from api_main import router as api_router
-from socket_main import websocket_endpoint
+import socket_main
+import metrics
+from socket_main import websocket_endpoint, mux_endpoint
 
 # Import shared dependencies/utilities
 from dependencies import get_current_super_admin, enrich_user_response # NEW IMPORT
@@ -38,5 +41,25 @@ app.include_router(
 
 # 3. Register the WebSocket endpoint
 app.websocket("/ws/{room_id}/{user_id}")(websocket_endpoint)
+# One socket for a bot in many rooms (room-tagged frames)
+app.websocket("/ws-mux/{client_id}")(mux_endpoint)
+
+# 4. Signaling hub lifecycle (backplane connection, background tasks)
+@app.on_event("startup")
+async def start_signaling_hub():
+    await socket_main.startup()
+
+@app.on_event("shutdown")
+async def stop_signaling_hub():
+    await socket_main.shutdown()
+
+# 5. Prometheus metrics for the signaling hub (per worker); METRICS_TOKEN or loopback only
+# async so it renders on the event loop that owns the rooms, not in a threadpool thread
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    client_host = request.client.host if request.client else None
+    if not metrics.authorized(client_host, request.headers.get("authorization")):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 # NOTE: The dependency functions are no longer defined here, resolving the circular import.
\ No newline at end of file
@@ -0,0 +1,197 @@
+# metrics.py
+"""
+Prometheus metrics for the signaling hub, rendered in the text exposition
+format by GET /metrics (no client library needed).
+
+Counters and histograms are updated inline on the hot paths; values that
+describe live state (rooms, members, queue depths) come from collectors that
+run only when the endpoint is scraped. Only aggregates are exported: no
+series is labelled with a room or user id.
+
+The endpoint answers only a scraper presenting METRICS_TOKEN as a bearer
+token, or, when no token is configured, a client on this host.
+"""
+import asyncio
+import hmac
+import ipaddress
+import os
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# How often the event-loop lag probe wakes up (seconds)
+LOOP_LAG_INTERVAL = float(os.getenv("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+# Bearer token a scraper must present; unset = loopback clients only
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Message types that get their own label; anything else a client invents is
+# counted as "other" so label cardinality stays bounded.
+KNOWN_TYPES = frozenset((
+    "signal", "get_user_list", "user_list", "user_joined", "user_left",
+    "chat_message_to_server", "chat_message", "speaking_update", "status_update",
+    "progress_update", "recording_update", "recorder_state", "content_update",
+    "meeting_summary", "bot_message", "bot_audio", "end_call", "ping", "pong", "error",
+    "resume", "replay_reset", "session", "mux_join", "mux_leave", "subscribe", "content_ack",
+))
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def authorized(client_host: Optional[str], authorization: Optional[str]) -> bool:
+    """Whether a scrape request may read the metrics (see the module docstring)."""
+    if METRICS_TOKEN:
+        return hmac.compare_digest(authorization or "", f"Bearer {METRICS_TOKEN}")
+    try:
+        return ipaddress.ip_address(client_host).is_loopback
+    except ValueError:
+        return False
+
+
+def type_label(mtype) -> str:
+    return mtype if mtype in KNOWN_TYPES else "other"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = labels
+        _registry.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_labels(self.label_names, k)} {v}" for k, v in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self._sum += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        total = 0
+        for bound, count in zip(self.buckets, self._counts):
+            total += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {total}')
+        total += self._counts[-1]
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {total}')
+        lines.append(f"{self.name}_sum {self._sum}")
+        lines.append(f"{self.name}_count {total}")
+        return lines
+
+
+# (name, help, type, [(label dict, value), ...]) produced at scrape time
+Sample = Tuple[str, str, str, Iterable[Tuple[Dict[str, str], float]]]
+
+_registry: List[_Metric] = []
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def register_collector(fn: Callable[[], Iterable[Sample]]):
+    _collectors.append(fn)
+
+
+def render() -> str:
+    """Call on the hub's event loop: collectors walk live dicts that only the loop changes."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        for name, help_text, kind, samples in collect():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Hub metrics ----------
+
+messages_in = Counter("hub_messages_in_total", "Frames received from clients", ("type",))
+messages_out = Counter("hub_messages_out_total", "Frames queued for delivery to a member", ("type",))
+bytes_in = Counter("hub_bytes_in_total", "Bytes received from clients")
+bytes_out = Counter("hub_bytes_out_total", "Bytes written to member sockets")
+frames_dropped = Counter("hub_frames_dropped_total", "Frames discarded by a full outbound queue", ("policy",))
+frames_coalesced = Counter("hub_frames_coalesced_total", "Pending status frames replaced by a newer one", ("type",))
+frames_unsubscribed = Counter("hub_frames_unsubscribed_total", "Frames skipped because the member did not subscribe to their type", ("type",))
+joins = Counter("hub_joins_total", "Members that joined a room on this worker")
+leaves = Counter("hub_leaves_total", "Members that left a room on this worker", ("reason",))
+db_chats_dropped = Counter("hub_db_chats_dropped_total", "Chat messages not persisted because the write queue was full")
+send_latency = Histogram("hub_send_latency_seconds", "Time from enqueue to socket write per frame")
+loop_lag = Histogram("hub_event_loop_lag_seconds", "Event-loop scheduling delay observed by the lag probe")
+loop_lag_last = Gauge("hub_event_loop_lag_last_seconds", "Most recent event-loop lag sample")
+
+
+class LoopLagMonitor:
+    """Sleeps for a fixed interval and records how late the loop woke it up."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            loop_lag.observe(lag)
+            loop_lag_last.set(lag)
@@ -0,0 +1,140 @@
+# replay.py
+"""
+Per-room replay buffer for reconnecting clients.
+
+Broadcasts of the types in REPLAY_TYPES get a room-wide sequence number
+(allocated by the backplane, so it is shared by all workers) spliced into
+the frame as "room_seq", and the last ROOM_REPLAY_SIZE of them are kept in
+memory per room. A client that reconnects with `resume_from=<room_seq>`
+receives what it missed from the buffer; if that point has already been
+evicted (or the room was reset) it gets a `replay_reset` instead and should
+fall back to a full snapshot. A broadcast addressed with `to_except` is
+sequenced and buffered the same way; the members it excludes are skipped
+both live and on replay.
+
+Transient traffic (speaking/status updates, signaling, presence, audio) is
+not buffered: a reconnecting client gets fresh values for those anyway.
+
+Room-wide broadcasts of the types in STATE_TYPES are also kept by the
+backplane as the room's current state (latest frame per type and sender).
+A newcomer, or a client whose replay was reset, gets that snapshot straight
+from the hub instead of waiting for the bot to re-render it.
+"""
+import json
+import os
+from collections import deque
+from typing import Dict, List, Optional
+
+import codec
+from frames import Frame, pack_binary, unpack_binary
+
+# Frames kept per room
+ROOM_REPLAY_SIZE = int(os.getenv("ROOM_REPLAY_SIZE", "512"))
+# Broadcast types worth replaying
+REPLAY_TYPES = frozenset(
+    t.strip()
+    for t in os.getenv(
+        "ROOM_REPLAY_TYPES",
+        "chat_message,content_update,progress_update,recording_update,"
+        "meeting_summary,bot_message,recorder_state,end_call",
+    ).split(",")
+    if t.strip()
+)
+
+# Broadcast types whose latest value per sender is the room's current state
+STATE_TYPES = frozenset(
+    t.strip()
+    for t in os.getenv(
+        "ROOM_STATE_TYPES",
+        "content_update,progress_update,recording_update,meeting_summary",
+    ).split(",")
+    if t.strip()
+)
+
+
+def stamp(frame: Frame, seq: int) -> Frame:
+    """Return a copy of a frame carrying "room_seq" (spliced in, no re-encode)."""
+    if frame.is_binary:
+        # Compressed frame: only the small header is rewritten
+        header, payload = unpack_binary(frame.data)
+        header["room_seq"] = seq
+        return Frame(frame.type, pack_binary(header, payload), frame.sender, seq, frame.excluded)
+    data = frame.data
+    body = data.lstrip()
+    if not body.startswith("{") or '"room_seq"' in data:
+        # Unusual layout or a client-supplied room_seq: take the slow, safe route
+        msg = json.loads(data)
+        msg["room_seq"] = seq
+        return Frame(frame.type, json.dumps(msg, separators=(",", ":")), frame.sender, seq, frame.excluded)
+    if body[1:].lstrip().startswith("}"):
+        text = '{"room_seq":%d}' % seq
+    else:
+        text = '{"room_seq":%d,' % seq + body[1:]
+    stamped = Frame(frame.type, text, frame.sender, seq, frame.excluded)
+    if frame.packed is not None:
+        # The sender's MessagePack form gets the same key up front
+        stamped.packed = codec.prepend(frame.packed, "room_seq", seq)
+    return stamped
+
+
+class RoomLog:
+    """Ring buffer of one room's sequenced frames on this worker."""
+
+    __slots__ = ("base", "frames")
+
+    def __init__(self, base: int, size: int = ROOM_REPLAY_SIZE):
+        # Everything after `base` that reached this worker is in `frames`
+        self.base = base
+        self.frames = deque(maxlen=size)
+
+    @property
+    def last(self) -> int:
+        return self.frames[-1].seq if self.frames else self.base
+
+    def record(self, frame: Frame):
+        if len(self.frames) == self.frames.maxlen:
+            self.base = self.frames[0].seq
+        self.frames.append(frame)
+
+    def since(self, seq: int) -> Optional[List[Frame]]:
+        """Frames after `seq`, or None if the buffer can no longer cover that point."""
+        if seq < self.base or seq > max(self.last, self.base):
+            return None
+        missed = [f for f in self.frames if f.seq > seq]
+        missed.sort(key=lambda f: f.seq)  # frames from other workers may arrive out of order
+        return missed
+
+
+class ReplayBuffer:
+    def __init__(self, size: int = ROOM_REPLAY_SIZE):
+        self.size = size
+        self._logs: Dict[str, RoomLog] = {}
+
+    def has(self, room_id: str) -> bool:
+        return room_id in self._logs
+
+    def open(self, room_id: str, current_seq: int):
+        """Start buffering a room; only frames after `current_seq` can be replayed from it."""
+        if room_id not in self._logs:
+            self._logs[room_id] = RoomLog(current_seq, self.size)
+
+    def record(self, room_id: str, frame: Frame):
+        log = self._logs.get(room_id)
+        if log is not None:
+            log.record(frame)
+
+    def since(self, room_id: str, seq: int) -> Optional[List[Frame]]:
+        log = self._logs.get(room_id)
+        return log.since(seq) if log is not None else None
+
+    def drop(self, room_id: str):
+        self._logs.pop(room_id, None)
+
+    def export(self, room_id: str) -> Optional[RoomLog]:
+        return self._logs.get(room_id)
+
+    def restore(self, room_id: str, base: int, frames: List[Frame]):
+        """Rebuild a room's buffer from a snapshot taken by the previous process."""
+        log = self._logs[room_id] = RoomLog(base, self.size)
+        for frame in frames:
+            log.record(frame)
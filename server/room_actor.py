@@ -0,0 +1,150 @@
+# room_actor.py
+"""
+One room on this worker, owned by a single asyncio task.
+
+Everything that reads or changes a room's state (membership, host, fan-out,
+presence, replay) is submitted to the room's inbox and run by its task one
+item at a time, so two members joining or leaving at once can never
+interleave their awaits, and a busy room only ever delays itself.
+
+Members' receive loops use `submit`, which waits while the inbox is over
+ROOM_INBOX_SIZE (backpressure lands on whoever floods the room). The
+backplane reader and the heartbeat reaper use `post`, which never waits, so
+one slow room cannot stall delivery to the others.
+"""
+import asyncio
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+# Queued items after which a member's receive loop waits for the room to catch up
+ROOM_INBOX_SIZE = int(os.getenv("ROOM_INBOX_SIZE", "1024"))
+# Items a room processes before yielding the loop to other rooms
+ROOM_ACTOR_BATCH = int(os.getenv("ROOM_ACTOR_BATCH", "64"))
+
+
+class Member:
+    """A member connected to this worker."""
+
+    __slots__ = ("conn", "token")
+
+    def __init__(self, conn, token: str):
+        self.conn = conn
+        # Presented on reconnect after a server restart
+        self.token = token
+
+
+class Roster:
+    """
+    The room's member ids (all workers) at one roster version, and the
+    user_list frame for them, serialized on first use and then shared.
+    """
+
+    __slots__ = ("version", "users", "frame")
+
+    def __init__(self, version: int, users: Tuple[str, ...]):
+        self.version = version
+        self.users = users
+        self.frame = None
+
+
+class RoomActor:
+    __slots__ = (
+        "room_id", "users", "ghosts", "host_id", "subscribed", "roster", "processed", "closed",
+        "inbox_size", "_inbox", "_has_room", "_on_idle", "_task",
+    )
+
+    def __init__(self, room_id: str, on_idle: Callable[["RoomActor"], None],
+                 inbox_size: int = ROOM_INBOX_SIZE):
+        self.room_id = room_id
+        # Members connected to this worker, in join order
+        self.users: Dict[str, Member] = {}
+        # Members parked by a server restart, waiting to re-attach: {user_id: resume token}
+        self.ghosts: Dict[str, str] = {}
+        self.host_id = None
+        # Whether this worker currently receives the room's backplane traffic
+        self.subscribed = False
+        # Cached until the roster version moves or membership changes here
+        self.roster: Optional[Roster] = None
+        self.processed = 0
+        self.closed = False
+        self.inbox_size = inbox_size
+        self._inbox = asyncio.Queue()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self._on_idle = on_idle
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def depth(self) -> int:
+        return self._inbox.qsize()
+
+    async def submit(self, fn, *args):
+        """Queue work from a member's receive loop; waits while the inbox is full."""
+        while self._inbox.qsize() >= self.inbox_size and not self.closed:
+            self._has_room.clear()
+            await self._has_room.wait()
+        self.post(fn, *args)
+
+    def post(self, fn, *args):
+        """Queue work without waiting (backplane deliveries, reaper evictions)."""
+        if not self.closed:
+            self._inbox.put_nowait((fn, args, None))
+
+    async def call(self, fn, *args):
+        """Run work in the room's turn and wait for its result."""
+        if self.closed:
+            # The room has gone idle and nobody owns its state any more
+            return await fn(*args)
+        fut = asyncio.get_running_loop().create_future()
+        self._inbox.put_nowait((fn, args, fut))
+        return await fut
+
+    async def _run(self):
+        batch = 0
+        fut = None
+        try:
+            while True:
+                fn, args, fut = await self._inbox.get()
+                try:
+                    result = await fn(*args)
+                    if fut is not None and not fut.done():
+                        fut.set_result(result)
+                except Exception as e:
+                    if fut is not None and not fut.done():
+                        fut.set_exception(e)
+                    else:
+                        print(f"[socket] ⚠️ Room {self.room_id} task error in {getattr(fn, '__name__', fn)}: {e}")
+                fut = None
+                self.processed += 1
+                if self._inbox.qsize() < self.inbox_size:
+                    self._has_room.set()
+
+                if not self.users and not self.ghosts and self._inbox.empty():
+                    # Last local member is gone and nothing is pending: retire
+                    self._on_idle(self)
+                    return
+
+                batch += 1
+                if batch >= ROOM_ACTOR_BATCH:
+                    batch = 0
+                    await asyncio.sleep(0)
+        finally:
+            # Retired or cancelled: nobody may wait on this room any more
+            self.closed = True
+            self._has_room.set()
+            if fut is not None and not fut.done():
+                fut.cancel()
+            while not self._inbox.empty():
+                _, _, pending = self._inbox.get_nowait()
+                if pending is not None and not pending.done():
+                    pending.cancel()
+
+    async def stop(self):
+        self.closed = True
+        self._has_room.set()
+        if not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
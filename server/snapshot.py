@@ -0,0 +1,116 @@
+# snapshot.py
+"""
+Room state carried across a hub restart (zero-downtime deploys).
+
+On shutdown uvicorn closes every member socket with 1012 (service restart).
+The hub starts draining as soon as it gets the stop signal, and while it is
+draining it does not treat those members as leaving: they stay in their room as
+"ghosts" holding the resume token they got on join (a `session` message),
+and nobody sees a user_left. Once the sockets are gone, each room's ghosts,
+host, roster version, room sequence, current state and replay buffer are
+written to HUB_SNAPSHOT_DIR.
+
+The next process restores the snapshot on startup. A client that reconnects
+with `?resume_token=<token>&resume_from=<room_seq>` is re-attached in O(1):
+it gets the roster and what it missed, and the rest of the room gets no
+user_joined, so no peer connection is renegotiated. Ghosts that are not
+back within HUB_GHOST_TTL seconds leave the room as usual.
+
+Each worker writes its own file and a starting worker claims every file it
+finds (a rename, so a file is restored exactly once). Snapshots older than
+HUB_SNAPSHOT_MAX_AGE are discarded.
+
+HUB_SNAPSHOT_DIR must be an absolute path, and in a container it must be a
+volume that outlives the container: a redeploy starts from a fresh
+filesystem. Without it snapshots are off and members leave on a restart.
+"""
+import base64
+import json
+import os
+import secrets
+import time
+from typing import Dict, Optional
+
+from frames import Frame
+
+# Where snapshots are kept (absolute, on a persistent volume); unset = no snapshots
+HUB_SNAPSHOT_DIR = os.getenv("HUB_SNAPSHOT_DIR", "")
+ENABLED = os.path.isabs(HUB_SNAPSHOT_DIR)
+# A snapshot older than this (seconds) describes meetings that are long gone
+HUB_SNAPSHOT_MAX_AGE = float(os.getenv("HUB_SNAPSHOT_MAX_AGE", "120"))
+# How long a parked member may take to come back before it leaves the room
+GHOST_TTL = float(os.getenv("HUB_GHOST_TTL", "30"))
+# "Service Restart": sent by the server being replaced, clients reconnect with their token
+RESTART_CLOSE_CODE = 1012
+
+
+def new_token() -> str:
+    return secrets.token_urlsafe(16)
+
+
+def config_warning() -> Optional[str]:
+    """Why snapshots are off, if they are (printed at startup)."""
+    if ENABLED:
+        return None
+    if not HUB_SNAPSHOT_DIR:
+        return "HUB_SNAPSHOT_DIR is not set: meetings will not survive a hub restart"
+    return f"HUB_SNAPSHOT_DIR must be an absolute path (got {HUB_SNAPSHOT_DIR!r}): snapshots are off"
+
+
+def dump_frame(frame: Frame) -> dict:
+    entry = {"k": frame.type, "s": frame.sender, "q": frame.seq}
+    if frame.excluded:
+        entry["x"] = sorted(frame.excluded)
+    if frame.is_binary:
+        entry["b"] = base64.b64encode(bytes(frame.data)).decode("ascii")
+    else:
+        entry["t"] = frame.data
+    return entry
+
+
+def load_frame(entry: dict) -> Frame:
+    data = base64.b64decode(entry["b"]) if "b" in entry else entry["t"]
+    excluded = frozenset(entry["x"]) if entry.get("x") else None
+    return Frame(entry.get("k"), data, entry.get("s"), entry.get("q"), excluded)
+
+
+def save(node_id: str, rooms: Dict[str, dict], directory: str = None):
+    """Write this worker's rooms atomically (a crash never leaves half a file)."""
+    directory = directory or HUB_SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{node_id}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump({"saved_at": time.time(), "rooms": rooms}, f)
+    os.replace(path + ".tmp", path)
+
+
+def load(node_id: str, directory: str = None, max_age: float = HUB_SNAPSHOT_MAX_AGE) -> Dict[str, dict]:
+    """Claim and read every snapshot left by previous workers. Returns {room_id: room}."""
+    directory = directory or HUB_SNAPSHOT_DIR
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith(".json"))
+    except FileNotFoundError:
+        return {}
+    rooms: Dict[str, dict] = {}
+    for name in names:
+        claimed = os.path.join(directory, f"{name}.{node_id}.claimed")
+        try:
+            # Only one worker's rename succeeds
+            os.rename(os.path.join(directory, name), claimed)
+        except OSError:
+            continue
+        try:
+            with open(claimed) as f:
+                data = json.load(f)
+            if time.time() - data.get("saved_at", 0) <= max_age:
+                rooms.update(data.get("rooms", {}))
+            else:
+                print(f"[socket] ⚠️ Ignoring stale snapshot {name}")
+        except (OSError, ValueError) as e:
+            print(f"[socket] ⚠️ Ignoring unreadable snapshot {name}: {e}")
+        finally:
+            try:
+                os.remove(claimed)
+            except OSError:
+                pass
+    return rooms
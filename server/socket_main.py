@@ -1,11 +1,27 @@
 import json
 import asyncio
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from datetime import datetime, timezone
-from database import get_db
-import crud, schemas, models
+import signal
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from models import MeetingStatusEnum
+from connection import Connection, MuxConnection, MuxMember, subscription
+import codec
+from frames import (
+    ENC_DEFLATE, Frame, as_frame, compact_frame, decompress_message, peek_envelope,
+    read_binary_header, unpack_binary,
+)
+from backplane import create_backplane
+from db_writer import DBWriter
+from heartbeat import Reaper
+from room_actor import Member, Roster, RoomActor
+import snapshot
+from snapshot import GHOST_TTL, RESTART_CLOSE_CODE
+import metrics
+import replay
+from replay import ReplayBuffer
+from limits import (
+    MAX_AUDIO_FRAME_BYTES, MAX_FRAME_BYTES, ROOM_MAX_MEMBERS, ROOM_FULL_CLOSE_CODE,
+    category_of, error_message, rejections, trusted_bot,
+)
 import os
 
 router = APIRouter()
@@ -14,180 +30,1046 @@ router = APIRouter()
 RECORDER_BOT_PREFIX = os.getenv("RECORDER_BOT_PREFIX", "RecorderBot")
 BOT_PREFIX = os.getenv("BOT_PREFIX", "Bot")
 
-# In-memory rooms: {room_id: {"users": {user_id: {"ws": ws}}, "host_id": str}}
+# Types the hub answers itself; these are always fully parsed
+HUB_TYPES = frozenset(("get_user_list", "ping", "pong", "resume", "subscribe"))
+
+# Rooms with members connected to THIS worker: {room_id: RoomActor}.
+# A room's state is only touched from its own actor task.
 rooms = {}
 
+# Set once the server is told to stop: new joins are turned away and
+# members it closes with 1012 are parked for the next process
+draining = False
+
+# Shares membership, host election and relay with the other workers
+backplane = create_backplane()
+
+# Meeting-state and chat persistence, written off the event loop
+db_writer = DBWriter()
+
+# Recent sequenced broadcasts per room, replayed to reconnecting clients
+replay_buffer = ReplayBuffer()
+
+# Pings quiet members and evicts the ones whose connection has silently died
+reaper = Reaper()
+
+# Event-loop lag probe for /metrics
+loop_monitor = metrics.LoopLagMonitor()
+
+
+async def startup():
+    watch_stop_signals()
+    warning = snapshot.config_warning()
+    if warning:
+        print(f"[socket] ⚠️ {warning}")
+    db_writer.start()
+    await backplane.start(deliver_local)
+    await restore_rooms()
+    reaper.start(evict)
+    loop_monitor.start()
+
+
+def watch_stop_signals():
+    """
+    Start draining on SIGTERM/SIGINT. uvicorn closes the member sockets with
+    1012 before the lifespan shutdown runs, so shutdown() is too late to tell
+    those closes apart from a client that sent 1012 itself.
+    """
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(sig)
+        if not callable(previous) or getattr(previous, "drains_hub", False):
+            continue  # no server handler to chain to, or already chained
+
+        def on_stop(signum, frame, previous=previous):
+            global draining
+            draining = True
+            previous(signum, frame)
+
+        on_stop.drains_hub = True
+
+        try:
+            signal.signal(sig, on_stop)
+        except ValueError:
+            pass  # not the main thread; shutdown() still sets draining
+
+
+async def shutdown():
+    global draining
+    draining = True
+    await save_rooms()
+    await loop_monitor.stop()
+    await reaper.stop()
+    for room in list(rooms.values()):
+        await room.stop()
+    await backplane.stop()
+    await db_writer.stop()
+
+
+# ---------- Room actors ----------
+
+def get_room(room_id: str) -> RoomActor:
+    """The live actor for a room, started on first use."""
+    room = rooms.get(room_id)
+    if room is None or room.closed:
+        room = rooms[room_id] = RoomActor(room_id, on_idle=retire_room)
+    return room
+
+
+def retire_room(room: RoomActor):
+    """Actor callback: the room has no local members and nothing queued."""
+    if rooms.get(room.room_id) is room:
+        rooms.pop(room.room_id, None)
+
+
 # ---------- Safe send / broadcast helpers ----------
 
-async def safe_send(ws: WebSocket, msg: dict):
-    """Send a JSON message safely (ignore disconnected sockets)."""
-    try:
-        if ws.client_state.name == "CONNECTED":
-            await ws.send_text(json.dumps(msg))
-    except Exception:
-        pass
+def safe_send(member: Member, msg):
+    """Queue a message or pre-encoded Frame for one member (never blocks on a slow socket)."""
+    member.conn.send(as_frame(msg))
 
 
-async def broadcast(room_id: str, msg: dict, sender_id: str = None):
-    """Broadcast message to all connected users in a room."""
+def fan_out(room_id: str, frame: Frame, sender_id: str = None):
+    """Queue a frame for every member of the room connected to this worker."""
     room = rooms.get(room_id)
     if not room:
         return
-    for uid, info in list(room["users"].items()):
-        if uid == sender_id:
+    if frame.seq is not None:
+        replay_buffer.record(room_id, frame)
+    excluded = frame.excluded or ()
+    for uid, member in list(room.users.items()):
+        if uid == sender_id or uid in excluded:
             continue
-        await safe_send(info["ws"], msg)
+        member.conn.send(frame)
 
 
-def current_user_list(room_id: str):
-    """Return all user IDs in a room."""
-    return list(rooms.get(room_id, {}).get("users", {}).keys())
+def is_directed(envelope: dict) -> bool:
+    """True if a peeked frame can be relayed on its envelope alone."""
+    to = envelope.get("to")
+    return (isinstance(to, list) or bool(to)) and envelope.get("type") not in HUB_TYPES
 
 
-# ---------- Main WebSocket endpoint ----------
+def check_addressing(to, to_except):
+    """Raise ValueError unless `to` and `to_except` are each absent, one id or a list of ids."""
+    for key, value in (("to", to), ("to_except", to_except)):
+        if value is not None and not isinstance(value, (str, list)):
+            raise ValueError(f"'{key}' must be an id or a list of ids")
 
-@router.websocket("/ws/{room_id}/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str, user_id: str, db: Session = Depends(get_db)):
-    await websocket.accept()
 
-    # Register user in memory
-    if room_id not in rooms:
-        rooms[room_id] = {"users": {}, "host_id": None}
-    rooms[room_id]["users"][user_id] = {"ws": websocket}
+def targets_of(to) -> list:
+    """Normalize a `to` field (one id or a list of ids) into a de-duplicated list."""
+    if isinstance(to, str):
+        return [to]
+    return list(dict.fromkeys(t for t in to if isinstance(t, str)))
+
+
+async def deliver_local(room_id: str, frame: Frame, sender_id: str = None, target=None):
+    """Backplane callback: hand a frame relayed from another worker to its room."""
+    room = rooms.get(room_id)
+    if room:
+        room.post(deliver_remote, room_id, frame, sender_id, target)
+
+
+async def deliver_remote(room_id: str, frame: Frame, sender_id: str = None, target=None):
+    """Runs in the room's turn: fan a relayed frame out to local members."""
+    if target is not None:
+        room = rooms.get(room_id)
+        users = room.users if room else {}
+        for uid in targets_of(target):
+            tgt = users.get(uid)
+            if tgt:
+                safe_send(tgt, frame)
+        return
+    fan_out(room_id, frame, sender_id)
+
+
+async def broadcast(room_id: str, msg, sender_id: str = None):
+    """Broadcast message to all connected users in a room (encoded once for everyone)."""
+    frame = as_frame(msg)
+    if frame.type in replay.REPLAY_TYPES:
+        frame = replay.stamp(frame, await backplane.next_seq(room_id))
+    await remember(room_id, frame, sender_id)
+    fan_out(room_id, frame, sender_id)
+    await backplane.publish(room_id, frame, sender_id=sender_id)
+
+
+async def send_to(room_id: str, target, msg):
+    """
+    Send to one member or a list of members, wherever they are connected.
+    The frame is encoded once and shared by every recipient.
+    """
+    frame = as_frame(msg)
+    room = rooms.get(room_id)
+    users = room.users if room else {}
+    remote = []
+    for uid in targets_of(target):
+        tgt = users.get(uid)
+        if tgt:
+            safe_send(tgt, frame)
+        else:
+            remote.append(uid)
+    if remote:
+        await backplane.publish(room_id, frame, target=remote[0] if len(remote) == 1 else remote)
+
+
+async def route(room_id: str, frame: Frame, sender_id: str, to=None, to_except=None) -> bool:
+    """Deliver a frame addressed with `to` (id or list) or `to_except`. False if it is a plain broadcast."""
+    if isinstance(to, list) or to:
+        await send_to(room_id, to, frame)
+        return True
+    if isinstance(to_except, (list, str)):
+        # Everyone but a few (who got it another way) is still a room-wide
+        # broadcast: sequenced, replayed and remembered, just never sent to them
+        excepted = Frame(frame.type, frame.data, frame.sender, frame.seq, frozenset(targets_of(to_except)))
+        excepted.packed = frame.packed
+        await broadcast(room_id, excepted, sender_id)
+        return True
+    return False
+
+
+async def dispatch(room_id: str, frame: Frame, sender_id: str, to=None, to_except=None):
+    """Directed delivery if the frame is addressed, broadcast otherwise."""
+    if not await route(room_id, frame, sender_id, to, to_except):
+        await broadcast(room_id, frame, sender_id=sender_id)
+
+
+async def relay_chat(room_id: str, user_id: str, payload: dict):
+    payload["from"] = user_id
+    # Never waits: a slow DB must not hold up the room's turn
+    db_writer.create_chat_message(room_id, payload)
+    # Attachments can be large: compress once here rather than per recipient
+    await broadcast(room_id, compact_frame({"type": "chat_message", "payload": payload}))
+
+
+async def room_roster(room_id: str, version: int = None) -> Roster:
+    """
+    The room's roster across all workers. Cached on the room per roster
+    version (bumped on every announced join/leave) and dropped whenever
+    membership changes on this worker.
+    """
+    if version is None:
+        version = await backplane.roster_version(room_id)
+    room = rooms.get(room_id)
+    roster = room.roster if room else None
+    if roster is None or roster.version != version:
+        roster = Roster(version, tuple(await backplane.members(room_id)))
+        if room:
+            room.roster = roster
+    return roster
+
+
+async def current_user_list(room_id: str) -> tuple:
+    """Return all user IDs in a room (across all workers)."""
+    return (await room_roster(room_id)).users
+
+
+async def leave_room(room_id: str, user_id: str, conn: Connection, reason: str = "closed") -> bool:
+    """Remove a member from this worker and the backplane. Returns False if it was already gone."""
+    room = rooms.get(room_id)
+    member = room.users.get(user_id) if room else None
+    if not member or member.conn is not conn:
+        # Already removed, or replaced by a newer connection for the same user
+        return False
+    room.users.pop(user_id, None)
+    await release_room(room)
+    if await backplane.leave(room_id, user_id):
+        # Late joiners must not be sent state about a member who is gone
+        await backplane.forget_sender(room_id, user_id)
+    room.roster = None
+    metrics.leaves.inc(reason)
+    return True
+
+
+async def release_room(room: RoomActor):
+    """Without local (or parked) members this worker stops seeing the room's frames."""
+    if not room.users and not room.ghosts and room.subscribed:
+        room.subscribed = False
+        replay_buffer.drop(room.room_id)
+        await backplane.unsubscribe(room.room_id)
+
+
+async def depart(conn: Connection, reason: str):
+    """
+    A member is gone (disconnected, errored or evicted by the reaper):
+    remove it, tell the rest of the room and end the meeting if the host left.
+    Runs its side effects only once per connection.
+    """
+    if await leave_room(conn.room_id, conn.user_id, conn, reason):
+        await announce_departure(conn.room_id, conn.user_id)
+
+
+async def announce_departure(room_id: str, user_id: str):
+    """Tell the rest of the room a member left; end the meeting if it was the host."""
+    remaining = await current_user_list(room_id)
+
+    # Notify remaining users
+    if remaining:
+        await announce_leave(room_id, user_id)
+
+    # If host left → mark meeting ended
+    if (
+        remaining
+        and await backplane.get_host(room_id) == user_id
+        and not user_id.startswith(BOT_PREFIX)
+    ):
+        db_writer.update_meeting_state(room_id, MeetingStatusEnum.ENDED)
+        await broadcast(room_id, {"type": "end_call", "reason": "Host left the meeting"})
+
+
+async def evict(conn: Connection):
+    """Reaper callback: the member missed its heartbeats."""
+    room = rooms.get(conn.room_id)
+    if room:
+        room.post(depart_and_close, conn, "evicted")
+
+
+async def depart_and_close(conn: Connection, reason: str):
+    """
+    Runs in the room's turn: depart, then the final cleanup. One turn for
+    both, so the actor cannot retire in between and leave close_if_empty to
+    run outside it, next to a member joining through a new actor.
+    """
+    await depart(conn, reason)
+    await close_if_empty(conn.room_id)
+
+
+async def leave_and_close(conn: Connection):
+    """Runs in the room's turn: a connection's last word (see depart_and_close)."""
+    await leave_room(conn.room_id, conn.user_id, conn)
+    await close_if_empty(conn.room_id)
+
+
+async def close_if_empty(room_id: str):
+    """Final cleanup once the last member anywhere has left."""
+    try:
+        if not await current_user_list(room_id):
+            db_writer.update_meeting_state(room_id, MeetingStatusEnum.ENDED)
+            await backplane.clear_room(room_id)
+    except Exception:
+        pass
+
+
+# ---------- Restart (park, snapshot, restore) ----------
+
+def restarting(close_code) -> bool:
+    """A 1012 close is this hub restarting only while it drains; a client may send 1012 too."""
+    return close_code == RESTART_CLOSE_CODE and draining and snapshot.ENABLED
+
+
+async def park(conn: Connection) -> bool:
+    """
+    Runs in the room's turn: the restart closed this member's socket. Keep it
+    in the room as a ghost that can re-attach with its token; nobody is told.
+    """
+    room = rooms.get(conn.room_id)
+    member = room.users.get(conn.user_id) if room else None
+    if not member or member.conn is not conn:
+        return False
+    del room.users[conn.user_id]
+    hold_ghost(room, conn.user_id, member.token)
+    metrics.leaves.inc("restart")
+    return True
+
+
+def hold_ghost(room: RoomActor, user_id: str, token: str):
+    room.ghosts[user_id] = token
+    asyncio.get_running_loop().call_later(GHOST_TTL, room.post, expire_ghost, room, user_id, token)
+
+
+async def expire_ghost(room: RoomActor, user_id: str, token: str):
+    """A parked member did not come back in time: it leaves the room for real."""
+    if room.ghosts.get(user_id) != token:
+        return  # re-attached, or joined again without its token
+    del room.ghosts[user_id]
+    await release_room(room)
+    if await backplane.leave(room.room_id, user_id):
+        await backplane.forget_sender(room.room_id, user_id)
+        room.roster = None
+        print(f"[socket] 👻 {user_id} did not come back to room {room.room_id}")
+        metrics.leaves.inc("expired")
+        await announce_departure(room.room_id, user_id)
+    await close_if_empty(room.room_id)
+
+
+async def dump_room(room: RoomActor) -> dict:
+    """Runs in the room's turn: everything needed to bring the room back."""
+    room_id = room.room_id
+    members = dict(room.ghosts)
+    members.update((uid, member.token) for uid, member in room.users.items())
+    log = replay_buffer.export(room_id)
+    return {
+        "members": members,
+        "host_id": await backplane.get_host(room_id),
+        "version": await backplane.roster_version(room_id),
+        "seq": await backplane.current_seq(room_id),
+        "state": [snapshot.dump_frame(f) for f in await backplane.room_state(room_id)],
+        "replay": {"base": log.base, "frames": [snapshot.dump_frame(f) for f in log.frames]} if log else None,
+    }
+
+
+async def save_rooms():
+    """Shutdown: snapshot every room that still has parked or connected members."""
+    if not snapshot.ENABLED:
+        return
+    saved = {}
+    for room_id, room in list(rooms.items()):
+        if room.ghosts or room.users:
+            saved[room_id] = await room.call(dump_room, room)
+    if not saved:
+        return
+    try:
+        snapshot.save(backplane.node_id, saved)
+        print(f"[socket] 💾 Saved {len(saved)} rooms for the next process")
+    except OSError as e:
+        print(f"[socket] ⚠️ Could not save room snapshot: {e}")
+
+
+async def load_room(room: RoomActor, saved: dict):
+    """Runs in the room's turn: restore a room from the previous process's snapshot."""
+    room_id, members = room.room_id, saved["members"]
+    state = [snapshot.load_frame(e) for e in saved.get("state") or ()]
+    await backplane.restore_room(room_id, list(members), saved.get("host_id"),
+                                 saved.get("version", 0), saved.get("seq", 0), state)
+    room.host_id = saved.get("host_id")
+    room.roster = None
+    room.subscribed = True
+    await backplane.subscribe(room_id)
+    log = saved.get("replay")
+    if log:
+        replay_buffer.restore(room_id, log["base"], [snapshot.load_frame(e) for e in log["frames"]])
+    else:
+        replay_buffer.open(room_id, await backplane.current_seq(room_id))
+    for user_id, token in members.items():
+        hold_ghost(room, user_id, token)
+
+
+async def restore_rooms():
+    """Startup: bring back the rooms the previous process parked."""
+    if not snapshot.ENABLED:
+        return
+    restored = snapshot.load(backplane.node_id)
+    for room_id, saved in restored.items():
+        if saved.get("members"):
+            room = get_room(room_id)
+            await room.call(load_room, room, saved)
+    if restored:
+        print(f"[socket] ♻️ Restored {len(restored)} rooms; waiting for members to re-attach")
+
+
+# ---------- Replay ----------
+
+def resume_point(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def resume(room_id: str, conn: Connection, seq: int):
+    """Send a reconnecting member what it missed after `seq`, or a replay_reset if we can't."""
+    missed = replay_buffer.since(room_id, seq)
+    # More than half a queue of backlog would be shed by the overflow policy anyway
+    if missed is not None and len(missed) <= conn.maxsize // 2:
+        missed = [f for f in missed if not (f.excluded and conn.user_id in f.excluded)]
+        for frame in missed:
+            conn.send(frame)
+        if missed:
+            print(f"[socket] ⏪ Replayed {len(missed)} frames to {conn.user_id} in room {room_id}")
+        return
+    # Current state first, so the client's room_seq only moves forward
+    await send_room_state(room_id, conn)
+    conn.send(Frame.from_message({
+        "type": "replay_reset",
+        "room_seq": await backplane.current_seq(room_id),
+    }))
+
+
+# ---------- Room state snapshot ----------
+
+async def remember(room_id: str, frame: Frame, sender_id: str = None):
+    """Keep a room-wide state broadcast (content, progress, ...) for late joiners."""
+    if frame.type in replay.STATE_TYPES:
+        await backplane.save_state(room_id, frame, sender_id)
+
+
+async def send_room_state(room_id: str, conn: Connection):
+    """Send a member the latest state frame of each type and sender, except its own (or one it was excluded from)."""
+    for frame in await backplane.room_state(room_id):
+        if frame.sender != conn.user_id and not (frame.excluded and conn.user_id in frame.excluded):
+            conn.send(frame)
+
+
+# ---------- Join ----------
+
+async def join_room(room: RoomActor, conn: Connection, resume_from: int = None, resume_token: str = None) -> bool:
+    """
+    Runs in the room's turn: register a member and announce it (or re-attach
+    a parked one). Returns False, registering nothing, if the room is full;
+    the cap is checked in the same turn as the insert, so concurrent joins
+    cannot overshoot it.
+    """
+    room_id, user_id = room.room_id, conn.user_id
+    if not await has_room_for(room_id, conn):
+        return False
+    if not room.subscribed:
+        room.subscribed = True
+        await backplane.subscribe(room_id)
+        replay_buffer.open(room_id, await backplane.current_seq(room_id))
+    reattach = resume_token is not None and room.ghosts.get(user_id) == resume_token
+    room.ghosts.pop(user_id, None)
+    token = snapshot.new_token()
+    room.users[user_id] = Member(conn, token)
+    # The token is presented on reconnect after a server restart; "codec" confirms
+    # what the hub will send in (see codec.py)
+    conn.send(Frame.from_message({"type": "session", "resume_token": token, "codec": conn.codec}))
+
+    # Reconnecting client: replay what it missed before anything new is queued;
+    # a newcomer gets the room's current content/progress from the hub instead
+    if resume_from is not None:
+        await resume(room_id, conn, resume_from)
+    else:
+        await send_room_state(room_id, conn)
+    await backplane.join(room_id, user_id)
+    room.roster = None
+
+    reaper.watch(conn)
+    metrics.joins.inc()
+
+    if reattach:
+        # The room never saw it leave: a fresh roster for it, nothing for the others
+        print(f"[socket] 🔁 {user_id} re-attached to room {room_id}")
+        await send_user_list(room_id, conn)
+        return True
 
     print(f"[socket] ✅ {user_id} connected to room {room_id}")
 
     # Mark host if not set
-    if rooms[room_id]["host_id"] is None and not user_id.startswith(RECORDER_BOT_PREFIX):
-        rooms[room_id]["host_id"] = user_id
+    if not user_id.startswith(RECORDER_BOT_PREFIX):
+        room.host_id = await backplane.claim_host(room_id, user_id)
 
-    # Notify room of updated user list
-    await broadcast(room_id, {"type": "user_list", "users": current_user_list(room_id)})
+    # Roster snapshot for the newcomer, delta for the rest of the room
+    await announce_join(room_id, user_id, conn)
 
     # Update meeting state in DB
+    db_writer.update_meeting_state(room_id, MeetingStatusEnum.ACTIVE)
+    return True
+
+
+# ---------- Presence ----------
+
+async def send_user_list(room_id: str, conn: Connection, version: int = None):
+    """Send one member a full roster snapshot (on connect or on request)."""
+    roster = await room_roster(room_id, version)
+    if roster.frame is None:
+        # Serialized once per roster version, however many members ask
+        roster.frame = Frame.from_message({
+            "type": "user_list",
+            "users": list(roster.users),
+            "version": roster.version,
+        })
+    conn.send(roster.frame)
+
+
+async def announce_join(room_id: str, user_id: str, conn: Connection):
+    """Snapshot for the newcomer, a small user_joined delta for everyone else."""
+    version = await backplane.bump_roster_version(room_id)
+    await send_user_list(room_id, conn, version)
+    await broadcast(room_id, {"type": "user_joined", "user_id": user_id, "version": version}, sender_id=user_id)
+
+
+async def announce_leave(room_id: str, user_id: str):
+    version = await backplane.bump_roster_version(room_id)
+    await broadcast(room_id, {"type": "user_left", "user_id": user_id, "version": version})
+
+
+async def receive_frame(websocket: WebSocket):
+    """Receive the next text or binary frame as str/bytes."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    text = message.get("text")
+    return text if text is not None else message.get("bytes")
+
+
+def as_json_text(conn: Connection, raw):
+    """
+    A MessagePack message as the JSON text the hub routes on, converted once on
+    arrival. Returns (raw, packed): `packed` is the original MessagePack, which
+    is relayed as-is to MessagePack members; text and binary frames pass
+    through with packed None. raw is None if the message does not decode.
+    """
+    if isinstance(raw, bytes) and codec.is_packed(raw):
+        try:
+            return codec.to_json(raw), raw
+        except ValueError as e:
+            print(f"[socket] ⚠️ Bad MessagePack frame from {conn.user_id}: {e}")
+            return None, None
+    return raw, None
+
+
+async def relay_binary(room: RoomActor, conn: Connection, raw: bytes):
+    """
+    Route a binary frame (bot_audio, compressed JSON) on its header; the payload
+    is never decoded, except for compressed chat the hub has to store.
+    """
+    room_id, user_id = conn.room_id, conn.user_id
     try:
-        crud.update_meeting_state(
-            db,
-            schemas.MeetingStateUpdate(
-                room_id=room_id,
-                state=MeetingStatusEnum.ACTIVE,
-                updated_at=datetime.now(timezone.utc),
-            ),
-        )
-    except Exception as e:
-        print(f"[socket] DB update error: {e}")
+        header = read_binary_header(raw)
+    except ValueError as e:
+        print(f"[socket] ⚠️ Bad binary frame from {user_id}: {e}")
+        return
+    mtype = header.get("type")
+    metrics.messages_in.inc(metrics.type_label(mtype))
+    if not allow(conn, mtype):
+        return
+    if mtype == "chat_message_to_server" and header.get("enc") == ENC_DEFLATE and not header.get("to"):
+        try:
+            msg = decompress_message(header, unpack_binary(raw)[1], limit=MAX_FRAME_BYTES)
+        except ValueError as e:
+            print(f"[socket] ⚠️ Bad compressed chat from {user_id}: {e}")
+            return
+        await room.submit(relay_chat, room_id, user_id, msg.get("payload", {}))
+        return
+    check_addressing(header.get("to"), header.get("to_except"))
+    frame = Frame.from_raw(mtype, raw, user_id)
+    await room.submit(dispatch, room_id, frame, user_id, header.get("to"), header.get("to_except"))
+
+
+# ---------- Metrics (live state, read on scrape) ----------
+
+def collect_hub_state():
+    # Aggregates only: room and user ids never become labels (privacy, bounded series)
+    live = list(rooms.values())
+    members = [len(room.users) for room in live]
+    # A multiplexed bot socket is one queue however many rooms it is in
+    sockets = {}
+    for room in live:
+        for member in list(room.users.values()):
+            sockets[id(getattr(member.conn, "conn", member.conn))] = member.conn
+    depths = [c.queue_depth for c in sockets.values()]
+    yield ("hub_rooms", "Rooms with members on this worker", "gauge",
+           [({}, len(live))])
+    yield ("hub_members", "Members connected to this worker", "gauge",
+           [({}, sum(members))])
+    yield ("hub_room_members_max", "Members connected to this worker in its largest room", "gauge",
+           [({}, max(members, default=0))])
+    yield ("hub_parked_members", "Members parked by a restart, waiting to re-attach", "gauge",
+           [({}, sum(len(room.ghosts) for room in live))])
+    yield ("hub_room_inbox_depth_max", "Items waiting in the fullest room actor inbox", "gauge",
+           [({}, max((room.depth for room in live), default=0))])
+    yield ("hub_connections", "Member sockets open on this worker", "gauge",
+           [({}, len(depths))])
+    yield ("hub_send_queue_depth_max", "Frames waiting in the fullest outbound queue", "gauge",
+           [({}, max(depths, default=0))])
+    yield ("hub_send_queue_depth_total", "Frames waiting in all outbound queues", "gauge",
+           [({}, sum(depths))])
+    yield ("hub_rejections_total", "Frames or joins refused by the inbound limits", "counter",
+           [({"reason": reason, "category": category}, n) for (reason, category), n in list(rejections.items())])
+    yield ("hub_heartbeat_evictions_total", "Members evicted for missing heartbeats", "counter",
+           [({}, reaper.evicted)])
+
+
+metrics.register_collector(collect_hub_state)
+
+
+# ---------- Inbound limits ----------
+
+def frame_too_large(raw) -> bool:
+    if isinstance(raw, str):
+        # A code point is at most 4 bytes in UTF-8; only encode when it could matter
+        if len(raw) * 4 <= MAX_FRAME_BYTES:
+            return False
+        return len(raw.encode("utf-8")) > MAX_FRAME_BYTES
+    if len(raw) <= MAX_FRAME_BYTES:
+        return False
+    # Bot audio (a whole TTS reply) has its own, larger limit; only the small header is read
+    return len(raw) > MAX_AUDIO_FRAME_BYTES or not is_audio_frame(raw)
+
+
+def is_audio_frame(raw: bytes) -> bool:
+    try:
+        return read_binary_header(raw).get("type") == "bot_audio"
+    except ValueError:
+        return False
+
+
+def reject(conn: Connection, reason: str, category: str, **extra):
+    """Count a rejected frame and tell the client (at most once per interval)."""
+    if conn.limiter.reject(reason, category):
+        print(f"[socket] 🚫 {conn.user_id} {reason} ({category}) in room {conn.room_id}")
+        conn.send(Frame.from_message(error_message(reason, category=category, **extra)))
+
+
+def allow(conn: Connection, mtype) -> bool:
+    category = category_of(mtype)
+    # Signaling budget is per peer: a newcomer negotiates with the whole mesh at once
+    scale = peer_count(conn.room_id) if category == "signal" else 1
+    if conn.limiter.allow(category, scale):
+        return True
+    reject(conn, "rate_limited", category, msg_type=mtype)
+    return False
+
+
+def peer_count(room_id) -> int:
+    """Other members of a room, by its cached roster if there is one (at least 1)."""
+    room = rooms.get(room_id)
+    if room is None:
+        return 1
+    users = room.roster.users if room.roster is not None else room.users
+    return max(1, len(users) - 1)
+
+
+async def has_room_for(room_id: str, conn: Connection) -> bool:
+    """The room member cap. Trusted bots and reconnecting members are always let in."""
+    user_id = conn.user_id
+    if not ROOM_MAX_MEMBERS or conn.trusted:
+        return True
+    members = await current_user_list(room_id)
+    if user_id in members or len(members) < ROOM_MAX_MEMBERS:
+        return True
+    rejections[("room_full", "admission")] += 1
+    print(f"[socket] 🚫 {user_id} refused: room {room_id} is full ({ROOM_MAX_MEMBERS})")
+    return False
+
+
+async def admit(websocket: WebSocket) -> bool:
+    """Turn a member socket away while this process is shutting down."""
+    if not draining:
+        return True
+    # The client retries and reaches the next process
+    try:
+        await websocket.close(code=RESTART_CLOSE_CODE)
+    except Exception:
+        pass
+    return False
+
+
+async def refuse_full(websocket: WebSocket):
+    """Tell a member socket the room is at its cap, and close it."""
+    try:
+        await websocket.send_text(json.dumps(error_message("room_full", limit=ROOM_MAX_MEMBERS)))
+        await websocket.close(code=ROOM_FULL_CLOSE_CODE)
+    except Exception:
+        pass
+
+
+async def handle_frame(room: RoomActor, conn: Connection, raw, packed: bytes = None) -> bool:
+    """
+    Check one inbound frame from a member and hand it to its room (`packed`:
+    the sender's MessagePack form of a text frame, see as_json_text).
+    Returns False once the member has ended the meeting. Raises ValueError for
+    a frame that is not a valid message; the caller rejects just that frame.
+    """
+    room_id, user_id = room.room_id, conn.user_id
+    if isinstance(raw, bytes):
+        await relay_binary(room, conn, raw)
+        return True
+
+    # Directed frames (SDP/ICE) are routed on a peek at their leading
+    # keys; the payload is relayed as-is and never decoded here
+    envelope = peek_envelope(raw)
+    if envelope is not None and is_directed(envelope):
+        msg = None
+        mtype, target = envelope.get("type"), envelope["to"]
+    else:
+        msg = json.loads(raw)
+        if not isinstance(msg, dict):
+            raise ValueError("message must be an object")
+        mtype, target = msg.get("type"), msg.get("to")
+    metrics.messages_in.inc(metrics.type_label(mtype))
+    if not allow(conn, mtype):
+        return True
+
+    # ---------------- Heartbeat (never relayed) ----------------
+    if mtype == "pong":
+        return True
+    if mtype == "ping":
+        conn.send(Frame.from_message({"type": "pong", "ts": msg.get("ts")}))
+        return True
+
+    # Relayed messages are forwarded as the original raw frame
+    frame = Frame.from_raw(mtype, raw, user_id, packed)
+
+    # ---------------- Replay on request ----------------
+    if mtype == "resume":
+        seq = resume_point(msg.get("from"))
+        if seq is not None:
+            await room.submit(resume, room_id, conn, seq)
+        return True
+
+    # ---------------- Roster snapshot on request ----------------
+    if mtype == "get_user_list":
+        await room.submit(send_user_list, room_id, conn)
+        return True
+
+    # ---------------- Subscription change ----------------
+    # {"type": "subscribe", "types": [...]}; null or [] means everything again
+    if mtype == "subscribe":
+        conn.subscription = subscription(msg.get("types"))
+        return True
+
+    # ---------------- Point-to-point / multicast ----------------
+    # `to` may be one id or a list; `to_except` addresses everyone else.
+    # Either way the sender uploads once and the hub fans out.
+    to_except = msg and msg.get("to_except")
+    check_addressing(target, to_except or None)
+    if isinstance(target, list) or target or isinstance(to_except, (list, str)):
+        await room.submit(route, room_id, frame, user_id, target, to_except)
+        return True
+
+    # ---------------- Broadcast categories ----------------
+    # These events are meant to reach everyone
+    if mtype in (
+        "bot_audio",
+        "bot_message",
+        "speaking_update",
+        "status_update",
+        "content_update",
+        "progress_update",
+        "recording_update",
+        "signal",
+        "user_list",
+        "meeting_summary",
+    ):
+        await room.submit(broadcast, room_id, frame, user_id)
+        return True
+
+    # ---------------- Chat messages ----------------
+    if mtype == "chat_message_to_server":
+        await room.submit(relay_chat, room_id, user_id, msg.get("payload", {}))
+        return True
+
+    # ---------------- Recorder control ----------------
+    if mtype == "recorder_state":
+        await room.submit(broadcast, room_id, frame, user_id)
+        return True
+
+    # ---------------- Meeting end ----------------
+    if mtype == "end_call":
+        print(f"[socket] 🔚 Meeting ended by {user_id}")
+        await room.submit(broadcast, room_id, frame, user_id)
+        db_writer.update_meeting_state(room_id, MeetingStatusEnum.ENDED)
+        return False
+
+    # ---------------- Default: broadcast ----------------
+    await room.submit(broadcast, room_id, frame, user_id)
+    return True
+
+
+# ---------- Main WebSocket endpoint ----------
+
+@router.websocket("/ws/{room_id}/{user_id}")
+async def websocket_endpoint(websocket: WebSocket, room_id: str, user_id: str):
+    # No request-scoped DB session here: a socket can stay open for hours and
+    # would pin a pooled connection the whole time. Persistence goes through
+    # db_writer, which opens a short-lived session per batch.
+    await websocket.accept()
+    if not await admit(websocket):
+        return
+    conn = Connection(websocket, user_id, room_id)
+    # Bots send "Authorization: Bearer <HUB_BOT_TOKEN>" to be exempt from the room cap
+    conn.trusted = trusted_bot(websocket.headers.get("authorization"))
+    # ?subscribe=signal,chat_message: only these types (and hub control messages) are sent
+    conn.subscription = subscription(websocket.query_params.get("subscribe"))
+    # ?codec=msgpack: send MessagePack instead of JSON text, if this hub has it
+    conn.codec = codec.negotiate(websocket.query_params.get("codec"))
+    conn.start()
+
+    # Membership, fan-out and presence run in the room's own task; this loop
+    # only reads, checks and hands frames over
+    room = get_room(room_id)
 
     try:
+        query = websocket.query_params
+        if not await room.call(join_room, room, conn, resume_point(query.get("resume_from")), query.get("resume_token")):
+            await conn.close()
+            await refuse_full(websocket)
+            return
+
         while True:
-            raw = await websocket.receive_text()
-            msg = json.loads(raw)
-            mtype = msg.get("type")
-            target = msg.get("to")
-
-            # ---------------- Point-to-point signaling ----------------
-            if target:
-                tgt = rooms.get(room_id, {}).get("users", {}).get(target)
-                if tgt:
-                    await safe_send(tgt["ws"], msg)
+            raw = await receive_frame(websocket)
+            conn.touch()
+            metrics.bytes_in.inc(amount=len(raw))
+            # Checked before parsing so an oversized frame costs nothing more
+            if frame_too_large(raw):
+                reject(conn, "frame_too_large", "binary" if isinstance(raw, bytes) else "text",
+                       limit=MAX_FRAME_BYTES)
+                continue
+            raw, packed = as_json_text(conn, raw)
+            if raw is None:
                 continue
+            try:
+                if not await handle_frame(room, conn, raw, packed):
+                    break
+            except ValueError:
+                reject(conn, "bad_frame", "text")
+
+    except WebSocketDisconnect as e:
+        if restarting(e.code) and await get_room(room_id).call(park, conn):
+            print(f"[socket] 🅿️ {user_id} parked in room {room_id} until it reconnects")
+        else:
+            print(f"[socket] ❌ {user_id} disconnected from room {room_id}")
+            await get_room(room_id).call(depart, conn, "disconnect")
+
+    except Exception as e:
+        print(f"[socket] ⚠️ Unexpected error in {user_id}: {e}")
+        await get_room(room_id).call(depart, conn, "error")
+
+    finally:
+        await conn.close()
+        # The actor we joined may have retired once we were gone (evicted,
+        # departed): clean up through whichever one owns the room now, so
+        # this never races a member joining it. Clears the room if no one is left.
+        await get_room(room_id).call(leave_and_close, conn)
 
-            # ---------------- Broadcast categories ----------------
-            # These events are meant to reach everyone
-            if mtype in (
-                "bot_audio",
-                "bot_message",
-                "speaking_update",
-                "status_update",
-                "content_update",
-                "progress_update",
-                "recording_update",
-                "signal",
-                "user_list",
-                "meeting_summary",
-            ):
-                await broadcast(room_id, msg, sender_id=user_id)
+
+# ---------- Multiplexed bot endpoint ----------
+# A bot serving many meetings (recorder, AI host) keeps one socket instead of
+# one per room. Control messages are not room-tagged:
+#
+#   {"type": "mux_join", "room": R, "user_id": U, "resume_from": N, "resume_token": T,
+#    "subscribe": [types]}
+#   {"type": "mux_leave", "room": R}
+#
+# Every other frame carries "room" (as its first key, or in the binary header)
+# and is handled exactly as on /ws/{room_id}/{user_id}; everything the hub
+# sends for a room comes back tagged the same way. ping/pong are untagged and
+# cover the whole socket.
+
+MUX_TYPES = frozenset(("mux_join", "mux_leave"))
+
+
+def mux_envelope(raw) -> dict:
+    """The routing keys of a multiplexed frame ("room" and "type" at least, if present)."""
+    if isinstance(raw, bytes):
+        return read_binary_header(raw)
+    envelope = peek_envelope(raw)
+    if not (envelope and "room" in envelope and "type" in envelope):
+        envelope = json.loads(raw)
+        if not isinstance(envelope, dict):
+            raise ValueError("message must be an object")
+    if not isinstance(envelope.get("room", ""), str):
+        raise ValueError("'room' must be a string")
+    return envelope
+
+
+async def mux_join(conn: MuxConnection, members: dict, msg: dict):
+    room_id, user_id = msg.get("room"), msg.get("user_id") or conn.user_id
+    if not isinstance(room_id, str) or not room_id or not isinstance(user_id, str):
+        reject(conn, "bad_mux_join", "signal")
+        return
+    if room_id in members:
+        reject(conn, "already_joined", "signal", room=room_id)
+        return
+    member = members[room_id] = MuxMember(conn, room_id, user_id)
+    member.subscription = subscription(msg.get("subscribe"))
+    room = get_room(room_id)
+    if not await room.call(join_room, room, member, resume_point(msg.get("resume_from")), msg.get("resume_token")):
+        del members[room_id]
+        await member.close()
+        conn.send(Frame.from_message({"room": room_id, **error_message("room_full", limit=ROOM_MAX_MEMBERS)}))
+
+
+async def mux_leave(members: dict, room_id: str, reason: str = "left"):
+    member = members.pop(room_id, None)
+    if member is None:
+        return
+    await member.close()
+    await get_room(room_id).call(depart_and_close, member, reason)
+
+
+@router.websocket("/ws-mux/{client_id}")
+async def mux_endpoint(websocket: WebSocket, client_id: str):
+    await websocket.accept()
+    if draining:
+        try:
+            await websocket.close(code=RESTART_CLOSE_CODE)
+        except Exception:
+            pass
+        return
+    conn = MuxConnection(websocket, client_id)
+    conn.trusted = trusted_bot(websocket.headers.get("authorization"))
+    conn.codec = codec.negotiate(websocket.query_params.get("codec"))
+    conn.start()
+    # {room_id: MuxMember}, touched only by this loop
+    members = {}
+    print(f"[socket] 🔀 {client_id} opened a multiplexed connection")
+
+    try:
+        while True:
+            raw = await receive_frame(websocket)
+            conn.touch()
+            metrics.bytes_in.inc(amount=len(raw))
+            if frame_too_large(raw):
+                reject(conn, "frame_too_large", "binary" if isinstance(raw, bytes) else "text",
+                       limit=MAX_FRAME_BYTES)
+                continue
+            raw, packed = as_json_text(conn, raw)
+            if raw is None:
                 continue
 
-            # ---------------- Chat messages ----------------
-            if mtype == "chat_message_to_server":
-                payload = msg.get("payload", {})
-                payload["from"] = user_id
+            try:
+                envelope = mux_envelope(raw)
+            except ValueError as e:
+                print(f"[socket] ⚠️ Bad multiplexed frame from {client_id}: {e}")
+                reject(conn, "bad_frame", "binary" if isinstance(raw, bytes) else "text")
+                continue
+            room_id, mtype = envelope.get("room"), envelope.get("type")
+            member = members.get(room_id)
+            if member is not None and mtype not in MUX_TYPES:
+                if member.closed:
+                    break  # the shared socket was aborted
                 try:
-                    crud.create_chat_message(
-                        db,
-                        room_id,
-                        schemas.ChatMessagePayload.model_validate(payload),
-                    )
-                except Exception as e:
-                    print(f"[socket] chat DB error: {e}")
-                await broadcast(room_id, {"type": "chat_message", "payload": payload})
+                    active = await handle_frame(get_room(room_id), member, raw, packed)
+                except ValueError as e:
+                    # Only this frame is lost: the error goes to its room, the other rooms carry on
+                    print(f"[socket] ⚠️ Bad frame from {client_id} in room {room_id}: {e}")
+                    reject(member, "bad_frame", category_of(mtype), msg_type=mtype)
+                    continue
+                if not active:
+                    # Ended the meeting: leave that room quietly, as a dedicated socket would
+                    members.pop(room_id, None)
+                    await member.close()
+                    await get_room(room_id).call(leave_and_close, member)
                 continue
 
-            # ---------------- Recorder control ----------------
-            if mtype == "recorder_state":
-                await broadcast(room_id, msg, sender_id=user_id)
+            # Untagged, or for a room this socket has not joined: control traffic only
+            try:
+                msg = envelope if isinstance(raw, bytes) else json.loads(raw)
+            except ValueError:
+                reject(conn, "bad_frame", "text")
+                continue
+            metrics.messages_in.inc(metrics.type_label(mtype))
+            if not allow(conn, mtype):
+                continue
+            if mtype == "pong":
                 continue
+            if mtype == "ping":
+                conn.send(Frame.from_message({"type": "pong", "ts": msg.get("ts")}))
+            elif mtype == "mux_join":
+                # While draining the join is left to the next process: the
+                # client sends it again when the restart makes it reconnect
+                if not draining:
+                    await mux_join(conn, members, msg)
+            elif mtype == "mux_leave":
+                await mux_leave(members, room_id)
+            else:
+                reject(conn, "not_joined", category_of(mtype), room=room_id, msg_type=mtype)
 
-            # ---------------- Meeting end ----------------
-            if mtype == "end_call":
-                print(f"[socket] 🔚 Meeting ended by {user_id}")
-                await broadcast(room_id, msg, sender_id=user_id)
-                crud.update_meeting_state(
-                    db,
-                    schemas.MeetingStateUpdate(
-                        room_id=room_id,
-                        state=MeetingStatusEnum.ENDED,
-                        updated_at=datetime.now(timezone.utc),
-                    ),
-                )
-                break
-
-            # ---------------- Default: broadcast ----------------
-            await broadcast(room_id, msg, sender_id=user_id)
-
-    except WebSocketDisconnect:
-        # Cleanup user
-        print(f"[socket] ❌ {user_id} disconnected from room {room_id}")
-        if room_id in rooms:
-            rooms[room_id]["users"].pop(user_id, None)
-            if not rooms[room_id]["users"]:
-                rooms.pop(room_id, None)
-        # Notify remaining users
-        if room_id in rooms:
-            await broadcast(room_id, {"type": "user_list", "users": current_user_list(room_id)})
-
-        # If host left → mark meeting ended
-        if (
-            room_id in rooms
-            and rooms[room_id].get("host_id") == user_id
-            and not user_id.startswith(BOT_PREFIX)
-        ):
-            crud.update_meeting_state(
-                db,
-                schemas.MeetingStateUpdate(
-                    room_id=room_id,
-                    state=models.MeetingState.ENDED,
-                    updated_at=datetime.now(timezone.utc),
-                ),
-            )
-            await broadcast(room_id, {"type": "end_call", "reason": "Host left the meeting"})
+    except WebSocketDisconnect as e:
+        parking = restarting(e.code)
+        for room_id, member in list(members.items()):
+            if parking and await get_room(room_id).call(park, member):
+                continue
+            await get_room(room_id).call(depart, member, "disconnect")
+        print(f"[socket] ❌ {client_id} closed its multiplexed connection ({len(members)} rooms)")
 
     except Exception as e:
-        print(f"[socket] ⚠️ Unexpected error in {user_id}: {e}")
-        await broadcast(room_id, {"type": "user_list", "users": current_user_list(room_id)})
+        print(f"[socket] ⚠️ Unexpected error on multiplexed connection {client_id}: {e}")
+        for room_id, member in list(members.items()):
+            await get_room(room_id).call(depart, member, "error")
 
     finally:
-        # Final cleanup if no one left
-        if room_id in rooms and not rooms[room_id]["users"]:
-            try:
-                crud.update_meeting_state(
-                    db,
-                    schemas.MeetingStateUpdate(
-                        room_id=room_id,
-                        state=models.MeetingState.ENDED,
-                        updated_at=datetime.now(timezone.utc),
-                    ),
-                )
-                rooms.pop(room_id, None)
-            except Exception:
-                pass
+        await conn.close()
+        for room_id, member in list(members.items()):
+            await member.close()
+            await get_room(room_id).call(leave_and_close, member)
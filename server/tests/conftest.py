@@ -0,0 +1,33 @@
+import os
+import sys
+import tempfile
+
+# The hub's modules import each other top-level ("import crud"), as when run from server/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# database.py builds its engine on import; the tests never connect through it
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "meetly-tests.db"))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    import models
+    from database import engine
+
+    models.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture
+def hub(monkeypatch, database):
+    """socket_main with no rooms and a fresh in-process backplane."""
+    import socket_main
+    from backplane import LocalBackplane
+    from replay import ReplayBuffer
+
+    monkeypatch.setattr(socket_main, "rooms", {})
+    monkeypatch.setattr(socket_main, "backplane", LocalBackplane())
+    monkeypatch.setattr(socket_main, "replay_buffer", ReplayBuffer())
+    monkeypatch.setattr(socket_main, "draining", False)
+    return socket_main
@@ -0,0 +1,74 @@
+"""In-process stand-ins for driving the hub's endpoints from a test."""
+import asyncio
+import json
+
+from starlette.websockets import WebSocketState
+
+
+class FakeWebSocket:
+    """The parts of starlette's WebSocket the hub uses; the test plays the client."""
+
+    def __init__(self, query: dict = None, headers: dict = None):
+        self.query_params = dict(query or {})
+        self.headers = dict(headers or {})
+        self.client_state = WebSocketState.CONNECTED
+        self.sent = []
+        self.close_code = None
+        self._inbox = asyncio.Queue()
+
+    # ---------- Client side ----------
+
+    def send(self, msg):
+        """Deliver a frame to the hub: a dict is sent as JSON text, bytes as a binary frame."""
+        self._inbox.put_nowait(json.dumps(msg) if isinstance(msg, dict) else msg)
+
+    def disconnect(self, code: int = 1000):
+        self._inbox.put_nowait(code)
+
+    def messages(self, mtype: str = None) -> list:
+        """JSON messages the hub sent, optionally only one type."""
+        decoded = [json.loads(f) for f in self.sent if isinstance(f, str)]
+        return [m for m in decoded if mtype is None or m.get("type") == mtype]
+
+    # ---------- Hub side ----------
+
+    async def accept(self, *args, **kwargs):
+        pass
+
+    async def receive(self) -> dict:
+        item = await self._inbox.get()
+        if isinstance(item, int):
+            self.client_state = WebSocketState.DISCONNECTED
+            return {"type": "websocket.disconnect", "code": item}
+        if isinstance(item, bytes):
+            return {"type": "websocket.receive", "bytes": item}
+        return {"type": "websocket.receive", "text": item}
+
+    async def send_text(self, text: str):
+        self.sent.append(text)
+
+    async def send_bytes(self, data: bytes):
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000, reason: str = None):
+        if self.close_code is None:
+            self.close_code = code
+            self.client_state = WebSocketState.DISCONNECTED
+            self._inbox.put_nowait(code)
+
+
+async def settle(seconds: float = 0.05):
+    """Give room actors and writer tasks a moment to run."""
+    await asyncio.sleep(seconds)
+
+
+def run_hub(hub, scenario):
+    """Run `await scenario()` between the hub's startup and shutdown on a fresh loop."""
+    async def main():
+        await hub.startup()
+        try:
+            await scenario()
+        finally:
+            await hub.shutdown()
+
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+import asyncio
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+
+from backplane import LocalBackplane, RedisBackplane
+from frames import Frame
+
+
+async def start_node(server, inbox: list) -> RedisBackplane:
+    node = RedisBackplane(client=fakeredis.aioredis.FakeRedis(server=server))
+
+    async def deliver(room_id, frame, sender_id, target):
+        inbox.append((node.node_id, room_id, frame.data, sender_id, target))
+
+    await node.start(deliver)
+    return node
+
+
+async def received(inbox: list, count: int, timeout: float = 2.0) -> list:
+    """Wait until `count` deliveries arrived (and a moment more for strays)."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while len(inbox) < count and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    return inbox
+
+
+def run_nodes(count: int, scenario):
+    async def main():
+        server, inbox = fakeredis.FakeServer(), []
+        nodes = [await start_node(server, inbox) for _ in range(count)]
+        try:
+            await scenario(nodes, inbox)
+        finally:
+            for node in nodes:
+                await node.stop()
+
+    asyncio.run(main())
+
+
+def test_broadcasts_reach_the_other_subscribed_workers_only():
+    async def scenario(nodes, inbox):
+        a, b, c = nodes
+        await a.join("r1", "alice")
+        await b.join("r1", "bob")
+        await b.subscribe("r1")
+        await a.subscribe("r1")
+        await a.publish("r1", Frame("status_update", '{"x":1}'), sender_id="alice")
+        # The sender's own worker delivers locally; c holds no member of r1
+        assert await received(inbox, 1) == [(b.node_id, "r1", '{"x":1}', "alice", None)]
+        assert await a.members("r1") == ["alice", "bob"]
+
+    run_nodes(3, scenario)
+
+
+def test_directed_frames_go_to_the_workers_holding_the_targets():
+    async def scenario(nodes, inbox):
+        a, b, c = nodes
+        for node, uid in ((a, "alice"), (b, "bob"), (b, "bea"), (c, "carol")):
+            await node.join("r1", uid)
+        await a.publish("r1", Frame("signal", "offer"), "alice", target="bob")
+        await a.publish("r1", Frame("bot_audio", b"\x00wav"), "alice", target=["bob", "bea", "alice"])
+        assert await received(inbox, 2) == [
+            (b.node_id, "r1", "offer", "alice", "bob"),
+            (b.node_id, "r1", b"\x00wav", "alice", ["bob", "bea"]),
+        ]
+
+    run_nodes(3, scenario)
+
+
+def test_members_of_a_dead_worker_are_pruned():
+    async def scenario(nodes, inbox):
+        a, b = nodes
+        await a.join("r1", "alice")
+        await b.join("r1", "bob")
+        await b.stop()
+        assert await a.members("r1") == ["alice"]
+        # Only the worker that holds a member can remove it
+        assert not await a.leave("r1", "bob")
+
+    run_nodes(2, scenario)
+
+
+@pytest.mark.parametrize("make", [LocalBackplane, lambda: RedisBackplane(client=fakeredis.aioredis.FakeRedis())])
+def test_room_state_keeps_the_latest_frame_per_type_and_sender(make):
+    async def scenario():
+        plane = make()
+        await plane.save_state("r1", Frame("content_update", "v1", seq=1), "Jarvis")
+        await plane.save_state("r1", Frame("recording_update", "on", seq=2), "bob")
+        await plane.save_state("r1", Frame("content_update", "v2", seq=3), "Jarvis")
+        assert [(f.data, f.sender) for f in await plane.room_state("r1")] == [("on", "bob"), ("v2", "Jarvis")]
+        await plane.forget_sender("r1", "bob")
+        assert [f.data for f in await plane.room_state("r1")] == ["v2"]
+        await plane.clear_room("r1")
+        assert await plane.room_state("r1") == []
+
+    asyncio.run(scenario())
+
+
+def test_local_backplane_elects_the_first_host_and_counts():
+    async def scenario():
+        plane = LocalBackplane()
+        assert await plane.claim_host("r1", "alice") == "alice"
+        assert await plane.claim_host("r1", "bob") == "alice"
+        assert [await plane.next_seq("r1") for _ in range(3)] == [1, 2, 3]
+        assert await plane.bump_roster_version("r1") == 1
+        await plane.join("r1", "alice")
+        assert await plane.leave("r1", "alice")
+        assert not await plane.leave("r1", "alice")
+
+    asyncio.run(scenario())
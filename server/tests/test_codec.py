@@ -0,0 +1,49 @@
+import asyncio
+
+import msgpack
+import pytest
+
+import codec
+import replay
+from fakes import FakeWebSocket, run_hub, settle
+from frames import Frame, tag_room
+
+
+@pytest.mark.parametrize("entries", [1, 14, 15, 70_000])
+def test_prepend_splices_a_key_into_any_map_size(entries):
+    msg = {f"k{i}": i for i in range(entries)}
+    spliced = codec.prepend(msgpack.packb(msg), "room_seq", 7)
+    assert msgpack.unpackb(spliced) == {"room_seq": 7, **msg}
+
+
+def test_stamping_keeps_the_senders_messagepack_form():
+    sent = msgpack.packb({"type": "content_update", "payload": "<p>x</p>"})
+    frame = Frame.from_raw("content_update", codec.to_json(sent), "Jarvis", sent)
+    stamped = replay.stamp(frame, 3)
+    assert msgpack.unpackb(stamped.packed) == {"room_seq": 3, "type": "content_update", "payload": "<p>x</p>"}
+
+
+def test_room_tagged_copies_are_shared_per_room():
+    frame = Frame.from_message({"type": "status_update", "payload": {"muted": True}})
+    tagged = tag_room(frame, "r1")
+    assert tag_room(frame, "r1") is tagged
+    assert tag_room(frame, "r2") is not tagged
+    assert codec.packed(tagged) is codec.packed(tag_room(frame, "r1"))
+
+
+def test_messagepack_members_get_the_senders_bytes(hub):
+    async def scenario():
+        alice = FakeWebSocket(query={"codec": "msgpack"})
+        bob = FakeWebSocket(query={"codec": "msgpack"})
+        tasks = [asyncio.create_task(hub.websocket_endpoint(ws, "codec-room", uid))
+                 for ws, uid in ((alice, "alice"), (bob, "bob"))]
+        await settle()
+        sent = msgpack.packb({"type": "status_update", "payload": {"muted": True}})
+        alice.send(sent)
+        await settle()
+        assert bob.sent[-1] is sent
+        for ws in (alice, bob):
+            ws.disconnect()
+        await asyncio.gather(*tasks)
+
+    run_hub(hub, scenario)
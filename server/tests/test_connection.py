@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from connection import SLOW_CONSUMER_CLOSE_CODE, Connection
+from fakes import FakeWebSocket, settle
+from frames import Frame
+
+
+def frame(mtype: str, n: int, sender: str = "alice", seq: int = None) -> Frame:
+    return Frame(mtype, json.dumps({"type": mtype, "n": n}), sender, seq)
+
+
+def delivered(conn: Connection, frames, sends=None) -> tuple:
+    """Queue `frames` before the writer starts, then let it drain. Returns what send() said and what went out."""
+    async def scenario():
+        accepted = [conn.send(f) for f in frames]
+        conn.start()
+        await settle()
+        await conn.close()
+        return accepted
+
+    accepted = asyncio.run(scenario())
+    return accepted, [(m["type"], m["n"]) for m in conn.ws.messages()]
+
+
+def test_drop_oldest_keeps_the_newest_frames():
+    conn = Connection(FakeWebSocket(), "bob", "r1", maxsize=3, policy="drop_oldest")
+    accepted, sent = delivered(conn, [frame("chat_message", n) for n in range(5)])
+    assert accepted == [True] * 5
+    assert sent == [("chat_message", 2), ("chat_message", 3), ("chat_message", 4)]
+    assert conn.dropped == 2
+
+
+def test_drop_type_sheds_status_before_signaling():
+    conn = Connection(FakeWebSocket(), "bob", "r1", maxsize=2, policy="drop_type")
+    frames = [frame("status_update", 0), frame("signal", 1), frame("signal", 2),
+              frame("speaking_update", 3)]
+    accepted, sent = delivered(conn, frames)
+    # The queued status made way for a signal; a new status can't push a signal out
+    assert accepted == [True, True, True, False]
+    assert sent == [("signal", 1), ("signal", 2)]
+    assert conn.dropped == 2
+
+
+def test_drop_type_disconnects_when_only_signaling_is_left():
+    ws = FakeWebSocket()
+    conn = Connection(ws, "bob", "r1", maxsize=2, policy="drop_type")
+    accepted, sent = delivered(conn, [frame("signal", n) for n in range(3)])
+    assert accepted == [True, True, False]
+    assert sent == []
+    assert conn.closed and ws.close_code == SLOW_CONSUMER_CLOSE_CODE
+
+
+def test_disconnect_policy_closes_a_full_queue():
+    ws = FakeWebSocket()
+    conn = Connection(ws, "bob", "r1", maxsize=2, policy="disconnect")
+    accepted, sent = delivered(conn, [frame("chat_message", n) for n in range(3)] + [frame("chat_message", 9)])
+    assert accepted == [True, True, False, False]
+    assert sent == []
+    assert ws.close_code == SLOW_CONSUMER_CLOSE_CODE
+
+
+def test_pending_status_is_coalesced_in_place():
+    conn = Connection(FakeWebSocket(), "bob", "r1")
+    frames = [frame("status_update", 0), frame("chat_message", 1), frame("status_update", 2),
+              frame("status_update", 3, sender="carol"), frame("status_update", 4)]
+    _, sent = delivered(conn, frames)
+    assert sent == [("status_update", 4), ("chat_message", 1), ("status_update", 3)]
+    assert conn.coalesced == 2
+
+
+def test_sequenced_frames_are_never_coalesced():
+    conn = Connection(FakeWebSocket(), "bob", "r1")
+    _, sent = delivered(conn, [frame("progress_update", n, seq=n) for n in range(1, 4)])
+    assert sent == [("progress_update", 1), ("progress_update", 2), ("progress_update", 3)]
+    assert conn.coalesced == 0
@@ -0,0 +1,88 @@
+"""
+    cd server
+    python -m pytest tests
+"""
+import asyncio
+
+import pytest
+
+import db_writer
+from db_writer import DBWriter
+from models import MeetingStatusEnum
+
+
+class FailingSession:
+    """A session whose rollback fails too, as on a dropped connection."""
+
+    def rollback(self):
+        raise RuntimeError("connection lost")
+
+    def close(self):
+        pass
+
+
+def chat(text: str) -> dict:
+    return {"id": text, "from": "alice", "text": text, "ts": 1}
+
+
+@pytest.fixture
+def written(monkeypatch):
+    rows = []
+
+    def create_chat_message(db, room_id, message):
+        if isinstance(db, FailingSession):
+            raise RuntimeError("insert failed")
+        rows.append((room_id, message.text))
+
+    monkeypatch.setattr(db_writer.crud, "create_chat_message", create_chat_message)
+    monkeypatch.setattr(db_writer.crud, "update_meeting_state", lambda db, state: rows.append((state.room_id, state.state)))
+    return rows
+
+
+async def drain(writer: DBWriter):
+    for _ in range(100):
+        if not writer._states and writer._chats.empty():
+            break
+        await asyncio.sleep(0.01)
+    # Let the last batch's worker thread finish
+    await asyncio.sleep(0.05)
+
+
+def test_writer_keeps_running_after_failing_batches(written):
+    sessions = iter([FailingSession(), None])
+
+    def session_factory():
+        session = next(sessions, object())
+        if session is None:
+            raise RuntimeError("database is down")
+        return session
+
+    async def scenario():
+        writer = DBWriter(session_factory=session_factory, maxsize=4)
+        writer.start()
+        writer.create_chat_message("r1", chat("lost to the failing rollback"))
+        await drain(writer)
+        writer.update_meeting_state("r1", MeetingStatusEnum.ENDED)
+        await drain(writer)
+        assert not writer._task.done()
+        # Once the DB is back, new work is written as usual
+        for i in range(4):
+            assert writer.create_chat_message("r1", chat(f"m{i}"))
+        await drain(writer)
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert written == [("r1", f"m{i}") for i in range(4)]
+
+
+def test_full_queue_drops_instead_of_waiting(written):
+    async def scenario():
+        writer = DBWriter(session_factory=object, maxsize=2)
+        # Not started: nothing drains the queue
+        assert writer.create_chat_message("r1", chat("a"))
+        assert writer.create_chat_message("r1", chat("b"))
+        assert not writer.create_chat_message("r1", chat("c"))
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert written == [("r1", "a"), ("r1", "b")]
@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+from fakes import FakeWebSocket, run_hub, settle
+from frames import PEEK_LIMIT, peek_envelope
+
+
+def test_peek_reads_the_routing_keys_ahead_of_the_payload():
+    raw = json.dumps({"type": "signal", "to": "bob", "payload": {"sdp": "v=0" * 10_000}})
+    assert peek_envelope(raw) == {"type": "signal", "to": "bob"}
+
+
+def test_peek_gives_up_on_a_large_leading_field():
+    raw = json.dumps({"note": "x" * 1_000_000, "type": "signal", "to": "bob"})
+    assert peek_envelope(raw) is None
+    # A number cut off at the limit must not be read as a shorter one
+    raw = '{"to":' + "1" * PEEK_LIMIT + ',"type":"signal"}'
+    assert peek_envelope(raw) is None
+
+
+def test_frames_with_a_large_leading_field_are_still_routed(hub):
+    async def scenario():
+        alice, bob, carol = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.websocket_endpoint(ws, "peek-room", uid))
+                 for ws, uid in ((alice, "alice"), (bob, "bob"), (carol, "carol"))]
+        await settle()
+        alice.send({"note": "x" * 10_000, "type": "signal", "to": "bob", "action": "offer"})
+        await settle()
+        assert [m["action"] for m in bob.messages("signal")] == ["offer"]
+        assert not carol.messages("signal")
+        for ws in (alice, bob, carol):
+            ws.disconnect()
+        await asyncio.gather(*tasks)
+
+    run_hub(hub, scenario)
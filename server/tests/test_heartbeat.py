@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from fakes import FakeWebSocket, run_hub, settle
+from heartbeat import HEARTBEAT_CLOSE_CODE, Reaper
+
+
+class Watched:
+    """What the reaper reads and calls on a connection."""
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.room_id = "r1"
+        self.last_seen = time.monotonic()
+        self.closed = False
+        self.pings = 0
+        self.close_code = None
+
+    def send_ping(self):
+        self.pings += 1
+
+    def abort(self, code):
+        self.closed = True
+        self.close_code = code
+
+
+def watch(members, seconds: float, active=()) -> list:
+    """Watch `members` for `seconds` (keeping `active` ones talking); returns the evicted."""
+    async def scenario():
+        evicted = []
+
+        async def evict(conn):
+            evicted.append(conn)
+
+        reaper = Reaper(interval=0.05, timeout=0.15)
+        reaper.start(evict)
+        for m in members:
+            reaper.watch(m)
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for m in active:
+                m.last_seen = time.monotonic()
+            await asyncio.sleep(0.02)
+        await reaper.stop()
+        return evicted
+
+    return asyncio.run(scenario())
+
+
+def test_a_silent_member_is_pinged_then_evicted():
+    quiet = Watched("bob")
+    assert watch([quiet], 0.3) == [quiet]
+    assert quiet.pings >= 1
+    assert quiet.close_code == HEARTBEAT_CLOSE_CODE
+
+
+def test_active_members_are_left_alone():
+    talking, quiet = Watched("alice"), Watched("bob")
+    assert watch([talking, quiet], 0.4, active=[talking]) == [quiet]
+    assert not talking.closed
+
+
+def test_closed_connections_are_dropped_without_eviction():
+    gone = Watched("bob")
+    gone.closed = True
+    assert watch([gone], 0.3) == []
+    assert gone.pings == 0
+
+
+def test_the_room_hears_about_an_evicted_member(hub, monkeypatch):
+    monkeypatch.setattr(hub, "reaper", Reaper(interval=0.05, timeout=0.15))
+
+    async def scenario():
+        alice, bob = FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.websocket_endpoint(ws, "heartbeat-room", uid))
+                 for ws, uid in ((alice, "alice"), (bob, "bob"))]
+        for _ in range(20):
+            alice.send({"type": "pong"})
+            await settle(0.02)
+        await asyncio.wait_for(tasks[1], 2)
+        assert bob.close_code == HEARTBEAT_CLOSE_CODE
+        assert [m["user_id"] for m in alice.messages("user_left")] == ["bob"]
+        assert await hub.current_user_list("heartbeat-room") == ("alice",)
+        alice.disconnect()
+        await tasks[0]
+
+    run_hub(hub, scenario)
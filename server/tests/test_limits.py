@@ -0,0 +1,26 @@
+import limits
+from limits import RateLimiter, TokenBucket
+
+
+def test_bucket_allows_its_burst_then_refills():
+    bucket = TokenBucket(rate=10, burst=3)
+    now = bucket.stamp
+    assert [bucket.take(now) for _ in range(4)] == [True, True, True, False]
+    assert bucket.take(now + 0.1)
+
+
+def test_signal_budget_scales_with_the_room():
+    # A newcomer in a 50-member mesh sends offers and ICE to 49 peers at once
+    limiter = RateLimiter({"signal": (100, 200), "default": (20, 40)})
+    assert all(limiter.allow("signal", scale=49) for _ in range(300))
+    alone = RateLimiter({"signal": (100, 200), "default": (20, 40)})
+    assert not all(alone.allow("signal") for _ in range(300))
+
+
+def test_bot_exemption_needs_the_token(monkeypatch):
+    monkeypatch.setattr(limits, "HUB_BOT_TOKEN", None)
+    assert not limits.trusted_bot("Bearer anything")
+    monkeypatch.setattr(limits, "HUB_BOT_TOKEN", "s3cret")
+    assert limits.trusted_bot("Bearer s3cret")
+    assert not limits.trusted_bot("Bearer guess")
+    assert not limits.trusted_bot(None)
@@ -0,0 +1,66 @@
+import asyncio
+import json
+
+import replay
+from fakes import FakeWebSocket, run_hub, settle
+from frames import Frame
+from replay import ReplayBuffer
+
+
+def seqd(seq: int) -> Frame:
+    return Frame("chat_message", '{"type":"chat_message"}', "alice", seq)
+
+
+def test_stamp_splices_room_seq_into_the_frame():
+    stamped = replay.stamp(Frame.from_message({"type": "content_update", "payload": "<p/>"}), 7)
+    assert stamped.seq == 7
+    assert json.loads(stamped.data) == {"room_seq": 7, "type": "content_update", "payload": "<p/>"}
+
+
+def test_replay_covers_points_still_in_the_buffer():
+    buffer = ReplayBuffer(size=3)
+    buffer.open("r1", current_seq=10)
+    for seq in (11, 13, 12, 14):
+        buffer.record("r1", seqd(seq))
+    # 11 fell out of the ring: 12.. are replayable, in seq order
+    assert [f.seq for f in buffer.since("r1", 11)] == [12, 13, 14]
+    assert buffer.since("r1", 14) == []
+    # Too old, from the future, or a room this worker never buffered: reset
+    assert buffer.since("r1", 10) is None
+    assert buffer.since("r1", 15) is None
+    assert buffer.since("r2", 0) is None
+
+
+def test_a_reconnecting_member_gets_what_it_missed(hub):
+    async def scenario():
+        alice, bob = FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.websocket_endpoint(ws, "replay-room", uid))
+                 for ws, uid in ((alice, "alice"), (bob, "bob"))]
+        await settle()
+        alice.send({"type": "content_update", "payload": "v1"})
+        await settle()
+        resume_from = bob.messages("content_update")[-1]["room_seq"]
+        bob.disconnect()
+        await tasks[1]
+
+        alice.send({"type": "content_update", "payload": "v2"})
+        alice.send({"type": "bot_message", "message": "hello"})
+        await settle()
+        bob = FakeWebSocket(query={"resume_from": str(resume_from)})
+        tasks[1] = asyncio.create_task(hub.websocket_endpoint(bob, "replay-room", "bob"))
+        await settle()
+        missed = [m for m in bob.messages() if "room_seq" in m]
+        assert [(m["type"], m["room_seq"]) for m in missed] == [
+            ("content_update", resume_from + 1), ("bot_message", resume_from + 2)]
+        assert not bob.messages("replay_reset")
+
+        # A point this room never reached (e.g. saved against an older room): start over
+        late = FakeWebSocket(query={"resume_from": "99"})
+        tasks.append(asyncio.create_task(hub.websocket_endpoint(late, "replay-room", "carol")))
+        await settle()
+        assert late.messages("replay_reset")
+        for ws in (alice, bob, late):
+            ws.disconnect()
+        await asyncio.gather(*tasks)
+
+    run_hub(hub, scenario)
@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+import snapshot
+from backplane import LocalBackplane
+from fakes import FakeWebSocket, run_hub, settle
+from replay import ReplayBuffer
+
+
+@pytest.fixture
+def snapshots(monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshot, "HUB_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(snapshot, "ENABLED", True)
+    return tmp_path
+
+
+def test_a_client_closing_with_1012_leaves(hub, snapshots):
+    async def scenario():
+        alice, bob = FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.websocket_endpoint(ws, "restart-client", uid))
+                 for ws, uid in ((alice, "alice"), (bob, "bob"))]
+        await settle()
+        bob.disconnect(1012)
+        await tasks[1]
+        await settle()
+        assert await hub.current_user_list("restart-client") == ("alice",)
+        assert not hub.rooms["restart-client"].ghosts
+        assert [m["user_id"] for m in alice.messages("user_left")] == ["bob"]
+        alice.disconnect()
+        await tasks[0]
+
+    run_hub(hub, scenario)
+
+
+def test_members_closed_while_draining_are_parked_and_restored(hub, snapshots, monkeypatch):
+    tokens = {}
+
+    async def before_restart():
+        alice, bob = FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.websocket_endpoint(ws, "restart-hub", uid))
+                 for ws, uid in ((alice, "alice"), (bob, "bob"))]
+        await settle()
+        for ws, uid in ((alice, "alice"), (bob, "bob")):
+            tokens[uid] = ws.messages("session")[0]["resume_token"]
+        # What the stop signal does before the server closes the sockets
+        hub.draining = True
+        for ws in (alice, bob):
+            ws.disconnect(1012)
+        await asyncio.gather(*tasks)
+        assert set(hub.rooms["restart-hub"].ghosts) == {"alice", "bob"}
+        assert not alice.messages("user_left")
+
+    run_hub(hub, before_restart)
+    assert list(snapshots.glob("*.json"))
+
+    # The next process: nothing carried over but the snapshot
+    monkeypatch.setattr(hub, "rooms", {})
+    monkeypatch.setattr(hub, "backplane", LocalBackplane())
+    monkeypatch.setattr(hub, "replay_buffer", ReplayBuffer())
+    monkeypatch.setattr(hub, "draining", False)
+
+    async def after_restart():
+        assert set(await hub.current_user_list("restart-hub")) == {"alice", "bob"}
+        alice = FakeWebSocket(query={"resume_token": tokens["alice"]})
+        task = asyncio.create_task(hub.websocket_endpoint(alice, "restart-hub", "alice"))
+        await settle()
+        assert "alice" in hub.rooms["restart-hub"].users
+        assert "alice" not in hub.rooms["restart-hub"].ghosts
+        alice.disconnect()
+        await task
+
+    run_hub(hub, after_restart)
+
+
+def test_snapshots_need_an_absolute_directory(monkeypatch):
+    monkeypatch.setattr(snapshot, "ENABLED", False)
+    monkeypatch.setattr(snapshot, "HUB_SNAPSHOT_DIR", "")
+    assert "not set" in snapshot.config_warning()
+    monkeypatch.setattr(snapshot, "HUB_SNAPSHOT_DIR", "hub_snapshots")
+    assert "absolute" in snapshot.config_warning()
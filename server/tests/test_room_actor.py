@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from fakes import FakeWebSocket, run_hub, settle
+from room_actor import Member, RoomActor
+
+
+def test_work_runs_one_item_at_a_time_in_order():
+    async def scenario():
+        log = []
+
+        async def step(name):
+            log.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            log.append(f"{name} end")
+
+        room = RoomActor("r1", on_idle=lambda r: None)
+        room.users["alice"] = Member(None, "t")
+        for name in ("a", "b"):
+            await room.submit(step, name)
+        assert await room.call(asyncio.sleep, 0, "done") == "done"
+        assert log == ["a start", "a end", "b start", "b end"]
+        await room.stop()
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_the_caller_and_the_room_carries_on():
+    async def scenario():
+        async def boom():
+            raise ValueError("bad frame")
+
+        room = RoomActor("r1", on_idle=lambda r: None)
+        room.users["alice"] = Member(None, "t")
+        with pytest.raises(ValueError):
+            await room.call(boom)
+        room.post(boom)
+        assert await room.call(asyncio.sleep, 0, 1) == 1
+        await room.stop()
+
+    asyncio.run(scenario())
+
+
+def test_an_idle_room_retires_and_refuses_new_work():
+    async def scenario():
+        retired = []
+        room = RoomActor("r1", on_idle=retired.append)
+        room.users["alice"] = Member(None, "t")
+        await room.call(asyncio.sleep, 0)
+        assert not retired
+
+        async def last_member_leaves():
+            room.users.clear()
+
+        await room.call(last_member_leaves)
+        await settle()
+        assert retired == [room] and room.closed
+        ran = []
+
+        async def late():
+            ran.append(1)
+
+        room.post(late)
+        await settle()
+        assert not ran
+        # Nobody owns the state any more: call() runs the work directly
+        assert await room.call(asyncio.sleep, 0, "direct") == "direct"
+
+    asyncio.run(scenario())
+
+
+def test_parked_members_keep_the_room_alive():
+    async def scenario():
+        retired = []
+        room = RoomActor("r1", on_idle=retired.append)
+        room.ghosts["alice"] = "token"
+        await room.call(asyncio.sleep, 0)
+        await settle()
+        assert not retired and not room.closed
+        await room.stop()
+
+    asyncio.run(scenario())
+
+
+def test_the_hub_drops_a_room_once_its_last_member_leaves(hub):
+    async def scenario():
+        alice = FakeWebSocket()
+        task = asyncio.create_task(hub.websocket_endpoint(alice, "actor-room", "alice"))
+        await settle()
+        first = hub.rooms["actor-room"]
+        alice.disconnect()
+        await task
+        await settle()
+        assert "actor-room" not in hub.rooms and first.closed
+
+        alice = FakeWebSocket()
+        task = asyncio.create_task(hub.websocket_endpoint(alice, "actor-room", "alice"))
+        await settle()
+        assert hub.rooms["actor-room"] is not first
+        alice.disconnect()
+        await task
+
+    run_hub(hub, scenario)
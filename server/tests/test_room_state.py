@@ -0,0 +1,27 @@
+import asyncio
+
+from fakes import FakeWebSocket, run_hub, settle
+
+
+def test_late_joiners_get_no_state_from_members_who_left(hub):
+    async def scenario():
+        alice, bob = FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.websocket_endpoint(ws, "state-room", uid))
+                 for ws, uid in ((alice, "alice"), (bob, "bob"))]
+        await settle()
+        alice.send({"type": "progress_update", "payload": {"step": 1}})
+        bob.send({"type": "recording_update", "payload": {"recording": True}})
+        await settle()
+        bob.disconnect()
+        await tasks[1]
+
+        carol = FakeWebSocket()
+        tasks.append(asyncio.create_task(hub.websocket_endpoint(carol, "state-room", "carol")))
+        await settle()
+        assert [m["payload"] for m in carol.messages("progress_update")] == [{"step": 1}]
+        assert not carol.messages("recording_update")
+        for ws in (alice, carol):
+            ws.disconnect()
+        await asyncio.gather(tasks[0], tasks[2])
+
+    run_hub(hub, scenario)
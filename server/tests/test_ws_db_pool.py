@@ -0,0 +1,109 @@
+"""
+Open signaling sockets must not starve the REST API of DB connections.
+
+Runs the app on a real port with a deliberately small pool (2 connections,
+no overflow) shared by REST and the hub's DB writer, opens many WebSockets
+and checks a DB-backed REST endpoint still answers promptly. A socket that
+pinned a session would exhaust the pool after two members.
+"""
+import asyncio
+import socket
+import time
+
+import httpx
+import pytest
+import uvicorn
+import websockets
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+
+SOCKETS = 60
+ROOMS = 6
+REQUESTS = 40
+POOL_TIMEOUT = 3
+REST_PATH = "/api/customers/slug/pool-check"
+
+
+@pytest.fixture
+def small_pool(hub, monkeypatch):
+    engine = create_engine(database.DATABASE_URL, pool_size=2, max_overflow=0, pool_timeout=POOL_TIMEOUT)
+    sessions = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(hub.db_writer, "session_factory", sessions)
+    yield sessions
+    engine.dispose()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def rest_latencies(client: httpx.AsyncClient) -> list:
+    # One at a time: the REST handlers run their queries on the event loop,
+    # so concurrent requests would contend for the two connections themselves
+    latencies = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = await client.get(REST_PATH)
+        assert response.status_code < 500
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def drain(ws):
+    try:
+        async for _ in ws:
+            pass
+    except websockets.ConnectionClosed:
+        pass
+
+
+def test_open_sockets_leave_rest_latency_alone(small_pool):
+    from main import app
+
+    def get_db():
+        db = small_pool()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = get_db
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning",
+                                           ws="websockets-sansio"))
+
+    async def scenario():
+        serving = asyncio.create_task(server.serve())
+        while not server.started:
+            assert not serving.done()
+            await asyncio.sleep(0.02)
+        sockets = []
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=POOL_TIMEOUT * 2) as client:
+                before = await rest_latencies(client)
+                for i in range(SOCKETS):
+                    ws = await websockets.connect(f"ws://127.0.0.1:{port}/ws/pool-room-{i % ROOMS}/pool-user-{i}")
+                    sockets.append((ws, asyncio.create_task(drain(ws))))
+                await asyncio.sleep(0.2)
+                # Chat is persisted through the same small pool while REST is measured
+                for ws, _ in sockets[:ROOMS]:
+                    await ws.send('{"type":"chat_message_to_server","payload":{"id":"m","text":"hi","ts":1}}')
+                after = await rest_latencies(client)
+        finally:
+            for ws, reader in sockets:
+                await ws.close()
+                await reader
+            server.should_exit = True
+            await serving
+        return before, after
+
+    try:
+        before, after = asyncio.run(scenario())
+    finally:
+        app.dependency_overrides.clear()
+    # Waiting on the pool would take up to POOL_TIMEOUT seconds (then fail)
+    assert max(after) < max(1.0, 5 * max(before))
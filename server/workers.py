@@ -0,0 +1,28 @@
+# workers.py
+"""
+Gunicorn worker class for the hub (`gunicorn -k workers.HubWorker main:app`).
+
+Same as uvicorn's worker, plus control over permessage-deflate on /ws and a
+WebSocket message size limit that leaves room for the hub's own limits.
+Negotiated deflate compresses every outbound frame once per socket, so it
+trades hub CPU for bandwidth on all traffic. Large payloads can instead be
+compressed once by their sender (see "Compressed frames" in frames.py), and
+the hub relays them without touching them again.
+"""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+from limits import MAX_AUDIO_FRAME_BYTES, MAX_FRAME_BYTES
+
+# Offer permessage-deflate to clients that ask for it ("0" to turn it off)
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "1") == "1"
+
+
+class HubWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "ws_per_message_deflate": WS_PER_MESSAGE_DEFLATE,
+        # The hub applies its own per-type limits (limits.py); the server must not cut in first
+        "ws_max_size": max(MAX_FRAME_BYTES, MAX_AUDIO_FRAME_BYTES),
+    }
@@ -0,0 +1,9 @@
+"""
+Client side of the hub's signaling protocol, shared by the AI host and the
+recording bot: wire format (frames), codec negotiation (codec) and the
+multiplexed connection (mux_client), plus the bot credentials the hub checks
+(auth). Each bot keeps its own SignalingClient.
+
+The hub (server/) is built from its own directory and keeps its own copy of
+the wire format; tests/test_wire_compat.py fails if the two drift apart.
+"""
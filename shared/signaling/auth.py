@@ -0,0 +1,25 @@
+# signaling/auth.py
+"""
+Credentials a bot presents to the hub.
+
+With HUB_BOT_TOKEN set (the same secret as the hub's), a bot's sockets send
+it as a bearer token and are let into rooms that are at their member cap.
+The hub does not trust a bot-looking user id for that: clients pick their own.
+"""
+import os
+
+import websockets
+
+HUB_BOT_TOKEN = os.getenv("HUB_BOT_TOKEN")
+
+
+def connect_kwargs(headers: dict = None) -> dict:
+    """Keyword arguments for websockets.connect carrying `headers` plus the bot token."""
+    headers = dict(headers or {})
+    if HUB_BOT_TOKEN:
+        headers["Authorization"] = f"Bearer {HUB_BOT_TOKEN}"
+    if not headers:
+        return {}
+    # websockets 14 replaced the legacy client, which called this extra_headers
+    legacy = int(websockets.__version__.split(".")[0]) < 14
+    return {"extra_headers" if legacy else "additional_headers": headers}
@@ -0,0 +1,56 @@
+# signaling/codec.py
+"""
+Wire codec for signaling messages (must match server/codec.py; see tests/test_wire_compat.py).
+
+A client asks the hub for MessagePack with ?codec=msgpack and learns what it
+got from the "session" message; until then, and whenever the hub or this
+process lacks the optional `msgpack` package, everything is JSON text. Either
+side may receive both: text is JSON, a binary message is MessagePack if it
+starts with a map marker and otherwise a binary frame (signaling.frames).
+"""
+import json
+import os
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+AVAILABLE = (JSON, MSGPACK) if msgpack is not None else (JSON,)
+# Codec to ask the hub for: json | msgpack
+SIGNALING_CODEC = os.getenv("SIGNALING_CODEC", JSON)
+
+
+def preferred() -> str:
+    """The codec to request, JSON if the configured one is not installed."""
+    return SIGNALING_CODEC if SIGNALING_CODEC in AVAILABLE else JSON
+
+
+def is_packed(data: bytes) -> bool:
+    """True if binary data is a MessagePack map rather than a binary frame (version byte 0x01)."""
+    return len(data) > 0 and (0x80 <= data[0] <= 0x8F or data[0] in (0xDE, 0xDF))
+
+
+def encode(msg: dict, codec: str = JSON):
+    """One message as JSON text or MessagePack bytes."""
+    if codec == MSGPACK:
+        return msgpack.packb(msg, use_bin_type=True)
+    return json.dumps(msg)
+
+
+def decode(data) -> dict:
+    """Text is JSON, bytes are MessagePack. Raises ValueError if malformed."""
+    if isinstance(data, str):
+        msg = json.loads(data)
+    elif msgpack is None:
+        raise ValueError("MessagePack message but msgpack is not installed")
+    else:
+        try:
+            msg = msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            raise ValueError(f"bad MessagePack message: {e}") from e
+    if not isinstance(msg, dict):
+        raise ValueError("message must be an object")
+    return msg
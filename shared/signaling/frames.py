@@ -0,0 +1,82 @@
+# signaling/frames.py
+import json
+import os
+import struct
+import zlib
+
+from signaling.codec import JSON, decode, encode, is_packed
+
+# Binary signaling frames (must match server/frames.py):
+#   [1 byte version][2 bytes header length, big-endian][JSON header][raw payload]
+BINARY_FRAME_VERSION = 1
+_BINARY_PREFIX = struct.Struct("!BH")
+
+
+def pack_binary(header: dict, payload: bytes) -> bytes:
+    """Build a binary frame from a routing header and a raw payload."""
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    return _BINARY_PREFIX.pack(BINARY_FRAME_VERSION, len(head)) + head + payload
+
+
+def unpack_binary(data: bytes):
+    """Split a binary frame into (header, payload). Raises ValueError if malformed."""
+    if len(data) < _BINARY_PREFIX.size:
+        raise ValueError("binary frame too short")
+    version, head_len = _BINARY_PREFIX.unpack_from(data)
+    if version != BINARY_FRAME_VERSION:
+        raise ValueError(f"unsupported binary frame version {version}")
+    end = _BINARY_PREFIX.size + head_len
+    if len(data) < end:
+        raise ValueError("truncated binary frame header")
+    header = json.loads(data[_BINARY_PREFIX.size:end])
+    if not isinstance(header, dict):
+        raise ValueError("binary frame header must be an object")
+    return header, bytes(data[end:])
+
+
+# Compressed JSON messages (must match server/frames.py): a binary frame whose
+# header holds the routing keys plus "enc": "deflate" and whose payload is the
+# whole message, zlib-compressed. The hub relays it without recompressing.
+ENC_DEFLATE = "deflate"
+COMPRESS_THRESHOLD = int(os.getenv("WS_COMPRESS_THRESHOLD", "4096"))
+HEADER_KEYS = ("room", "type", "from", "to", "to_except", "room_seq")
+# Only bulk payloads are worth it: signal (SDP) and chat stay text so the hub
+# can route them from the envelope without inflating anything
+COMPRESS_TYPES = frozenset({"content_update", "meeting_summary", "bot_message", "bot_audio"})
+
+
+def encode_message(msg: dict, codec: str = JSON):
+    """The message in `codec`, or a compressed binary frame (of JSON) if it is a large bulk type."""
+    data = encode(msg, codec)
+    if len(data) < COMPRESS_THRESHOLD or msg.get("type") not in COMPRESS_TYPES:
+        return data
+    text = data if isinstance(data, str) else json.dumps(msg)
+    header = {k: msg[k] for k in HEADER_KEYS if k in msg}
+    header["enc"] = ENC_DEFLATE
+    return pack_binary(header, zlib.compress(text.encode("utf-8")))
+
+
+def decompress_message(header: dict, payload: bytes) -> dict:
+    """Inflate a compressed frame back into its message. Raises ValueError if malformed."""
+    try:
+        msg = json.loads(zlib.decompress(payload))
+    except zlib.error as e:
+        raise ValueError(f"bad compressed frame: {e}") from e
+    if not isinstance(msg, dict):
+        raise ValueError("compressed frame must hold a JSON object")
+    msg.update((k, header[k]) for k in HEADER_KEYS if k in header)
+    return msg
+
+
+def decode_frame(message) -> dict:
+    """
+    Anything the hub sends as a message: JSON text, MessagePack, or a binary
+    frame (compressed ones inflated; otherwise the raw payload is under "data").
+    Raises ValueError if malformed.
+    """
+    if not isinstance(message, bytes) or is_packed(message):
+        return decode(message)
+    header, payload = unpack_binary(message)
+    if header.get("enc") == ENC_DEFLATE:
+        return decompress_message(header, payload)
+    return {**header, "data": payload}
@@ -0,0 +1,238 @@
+# signaling/mux_client.py
+"""
+One hub connection for a bot process serving many rooms.
+
+SignalingClient opens a WebSocket per room. MuxClient opens a single one to
+the hub's /ws-mux/<client_id> endpoint and hands out a MuxChannel per room;
+frames carry a "room" key (or a "room" header field for binary frames) in
+both directions. A channel has the same interface as SignalingClient
+(connect, listen, send, close, is_connected), so the listener and the
+recording bot can use either.
+
+    mux = MuxClient("wss://hub.example/ws", "recorder-1")
+    signaling = mux.channel(room_id, bot_id, on_message)
+    await signaling.connect()
+    asyncio.create_task(signaling.listen())
+"""
+import asyncio
+from urllib.parse import quote
+
+import websockets
+from websockets.exceptions import ConnectionClosed
+
+from signaling import codec
+from signaling.auth import connect_kwargs
+from signaling.frames import decode_frame, encode_message, pack_binary
+from signaling.sequence import RoomSeq
+
+# Close code of a hub that is being replaced: reconnect and re-join with the resume tokens
+RESTART_CLOSE_CODE = 1012
+# Closes a reconnect cannot fix: normal closure, room full (server/limits.py)
+FINAL_CLOSE_CODES = frozenset((1000, 4003))
+RECONNECT_ATTEMPTS = 8
+
+
+class MuxChannel:
+    """One room on a MuxClient, usable wherever a SignalingClient is."""
+
+    def __init__(self, mux: "MuxClient", room: str, name: str, on_message_callback, subscribe=None):
+        self.mux = mux
+        self.room = room
+        self.name = name
+        self.on_message_callback = on_message_callback
+        # Message types the hub should send us (None = all)
+        self.subscribe = list(subscribe) if subscribe else None
+        # room_seq tracking; the highest seen is sent as resume_from when re-joining
+        self.seq = RoomSeq()
+        # Given by the hub on join; lets us re-attach silently after a hub restart
+        self.resume_token = None
+        self._inbox = asyncio.Queue()
+        self._is_connected = False
+
+    @property
+    def is_connected(self) -> bool:
+        return self._is_connected and self.mux.is_connected
+
+    def join_message(self) -> dict:
+        msg = {"type": "mux_join", "room": self.room, "user_id": self.name}
+        if self.seq.last:
+            msg["resume_from"] = self.seq.last
+        if self.resume_token:
+            msg["resume_token"] = self.resume_token
+        if self.subscribe:
+            msg["subscribe"] = self.subscribe
+        return msg
+
+    async def connect(self):
+        """Join the room over the shared connection (opened on first use)."""
+        await self.mux.join(self)
+        self._is_connected = True
+
+    async def listen(self):
+        """Hand this room's messages to the callback, in order, until the channel is closed."""
+        while True:
+            data = await self._inbox.get()
+            if data is None:
+                return
+            try:
+                await self.on_message_callback(data)
+            except Exception as e:
+                # One room's handler failing must not take the others down
+                print(f"[Mux:{self.name}@{self.room}] ❌ Error handling {data.get('type')}: {e}")
+
+    def _deliver(self, data: dict):
+        if data.get("type") == "session":
+            self.resume_token = data.get("resume_token")
+            return
+        if self.seq.accept(data):
+            self._inbox.put_nowait(data)
+
+    async def send(self, msg: dict, payload: bytes = None):
+        """Send a JSON message, or a binary frame with `msg` as its header when raw `payload` is given."""
+        if self._is_connected:
+            # "room" first: the hub routes on the leading keys
+            await self.mux.send({"room": self.room, **msg}, payload)
+
+    async def close(self):
+        """Leave the room; the shared connection stays open for the other rooms."""
+        if self._is_connected:
+            self._is_connected = False
+            await self.mux.leave(self)
+        self._inbox.put_nowait(None)
+
+    disconnect = close
+
+
+class MuxClient:
+    """A single WebSocket to the hub shared by every room this process is in."""
+
+    def __init__(self, server_url: str, client_id: str, wire_codec: str = None):
+        # server_url is the same ".../ws" base SignalingClient takes
+        self.url = f"{server_url.rstrip('/')}-mux/{quote(client_id, safe='')}"
+        wire_codec = wire_codec or codec.preferred()
+        if wire_codec != codec.JSON:
+            self.url += f"?codec={wire_codec}"
+        self.client_id = client_id
+        # Codec in use: JSON until a session message confirms the one asked for
+        self.codec = codec.JSON
+        self.ws = None
+        # room -> MuxChannel
+        self.channels = {}
+        self._lock = asyncio.Lock()
+        self._reader = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.ws is not None and self._reader is not None and not self._reader.done()
+
+    def channel(self, room: str, name: str, on_message_callback, subscribe=None) -> MuxChannel:
+        return MuxChannel(self, room, name, on_message_callback, subscribe)
+
+    async def _ensure_connected(self):
+        async with self._lock:
+            if self.is_connected:
+                return
+            print(f"[Mux:{self.client_id}] Connecting to {self.url}")
+            try:
+                self.ws = await websockets.connect(self.url, **connect_kwargs())
+                self.codec = codec.JSON
+            except Exception as e:
+                print(f"[Mux:{self.client_id}] ❌ Connection failed: {e}")
+                raise
+            print(f"[Mux:{self.client_id}] ✅ Connection successful.")
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def join(self, channel: MuxChannel):
+        await self._ensure_connected()
+        self.channels[channel.room] = channel
+        await self.ws.send(encode_message(channel.join_message(), self.codec))
+
+    async def leave(self, channel: MuxChannel):
+        if self.channels.get(channel.room) is channel:
+            del self.channels[channel.room]
+            await self.send({"type": "mux_leave", "room": channel.room})
+
+    async def send(self, msg: dict, payload: bytes = None):
+        if not self.is_connected:
+            return
+        try:
+            if payload is not None:
+                await self.ws.send(pack_binary(msg, payload))
+            else:
+                await self.ws.send(encode_message(msg, self.codec))
+        except ConnectionClosed:
+            print(f"[Mux:{self.client_id}] ⚠️ Attempted to send on a closed connection.")
+
+    async def close(self):
+        """Close the shared connection; every channel ends with it."""
+        if self._reader and not self._reader.done():
+            self._reader.cancel()
+        if self.ws:
+            await self.ws.close()
+        self._end_channels()
+
+    def _end_channels(self):
+        for channel in list(self.channels.values()):
+            channel._is_connected = False
+            channel._inbox.put_nowait(None)
+        self.channels.clear()
+
+    async def _read_loop(self):
+        try:
+            while True:
+                try:
+                    await self._receive_loop()
+                    return
+                except ConnectionClosed as e:
+                    # Restart or dropped connection: re-join every room with resume_from
+                    # (and its token), so the hub replays what each one missed
+                    code = e.rcvd.code if e.rcvd else None
+                    if code in FINAL_CLOSE_CODES or not self.channels:
+                        raise
+                    if code == RESTART_CLOSE_CODE:
+                        print(f"[Mux:{self.client_id}] 🔁 Hub restarting, reconnecting {len(self.channels)} rooms...")
+                    else:
+                        print(f"[Mux:{self.client_id}] 🔁 Connection lost ({code}), reconnecting {len(self.channels)} rooms...")
+                    if not await self._reconnect():
+                        raise
+        except asyncio.CancelledError:
+            pass
+        except ConnectionClosed:
+            print(f"[Mux:{self.client_id}] 🔌 Connection closed.")
+        except Exception as e:
+            print(f"[Mux:{self.client_id}] ❌ Unexpected error in listen loop: {e}")
+        finally:
+            self._end_channels()
+
+    async def _receive_loop(self):
+        async for message in self.ws:
+            try:
+                data = decode_frame(message)
+            except ValueError:
+                print(f"[Mux:{self.client_id}] ⚠️ Received malformed message.")
+                continue
+            if data.get("type") == "ping":
+                # Hub heartbeat for the whole connection
+                await self.send({"type": "pong", "ts": data.get("ts")})
+                continue
+            if data.get("type") == "session":
+                self.codec = data.get("codec") or codec.JSON
+            channel = self.channels.get(data.get("room"))
+            if channel is not None:
+                channel._deliver(data)
+            elif data.get("type") == "error":
+                print(f"[Mux:{self.client_id}] ⚠️ Hub error: {data}")
+
+    async def _reconnect(self) -> bool:
+        """Reconnect and re-join every room with resume_from and its token."""
+        for attempt in range(RECONNECT_ATTEMPTS):
+            await asyncio.sleep(min(0.5 * 2 ** attempt, 5.0))
+            try:
+                self.ws = await websockets.connect(self.url, **connect_kwargs())
+                self.codec = codec.JSON
+                for channel in list(self.channels.values()):
+                    await self.ws.send(encode_message(channel.join_message()))
+                return True
+            except Exception:
+                continue
+        return False
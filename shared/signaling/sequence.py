@@ -0,0 +1,49 @@
+# signaling/sequence.py
+"""
+Room sequence tracking for the hub's replay buffer.
+
+Replayable room messages carry a "room_seq". A client remembers the highest
+one it has seen, sends it as resume_from when it reconnects, and drops frames
+it has already handled (a replay can overlap live traffic). Frames are not
+guaranteed to arrive strictly in order, though, so a seq below the highest is
+only a duplicate if it was actually delivered: numbers that were skipped over
+are remembered, and a late frame filling one of those gaps is still accepted.
+"""
+
+# Skipped seqs remembered per room; the oldest gaps are given up on first
+MAX_GAPS = 256
+
+
+class RoomSeq:
+    """The room_seq state of one client in one room."""
+
+    __slots__ = ("last", "_gaps")
+
+    def __init__(self):
+        self.last = 0
+        self._gaps = set()
+
+    def reset(self, seq: int = 0):
+        self.last = seq or 0
+        self._gaps.clear()
+
+    def accept(self, data: dict) -> bool:
+        """Track room_seq; False only for a frame that was already delivered."""
+        if data.get("type") == "replay_reset":
+            self.reset(data.get("room_seq"))
+            return True
+        seq = data.get("room_seq")
+        if not isinstance(seq, int):
+            return True
+        if seq > self.last:
+            if self.last:
+                # Before the first frame there is nothing to have skipped
+                self._gaps.update(range(max(self.last + 1, seq - MAX_GAPS), seq))
+                if len(self._gaps) > MAX_GAPS:
+                    self._gaps = set(sorted(self._gaps)[-MAX_GAPS:])
+            self.last = seq
+            return True
+        if seq in self._gaps:
+            self._gaps.discard(seq)
+            return True
+        return False
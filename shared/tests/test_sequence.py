@@ -0,0 +1,47 @@
+from signaling.sequence import MAX_GAPS, RoomSeq
+
+
+def _seq(n):
+    return {"type": "chat_message", "room_seq": n}
+
+
+def test_duplicates_are_dropped():
+    seq = RoomSeq()
+    assert [seq.accept(_seq(n)) for n in (1, 2, 2, 1, 3)] == [True, True, False, False, True]
+    assert seq.last == 3
+
+
+def test_a_late_frame_filling_a_gap_is_delivered_once():
+    seq = RoomSeq()
+    assert seq.accept(_seq(5))
+    assert seq.accept(_seq(7))
+    assert seq.accept(_seq(6))
+    assert not seq.accept(_seq(6))
+    assert seq.last == 7
+
+
+def test_unsequenced_frames_always_pass():
+    seq = RoomSeq()
+    seq.accept(_seq(4))
+    assert seq.accept({"type": "signal"})
+    assert seq.accept({"type": "chat_message", "room_seq": None})
+
+
+def test_replay_reset_starts_over():
+    seq = RoomSeq()
+    seq.accept(_seq(10))
+    seq.accept(_seq(12))
+    assert seq.accept({"type": "replay_reset", "room_seq": 3})
+    assert seq.last == 3
+    assert not seq.accept(_seq(3))
+    assert seq.accept(_seq(4))
+    assert not seq.accept(_seq(2))
+
+
+def test_gaps_are_bounded():
+    seq = RoomSeq()
+    seq.accept(_seq(1))
+    seq.accept(_seq(10_000))
+    assert len(seq._gaps) <= MAX_GAPS
+    assert seq.accept(_seq(9_999))
+    assert not seq.accept(_seq(2))
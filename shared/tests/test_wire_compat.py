@@ -0,0 +1,88 @@
+"""
+The hub (server/frames.py, server/codec.py) and the bots (signaling.frames,
+signaling.codec) each implement the wire format. These tests fail as soon as
+the two stop understanding each other.
+
+    cd shared
+    python -m pytest
+"""
+import importlib.util
+import os
+import zlib
+
+import pytest
+
+from signaling import codec, frames
+
+SERVER_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "server")
+
+
+def _server_module(name: str):
+    # Loaded by path under another name: the hub's modules are top-level "frames"/"codec"
+    spec = importlib.util.spec_from_file_location(f"hub_{name}", os.path.join(SERVER_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+hub_frames = _server_module("frames")
+hub_codec = _server_module("codec")
+
+SMALL = {"type": "signal", "to": "bob", "from": "alice", "action": "offer", "payload": {"sdp": "v=0\r\n"}}
+LARGE = {"type": "content_update", "from": "Jarvis", "to_except": ["bob"], "seq": 3,
+         "payload": "<div>" + "task " * 2000 + "</div>"}
+
+
+def test_constants_match():
+    assert frames.BINARY_FRAME_VERSION == hub_frames.BINARY_FRAME_VERSION
+    assert frames.HEADER_KEYS == hub_frames.HEADER_KEYS
+    assert frames.ENC_DEFLATE == hub_frames.ENC_DEFLATE
+    assert frames.COMPRESS_THRESHOLD == hub_frames.COMPRESS_THRESHOLD
+    assert (codec.JSON, codec.MSGPACK) == (hub_codec.JSON, hub_codec.MSGPACK)
+
+
+def test_binary_frames_round_trip_both_ways():
+    header, payload = {"type": "bot_audio", "from": "Jarvis", "seq": 2, "format": "wav"}, b"\x00RIFF\x01"
+    assert hub_frames.unpack_binary(frames.pack_binary(header, payload)) == (header, payload)
+    assert frames.unpack_binary(hub_frames.pack_binary(header, payload)) == (header, payload)
+
+
+def test_compressed_messages_round_trip_both_ways():
+    sent = frames.encode_message(LARGE)
+    assert isinstance(sent, bytes)
+    header = hub_frames.read_binary_header(sent)
+    assert header["enc"] == hub_frames.ENC_DEFLATE
+    assert hub_frames.decompress_message(header, hub_frames.unpack_binary(sent)[1]) == LARGE
+
+    relayed = hub_frames.compress_message(LARGE)
+    assert frames.decode_frame(relayed) == LARGE
+
+
+def test_large_signals_and_chat_stay_text():
+    offer = {**SMALL, "payload": {"sdp": "a=candidate " * 1000}}
+    assert isinstance(frames.encode_message(offer), str)
+    chat = {"type": "chat_message_to_server", "payload": {"text": "x" * 5000}}
+    assert isinstance(frames.encode_message(chat), str)
+
+
+def test_hub_stamps_and_room_tags_are_read_by_clients():
+    text = hub_frames.Frame.from_message(SMALL)
+    tagged = hub_frames.tag_room(text, "r1")
+    assert frames.decode_frame(tagged.data) == {"room": "r1", **SMALL}
+
+    packed = hub_frames.Frame("content_update", hub_frames.compress_message(LARGE))
+    tagged = hub_frames.tag_room(packed, "r1")
+    assert frames.decode_frame(tagged.data) == {**LARGE, "room": "r1"}
+
+
+def test_binary_kinds_are_told_apart_the_same_way():
+    samples = [frames.pack_binary({"type": "x"}, b""), zlib.compress(b"{}"), b"\x81\xa1a\x01", b"\xde\x00\x00", b""]
+    assert [codec.is_packed(s) for s in samples] == [hub_codec.is_packed(s) for s in samples]
+
+
+@pytest.mark.skipif(codec.msgpack is None, reason="msgpack is not installed")
+def test_msgpack_round_trips_both_ways():
+    assert hub_codec.decode(codec.encode(SMALL, codec.MSGPACK)) == SMALL
+    frame = hub_frames.Frame.from_message(SMALL)
+    assert frames.decode_frame(hub_codec.packed(frame)) == SMALL
+    assert frames.decode_frame(hub_codec.to_json(codec.encode(SMALL, codec.MSGPACK))) == SMALL
@@ -186,6 +186,8 @@ const MeetingCore: React.FC<MeetingCoreProps> = ({
     document.body.appendChild(audioEl);
 
     const handleMessage = (event: MessageEvent) => {
+      // Binary bot_audio frames are played by useWebRTC
+      if (typeof event.data !== "string") return;
       try {
         const msg = JSON.parse(event.data);
         if (msg.type === "bot_audio" && msg.data) {
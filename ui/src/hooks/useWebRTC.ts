@@ -24,10 +24,15 @@ export type MeetingProgress = {
 
 type SignalMsg = {
   type?: string;
-  action?: "offer" | "answer" | "ice";
+  action?: "offer" | "answer" | "ice" | "ice_batch";
   from?: string;
   to?: string;
   users?: string[];
+  user_id?: string;
+  version?: number;
+  ts?: number;
+  room_seq?: number;
+  seq?: number;
   payload?: any;
   format?: string;
   data?: any;
@@ -37,16 +42,31 @@ type SignalMsg = {
   speakers?: Record<string, boolean>;
   host_id?: string;
   reason?: string;
+  resume_token?: string;
 };
 
 type DataChannelMessage =
-  | { type: "content_update"; payload: string }
+  | { type: "content_update"; payload: string; from?: string; seq?: number }
   | { type: "status_update"; payload: { muted?: boolean; speaker?: string; isMuted?: boolean; isCameraOff?: boolean } }
   | { type: "screen_update"; payload: { sharing: boolean; by: string } }
   | { type: "chat_message"; payload: ChatMessagePayload }
   | { type: "speaking_update"; payload: { speaking: boolean; speaker: string } };
 
 const WS_BASE = (import.meta as any).env?.VITE_WEBSOCKET_URL || "";
+const BINARY_FRAME_VERSION = 1;
+// Close code of a hub being replaced: the resume token re-attaches us silently
+const RESTART_CLOSE_CODE = 1012;
+// Closes a reconnect cannot fix: normal closure, room full (server/limits.py)
+const FINAL_CLOSE_CODES = [1000, 4003];
+const RECONNECT_ATTEMPTS = 8;
+// JSON messages at least this long go out as compressed binary frames (see server/frames.py)
+const COMPRESS_THRESHOLD = 4096;
+// Local ICE candidates gathered within this window go out as one ice_batch signal
+const ICE_BATCH_WINDOW_MS = 50;
+// Skipped room seqs remembered so a late frame is still shown (as in signaling/sequence.py)
+const MAX_SEQ_GAPS = 256;
+const HEADER_KEYS = ["type", "from", "to", "to_except", "room_seq"];
+const CAN_COMPRESS = typeof CompressionStream !== "undefined";
 const DEFAULT_BOT_NAMES = (window as any).__BOT_NAMES__ || ["Jarvis", "Bot", "AI-Assistant"];
 
 /** ---------------------------------------------------------
@@ -60,6 +80,44 @@ function stableHash(str: string): number {
   }
   return Math.abs(h);
 }
+/** Binary frame: [u8 version][u16 header length, big-endian][JSON header][raw payload] */
+function unpackBinaryFrame(buf: ArrayBuffer): { header: SignalMsg & { seq?: number }; payload: ArrayBuffer } | null {
+  if (buf.byteLength < 3) return null;
+  const view = new DataView(buf);
+  if (view.getUint8(0) !== BINARY_FRAME_VERSION) return null;
+  const headLen = view.getUint16(1);
+  if (buf.byteLength < 3 + headLen) return null;
+  try {
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 3, headLen)));
+    return { header, payload: buf.slice(3 + headLen) };
+  } catch {
+    return null;
+  }
+}
+function packBinaryFrame(header: object, payload: Uint8Array): ArrayBuffer {
+  const head = new TextEncoder().encode(JSON.stringify(header));
+  const out = new Uint8Array(3 + head.length + payload.length);
+  out[0] = BINARY_FRAME_VERSION;
+  new DataView(out.buffer).setUint16(1, head.length);
+  out.set(head, 3);
+  out.set(payload, 3 + head.length);
+  return out.buffer;
+}
+async function transform(data: BlobPart, stream: CompressionStream | DecompressionStream): Promise<Uint8Array> {
+  return new Uint8Array(await new Response(new Blob([data]).stream().pipeThrough(stream)).arrayBuffer());
+}
+/** Compressed frame: routing keys in the header, the whole message deflated as the payload */
+async function compressMessage(obj: any, text: string): Promise<ArrayBuffer> {
+  const header: Record<string, any> = {};
+  for (const k of HEADER_KEYS) if (obj[k] !== undefined) header[k] = obj[k];
+  header.enc = "deflate";
+  return packBinaryFrame(header, await transform(new TextEncoder().encode(text), new CompressionStream("deflate")));
+}
+async function decompressMessage(header: Record<string, any>, payload: ArrayBuffer): Promise<SignalMsg> {
+  const msg = JSON.parse(new TextDecoder().decode(await transform(payload, new DecompressionStream("deflate"))));
+  for (const k of HEADER_KEYS) if (header[k] !== undefined) msg[k] = header[k];
+  return msg;
+}
 function isPolite(selfId: string, otherId: string): boolean {
   const a = stableHash(selfId), b = stableHash(otherId);
   if (a !== b) return a > b;
@@ -129,7 +187,7 @@ class WebRTCManager {
   onPeerStatus?: (peerId: string, status: PeerStatus & { speaking?: boolean }) => void;
   onSharedContent?: (c: string) => void;
   onChat?: (m: ChatMessagePayload) => void;
-  onBotAudio?: (data: string, fmt?: string, speaker?: string) => void;
+  onBotAudio?: (data: string | ArrayBuffer, fmt?: string, speaker?: string) => void;
   onBotMessage?: (m: ChatMessagePayload) => void;
   onRecordingUpdate?: (is_recording: boolean) => void;
   onSpeakerUpdate?: (speakers: Record<string, boolean>) => void;
@@ -138,6 +196,19 @@ class WebRTCManager {
 
   creatingPeer: Record<string, boolean> = {};
   usersList: string[] = [];
+  rosterVersion = 0;
+  // Last room_seq seen; sent as resume_from on reconnect so the hub replays what we missed
+  roomSeq = 0;
+  // Seqs below roomSeq that have not arrived yet: frames are not strictly in order
+  seqGaps = new Set<number>();
+  // Given by the hub on join; re-attaches us silently after a hub restart
+  resumeToken: string | null = null;
+  // Newest content seq shown per sender: the same update arriving again (hub and
+  // DataChannel, or a resend) is acked but not re-rendered
+  contentSeq: Record<string, number> = {};
+  // Compression is async: frames go through these chains so they keep their order
+  private outbound: Promise<void> = Promise.resolve();
+  private inbound: Promise<void> = Promise.resolve();
 
   constructor(room: string, userId: string, base?: string) {
     this.room = room;
@@ -151,9 +222,19 @@ class WebRTCManager {
   wsSend(obj: any) {
     if (!this.ws) return;
     const s = JSON.stringify(obj);
-    if (this.ws.readyState === WebSocket.OPEN) this.ws.send(s);
+    // Large payloads (attachments) are compressed once here; the hub relays them as-is
+    const frame = s.length >= COMPRESS_THRESHOLD && CAN_COMPRESS ? compressMessage(obj, s) : s;
+    this.outbound = this.outbound
+      .then(() => frame)
+      .then(data => this.wsSendRaw(data))
+      .catch(e => this.log("WS send error", e));
+  }
+
+  wsSendRaw(data: string | ArrayBuffer) {
+    if (!this.ws) return;
+    if (this.ws.readyState === WebSocket.OPEN) this.ws.send(data);
     else if (this.ws.readyState === WebSocket.CONNECTING) {
-      this.ws.addEventListener("open", () => this.ws?.send(s), { once: true });
+      this.ws.addEventListener("open", () => this.ws?.send(data), { once: true });
     }
   }
 
@@ -251,17 +332,39 @@ class WebRTCManager {
     await this.ensureLocalStream(initialAudio, initialVideo);
     this.log("Local stream ready:", this.localStream?.getTracks().map(t => `${t.kind}:${t.enabled}:${t.readyState}`));
 
+    this.openSocket();
+  }
+
+  openSocket(attempt = 0) {
     this.log("Connecting WebSocket →", this.wsUrl);
-    const ws = new WebSocket(this.wsUrl);
+    this.rosterVersion = 0;
+    const query = new URLSearchParams();
+    if (this.roomSeq) query.set("resume_from", String(this.roomSeq));
+    if (this.resumeToken) query.set("resume_token", this.resumeToken);
+    const qs = query.toString();
+    const ws = new WebSocket(qs ? `${this.wsUrl}?${qs}` : this.wsUrl);
     this.ws = ws;
     window.meetSocket = ws;
 
-    ws.onopen = () => this.log("✅ WebSocket open");
+    ws.onopen = () => { attempt = 0; this.log("✅ WebSocket open"); };
     ws.onerror = (e) => this.log("❌ WebSocket error", e);
-    ws.onclose = () => { this.log("🔌 WebSocket closed"); this.ws = null; };
+    ws.onclose = (evt) => {
+      this.log("🔌 WebSocket closed", evt.code, evt.code === RESTART_CLOSE_CODE ? "(hub restarting)" : "");
+      if (this.ws !== ws) return; // replaced, or disconnect() was called
+      this.ws = null;
+      // Hub restart or dropped connection: come back with resume_from (and our token)
+      // so the hub replays what we missed; peers stay connected meanwhile. While a
+      // new hub process starts, attempts fail uncleanly, so keep trying
+      if (!FINAL_CLOSE_CODES.includes(evt.code) && attempt < RECONNECT_ATTEMPTS) {
+        setTimeout(() => this.openSocket(attempt + 1), Math.min(500 * 2 ** attempt, 5000));
+      }
+    };
+    ws.binaryType = "arraybuffer";
     ws.onmessage = (evt) => {
-      try { this.onWsMessage(JSON.parse(evt.data)); }
-      catch (e) { this.log("WS parse error", e); }
+      this.inbound = this.inbound
+        .then(() => this.decodeWsFrame(evt.data))
+        .then(msg => { if (msg) this.onWsMessage(msg); })
+        .catch(e => this.log("WS parse error", e));
     };
   }
 
@@ -278,28 +381,91 @@ class WebRTCManager {
       Object.values(this.peers).forEach(pc => { try { pc.close(); } catch { } });
       this.peers = {};
       this.dataChannels = {};
+      this.contentSeq = {};
       this.screenSenders = {};
       this.sharingBy = null;
 
-      try { this.ws?.close(); } catch { }
+      const ws = this.ws;
       this.ws = null;
+      this.resumeToken = null;
+      try { ws?.close(); } catch { }
     } catch (e) {
       this.log("disconnect error", e);
     }
   }
 
   /** ---------------- WebSocket messages ---------------- */
+  /** Decode one WS frame into a message; binary media is handed over directly */
+  async decodeWsFrame(data: string | ArrayBuffer): Promise<SignalMsg | null> {
+    if (typeof data === "string") return JSON.parse(data);
+    const frame = unpackBinaryFrame(data);
+    if (!frame) { this.log("WS bad binary frame"); return null; }
+    const { header, payload } = frame;
+    if ((header as any).enc === "deflate") return decompressMessage(header, payload);
+    if (header.type === "bot_audio") this.onBotAudio?.(payload, header.format, header.speaker);
+    return null;
+  }
+
+  // False only for a seq already delivered; a late one filling a gap still counts
+  private acceptSeq(seq: number): boolean {
+    if (seq > this.roomSeq) {
+      if (this.roomSeq) {
+        for (let s = Math.max(this.roomSeq + 1, seq - MAX_SEQ_GAPS); s < seq; s++) this.seqGaps.add(s);
+        if (this.seqGaps.size > MAX_SEQ_GAPS) {
+          const keep = [...this.seqGaps].sort((a, b) => a - b).slice(-MAX_SEQ_GAPS);
+          this.seqGaps = new Set(keep);
+        }
+      }
+      this.roomSeq = seq;
+      return true;
+    }
+    return this.seqGaps.delete(seq);
+  }
+
   async onWsMessage(msg: SignalMsg) {
-    // Room user list
+    // Hub heartbeat: any reply keeps this member from being evicted
+    if (msg.type === "ping") { this.wsSend({ type: "pong", ts: msg.ts }); return; }
+
+    if (msg.type === "session") { this.resumeToken = msg.resume_token || null; return; }
+
+    // Replay bookkeeping: skip frames already seen, restart counting after a reset
+    if (msg.type === "replay_reset") { this.roomSeq = msg.room_seq || 0; this.seqGaps.clear(); return; }
+    if (typeof msg.room_seq === "number" && !this.acceptSeq(msg.room_seq)) return;
+
+    // Room user list (full snapshot: on connect or after a get_user_list)
     if (msg.type === "user_list") {
+      if (typeof msg.version === "number") {
+        if (msg.version < this.rosterVersion) return;
+        this.rosterVersion = msg.version;
+      }
       const list = (msg.users || []).filter(u => u !== this.userId);
       this.usersList = (msg.users || []);
       this.onUsers?.(this.usersList);
-      for (const pid of list) if (!this.peers[pid] && !this.creatingPeer[pid]) {
-        const polite = isPolite(this.userId, pid);
-        const initiator = DEFAULT_BOT_NAMES.includes(pid) ? false : !polite;
-        this.createPeer(pid, initiator).catch(() => { });
+      for (const pid of list) this.ensurePeer(pid);
+      return;
+    }
+
+    // Presence deltas
+    if (msg.type === "user_joined" || msg.type === "user_left") {
+      if (typeof msg.version === "number") {
+        if (msg.version <= this.rosterVersion) return;
+        if (msg.version !== this.rosterVersion + 1) { this.wsSend({ type: "get_user_list" }); return; }
+        this.rosterVersion = msg.version;
+      }
+      const uid = msg.user_id;
+      if (!uid) return;
+      if (msg.type === "user_joined") {
+        if (!this.usersList.includes(uid)) this.usersList = [...this.usersList, uid];
+        if (uid !== this.userId) this.ensurePeer(uid);
+      } else {
+        this.usersList = this.usersList.filter(u => u !== uid);
+        const pc = this.peers[uid];
+        if (pc) { try { pc.close(); } catch { } delete this.peers[uid]; }
+        delete this.dataChannels[uid];
+        this.onRemoteStream?.(uid, null);
+        this.onRemoteScreen?.(uid, null);
       }
+      this.onUsers?.(this.usersList);
       return;
     }
 
@@ -322,7 +488,7 @@ class WebRTCManager {
     if (msg.type === "end_call") { this.onEndCall?.(msg.reason || "Host ended the call"); this.disconnect(); return; }
     if (msg.type === "recording_update") { this.onRecordingUpdate?.(!!msg.is_recording); return; }
     if (msg.type === "speaker_update") { this.onSpeakerUpdate?.(msg.speakers || {}); return; }
-    if (msg.type === "content_update") { this.onSharedContent?.(msg.payload || ""); return; }
+    if (msg.type === "content_update") { this.acceptContent(msg.from, msg.seq, msg.payload || ""); return; }
     if (msg.type === "chat_message") { this.onChat?.(msg.payload as ChatMessagePayload); return; }
     if (msg.type === "bot_audio") { this.onBotAudio?.(msg.data || msg.payload || "", msg.format, msg.speaker); return; }
     if (msg.type === "bot_message") {
@@ -332,6 +498,13 @@ class WebRTCManager {
     if (msg.type === "progress_update") { this.onProgressUpdate?.(msg.payload as MeetingProgress); return; }
   }
 
+  ensurePeer(pid: string) {
+    if (this.peers[pid] || this.creatingPeer[pid]) return;
+    const polite = isPolite(this.userId, pid);
+    const initiator = DEFAULT_BOT_NAMES.includes(pid) ? false : !polite;
+    this.createPeer(pid, initiator).catch(() => { });
+  }
+
   /** ---------------- Signaling (glare-safe) ---------------- */
   async handleSignal(msg: SignalMsg) {
     const from = msg.from!;
@@ -354,7 +527,7 @@ class WebRTCManager {
 
     const isOffer = msg.action === "offer";
     const isAnswer = msg.action === "answer";
-    const isIce = msg.action === "ice";
+    const isIce = msg.action === "ice" || msg.action === "ice_batch";
 
     const collision = isOffer && (pc.signalingState !== "stable" || pc._makingOffer);
     if (collision && !polite) {
@@ -394,10 +567,13 @@ class WebRTCManager {
         }
       } else if (isIce && msg.payload) {
         if (pc._ignoreOffer) return;
-        if (!pc.remoteDescription) {
-          (pc._queuedCandidates ||= []).push(msg.payload);
-        } else {
-          try { await pc.addIceCandidate(msg.payload); } catch (e) { this.log("addIceCandidate error", e); }
+        const candidates = msg.action === "ice_batch" ? msg.payload.candidates || [] : [msg.payload];
+        for (const c of candidates) {
+          if (!pc.remoteDescription) {
+            (pc._queuedCandidates ||= []).push(c);
+          } else {
+            try { await pc.addIceCandidate(c); } catch (e) { this.log("addIceCandidate error", e); }
+          }
         }
       }
     } catch (e) {
@@ -425,6 +601,8 @@ class WebRTCManager {
     pc._polite = polite;
     pc._negotiationMutex = new Mutex();
     pc._iceRestartTimer = null;
+    pc._iceOut = [];
+    pc._iceFlushTimer = null;
 
     this.peers[targetId] = pc;
 
@@ -442,7 +620,12 @@ class WebRTCManager {
     this.attachLocalTracksTo(pc);
 
     pc.onicecandidate = (e: RTCPeerConnectionIceEvent) => {
-      if (e.candidate) this.wsSend({ type: "signal", action: "ice", from: this.userId, to: targetId, payload: e.candidate });
+      if (!e.candidate) {
+        this.flushIce(pc, targetId); // gathering complete
+        return;
+      }
+      pc._iceOut.push(e.candidate);
+      if (!pc._iceFlushTimer) pc._iceFlushTimer = window.setTimeout(() => this.flushIce(pc, targetId), ICE_BATCH_WINDOW_MS);
     };
 
     pc.oniceconnectionstatechange = () => {
@@ -521,6 +704,19 @@ class WebRTCManager {
     return pc;
   }
 
+  /** Send the candidates gathered in the batch window as one signal (a lone one stays a plain "ice"). */
+  flushIce(pc: any, targetId: string) {
+    if (pc._iceFlushTimer) { clearTimeout(pc._iceFlushTimer); pc._iceFlushTimer = null; }
+    const candidates = pc._iceOut;
+    if (!candidates?.length) return;
+    pc._iceOut = [];
+    if (candidates.length === 1) {
+      this.wsSend({ type: "signal", action: "ice", from: this.userId, to: targetId, payload: candidates[0] });
+    } else {
+      this.wsSend({ type: "signal", action: "ice_batch", from: this.userId, to: targetId, payload: { candidates } });
+    }
+  }
+
   attachLocalTracksTo(pc: RTCPeerConnection) {
     if (!this.localStream) return;
     const audio = this.localStream.getAudioTracks()[0] || null;
@@ -540,12 +736,34 @@ class WebRTCManager {
     }
   }
 
+  /** ---------------- Shared content ---------------- */
+  /** Render a sequenced update only if it is newer than what we show, and ack what we hold. */
+  acceptContent(from: string | undefined, seq: number | undefined, payload: string) {
+    if (typeof seq !== "number" || !from) { this.onSharedContent?.(payload || ""); return; }
+    const last = this.contentSeq[from] || 0;
+    if (seq > last) {
+      this.contentSeq[from] = seq;
+      this.onSharedContent?.(payload || "");
+    }
+    this.ackContent(from, Math.max(seq, last));
+  }
+
+  /** Cumulative ack: over the sender's DataChannel when it is open, else through the hub. */
+  ackContent(to: string, seq: number) {
+    const msg = { type: "content_ack", to, from: this.userId, seq };
+    const dc = this.dataChannels[to];
+    if (dc?.readyState === "open") {
+      try { dc.send(JSON.stringify(msg)); return; } catch { }
+    }
+    this.wsSend(msg);
+  }
+
   /** ---------------- DataChannel ---------------- */
   bindDataChannel(dc: RTCDataChannel, peerId: string) {
     dc.onmessage = (ev: MessageEvent) => {
       try {
         const obj = JSON.parse(ev.data) as DataChannelMessage;
-        if (obj.type === "content_update") this.onSharedContent?.(obj.payload);
+        if (obj.type === "content_update") this.acceptContent(obj.from || peerId, obj.seq, obj.payload);
         else if (obj.type === "status_update") {
           const p = obj.payload || {};
           const speaker = p.speaker || peerId;
@@ -759,7 +977,9 @@ export function useWebRTC(room: string, userId: string, signalingBase?: string)
         const audioEl = document.createElement("audio");
         audioEl.autoplay = true;
         (audioEl as any).playsInline = true;
-        audioEl.src = `data:${mime};base64,${data}`;
+        // Binary frames carry raw bytes; older senders still use base64 JSON
+        const objectUrl = typeof data === "string" ? null : URL.createObjectURL(new Blob([data], { type: mime }));
+        audioEl.src = objectUrl || `data:${mime};base64,${data}`;
         audioEl.volume = 1.0;
         audioEl.style.display = "none";
         document.body.appendChild(audioEl);
@@ -773,6 +993,7 @@ export function useWebRTC(room: string, userId: string, signalingBase?: string)
 
         // Cleanup after playback ends
         audioEl.addEventListener("ended", () => {
+          if (objectUrl) URL.revokeObjectURL(objectUrl);
           audioEl.remove();
           setBotSpeaker("");
         });